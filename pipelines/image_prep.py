@@ -1,10 +1,18 @@
-import papermill as pm
 from pathlib import Path
 import sys
 import os
 
+sys.path.append(str(Path(__file__).resolve().parent.parent / "utils"))
+from stage_runner import notebook_stage, pipeline_arguments, run_pipeline
 
-def run_notebook_pipeline():
+# Relative to notebooks/amazing_logos_v4_image_prep
+DATASET = Path("../../input/amazing_logos_v4/train")
+OUTPUT = Path("../../output/amazing_logos_v4")
+CLEANUP_DATA = OUTPUT / "data" / "amazing_logos_v4_cleanup"
+IMAGE_PREP_DATA = OUTPUT / "data" / "amazing_logos_v4_image_prep"
+
+
+def run_notebook_pipeline(mode="inprocess", n_workers=None, force=(), use_cache=True):
     """Run the amazing_logos_v4 image preparation pipeline"""
 
     # Change to the notebooks directory so notebook paths work correctly
@@ -24,37 +32,31 @@ def run_notebook_pipeline():
     # Adjust the order below if your workflow differs.
     pipeline_steps = [
         # 1. Extract images according to the prepared metadata
-        "extract_images.ipynb",
+        notebook_stage("extract_images.ipynb",
+                       inputs=[DATASET, CLEANUP_DATA / "metadata9.csv"],
+                       outputs=[OUTPUT / "images" / "total_after_cleanup", IMAGE_PREP_DATA / "total_after_cleanup_metadata.csv"]),
         # 2. filtering step to exclude non-minimalistic logos
-        "filter_minimalistic_logos.ipynb",
+        notebook_stage("filter_minimalistic_logos.ipynb",
+                       inputs=[OUTPUT / "images" / "total_after_cleanup"],
+                       outputs=[OUTPUT / "images" / "total_filtered", OUTPUT / "analysis"]),
         # 3. Build the metadata used for image extraction
-        "create_metadata10_from_total_filtered.ipynb",
+        notebook_stage("create_metadata10_from_total_filtered.ipynb",
+                       inputs=[OUTPUT / "images" / "total_filtered", CLEANUP_DATA / "metadata9_with_main.csv"],
+                       outputs=[IMAGE_PREP_DATA / "metadata10.csv"]),
         # 4. Create a class-balanced subset of images (if required for training/eval)
-        "extract_balanced_images.ipynb",
+        notebook_stage("extract_balanced_images.ipynb",
+                       inputs=[DATASET, IMAGE_PREP_DATA / "metadata10.csv"],
+                       outputs=[OUTPUT / "images" / "balanced_sample_2k_512x512",
+                                IMAGE_PREP_DATA / "balanced_sample_2k_512x512_metadata.csv"]),
         # Optional/experimental notebook, keep commented unless you want it in the pipeline
-        # "test_ai_sketch_generation.ipynb",
+        # notebook_stage("test_ai_sketch_generation.ipynb"),
     ]
 
     print("🚀 Starting Amazing Logos V4 Image Preparation Pipeline...")
 
-    for i, notebook in enumerate(pipeline_steps, 1):
-        input_path = Path(notebook)  # Notebooks are in current directory now
-        output_path = output_dir / f"executed_{notebook}"
-
-        print(f"\n📋 Step {i}/{len(pipeline_steps)}: {notebook}")
-
-        try:
-            pm.execute_notebook(
-                input_path=str(input_path),
-                output_path=str(output_path),
-                progress_bar=True,
-            )
-            print(f"✅ {notebook} completed successfully")
-
-        except Exception as e:
-            print(f"❌ {notebook} failed with error: {e}")
-            print("🛑 Pipeline stopped due to error")
-            return False
+    if not run_pipeline(pipeline_steps, ".", mode=mode, n_workers=n_workers, executed_dir=output_dir,
+                        force=force, use_cache=use_cache):
+        return False
 
     print("\n🎉 Pipeline completed successfully!")
     # If notebooks write artifacts to output/, they will already be in place.
@@ -62,5 +64,6 @@ def run_notebook_pipeline():
 
 
 if __name__ == "__main__":
-    success = run_notebook_pipeline()
+    args = pipeline_arguments("Run the image preparation pipeline")
+    success = run_notebook_pipeline(args.mode, args.workers, args.force, args.use_cache)
     sys.exit(0 if success else 1)
@@ -1,9 +1,15 @@
-import papermill as pm
 from pathlib import Path
 import sys
 import os
 
-def run_notebook_pipeline():
+sys.path.append(str(Path(__file__).resolve().parent.parent / "utils"))
+from stage_runner import notebook_stage, pipeline_arguments, run_pipeline
+
+# Relative to notebooks/amazing_logos_v4_cleanup
+DATA = Path("../../output/amazing_logos_v4/data/amazing_logos_v4_cleanup")
+
+
+def run_notebook_pipeline(mode="inprocess", n_workers=None, force=(), use_cache=True):
     """Run the amazing_logos_v4 processing pipeline"""
     
     # Change to the notebooks directory so notebook paths work correctly
@@ -18,58 +24,52 @@ def run_notebook_pipeline():
     output_dir = Path("../../executed_notebooks")
     output_dir.mkdir(exist_ok=True)
     
-    # Define the pipeline order (with new shorter names)
+    # Define the pipeline order, every step declares the files it reads and writes
     pipeline_steps = [
-        #"step1.ipynb", # metadata extraction, outputs to metadata.csv
+        #notebook_stage("step1.ipynb", outputs=[DATA / "metadata.csv"]), # metadata extraction, outputs to metadata.csv
             # text splitting and cleaning (company, description, category, tags),
             # top 10 tags in category or description gets to NA
-        #"step2.ipynb", # -> metadata2.csv
-        "step3_categories.ipynb", # normalizing categories -> metadata3.csv
-        "step3_tags.ipynb", # normalizing tags -> metadata5.csv
-        #"step4_categories.ipynb", # only analyze categories, -> categories_analysis2.csv
-        "step4_categories2.ipynb", # consolidate categories, -> categories_analysis3.csv, metadata6.csv
-        "step4_categories3.ipynb", # assign tag to unclassified category -> metadata7.csv
-        "step4_categories4_filtering.ipynb", # filter out categories with count < 4 -> metadata8.csv
+        #notebook_stage("step2.ipynb", inputs=[DATA / "metadata.csv"], outputs=[DATA / "metadata2.csv"]),
+        notebook_stage("step3_categories.ipynb", # normalizing categories -> metadata3.csv
+                       inputs=[DATA / "metadata2.csv"], outputs=[DATA / "metadata3.csv", DATA / "categories_analysis.csv"]),
+        notebook_stage("step3_tags.ipynb", # normalizing tags -> metadata5.csv
+                       inputs=[DATA / "metadata3.csv"], outputs=[DATA / "metadata5.csv", DATA / "tags_analysis.csv"]),
+        #notebook_stage("step4_categories.ipynb", # only analyze categories, -> categories_analysis2.csv
+        #               inputs=[DATA / "metadata3.csv"], outputs=[DATA / "categories_analysis2.csv"]),
+        notebook_stage("step4_categories2.ipynb", # consolidate categories, -> categories_analysis3.json, metadata6.csv
+                       inputs=[DATA / "metadata5.csv"], outputs=[DATA / "metadata6.csv", DATA / "categories_analysis3.json"]),
+        notebook_stage("step4_categories3.ipynb", # assign tag to unclassified category -> metadata7.csv
+                       inputs=[DATA / "metadata6.csv"], outputs=[DATA / "metadata7.csv"]),
+        notebook_stage("step4_categories4_filtering.ipynb", # filter out categories with count < 4 -> metadata8.csv
+                       inputs=[DATA / "metadata7.csv"], outputs=[DATA / "metadata8.csv", DATA / "category4_filtering_analysis.txt"]),
             #  This notebook performs final category cleanup:
             # - Loads metadata8.csv
             # - Changes categories to 'unclassified' if they're not in the consolidation_map.keys()
             # - For frequent unclassified categories (>5 occurrences), adds the original category to tags
             # - Saves the result as metadata9.csv
-        "step5_categories.ipynb",
+        notebook_stage("step5_categories.ipynb",
+                       inputs=[DATA / "metadata8.csv"], outputs=[DATA / "metadata9.csv"]),
             # Add step6 to compute coarse top-level category column from metadata9
-        "step6_categories.ipynb",
+        notebook_stage("step6_categories.ipynb",
+                       inputs=[DATA / "metadata9.csv"], outputs=[DATA / "metadata9.csv", DATA / "metadata9_with_main.csv"]),
     ]
     
     print("🚀 Starting Amazing Logos V4 Processing Pipeline...")
     
-    for i, notebook in enumerate(pipeline_steps, 1):
-        input_path = Path(notebook)  # Notebooks are in current directory now
-        output_path = output_dir / f"executed_{notebook}"
-        
-        print(f"\n📋 Step {i}/{len(pipeline_steps)}: {notebook}")
-        
-        try:
-            pm.execute_notebook(
-                input_path=str(input_path),
-                output_path=str(output_path),
-                progress_bar=True
-            )
-            print(f"✅ {notebook} completed successfully")
-            
-        except Exception as e:
-            print(f"❌ {notebook} failed with error: {e}")
-            print("🛑 Pipeline stopped due to error")
-            return False
+    if not run_pipeline(pipeline_steps, ".", mode=mode, n_workers=n_workers, executed_dir=output_dir,
+                        force=force, use_cache=use_cache):
+        return False
     
     print("\n🎉 Pipeline completed successfully!")
     print("\n📊 Generated files:")
-    output_data = Path("../../output/amazing_logos_v4/data/amazing_logos_v4_cleanup")  # Relative to notebooks/amazing_logos_v4_cleanup folder
+    output_data = DATA  # Relative to notebooks/amazing_logos_v4_cleanup folder
     if output_data.exists():
-        for file in output_data.glob("*.csv"):
+        for file in sorted(output_data.glob("*.parquet")) + sorted(output_data.glob("*.csv")):
             print(f"   - {file.name}")
     
     return True
 
 if __name__ == "__main__":
-    success = run_notebook_pipeline()
-    sys.exit(0 if success else 1)
\ No newline at end of file
+    args = pipeline_arguments("Run the metadata cleanup pipeline")
+    success = run_notebook_pipeline(args.mode, args.workers, args.force, args.use_cache)
+    sys.exit(0 if success else 1)
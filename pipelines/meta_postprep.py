@@ -1,10 +1,16 @@
-import papermill as pm
 from pathlib import Path
 import sys
 import os
 
+sys.path.append(str(Path(__file__).resolve().parent.parent / "utils"))
+from stage_runner import notebook_stage, pipeline_arguments, run_pipeline
 
-def run_notebook_pipeline():
+# Relative to notebooks/meta_postprep
+OUTPUT = Path("../../output/amazing_logos_v4")
+POSTPREP_DATA = OUTPUT / "data" / "meta_postprep"
+
+
+def run_notebook_pipeline(mode="inprocess", n_workers=None, force=(), use_cache=True):
     """Run the metadata post-preparation pipeline."""
 
     script_dir = Path(__file__).parent
@@ -23,39 +29,32 @@ def run_notebook_pipeline():
 
     # Define the pipeline order
     pipeline_steps = [
-        "filter_metadata.ipynb",
-        "prompt_creation.ipynb",
+        notebook_stage("filter_metadata.ipynb",
+                       inputs=[OUTPUT / "data" / "amazing_logos_v4_image_prep" / "metadata10.csv",
+                               OUTPUT / "images" / "balanced_sample_2k_512x512_maps"],
+                       outputs=[POSTPREP_DATA / "metadata_filtered_by_maps.csv"]),
+        notebook_stage("prompt_creation.ipynb",
+                       inputs=[POSTPREP_DATA / "metadata_filtered_by_maps.csv"],
+                       outputs=[POSTPREP_DATA / "final_prompts.csv"]),
     ]
 
-    print("🚀 Starting Metadata Post-Preparation Pipeline...")
-
-    for i, notebook in enumerate(pipeline_steps, 1):
-        input_path = Path(notebook)
-        if not input_path.exists():
-            print(f"❌ Missing notebook: {input_path}")
+    for stage in pipeline_steps:
+        if not Path(stage["notebook"]).exists():
+            print(f"❌ Missing notebook: {stage['notebook']}")
             print("🛑 Pipeline stopped.")
             return False
-            
-        output_path = output_dir / f"executed_{notebook}"
-
-        print(f"\n📋 Step {i}/{len(pipeline_steps)}: {notebook}")
-
-        try:
-            pm.execute_notebook(
-                input_path=str(input_path),
-                output_path=str(output_path),
-                progress_bar=True,
-            )
-            print(f"✅ {notebook} completed successfully")
-        except Exception as e:
-            print(f"❌ {notebook} failed with error: {e}")
-            print("🛑 Pipeline stopped due to error")
-            return False
+
+    print("🚀 Starting Metadata Post-Preparation Pipeline...")
+
+    if not run_pipeline(pipeline_steps, ".", mode=mode, n_workers=n_workers, executed_dir=output_dir,
+                        force=force, use_cache=use_cache):
+        return False
 
     print("\n🎉 Metadata post-preparation pipeline completed successfully!")
     return True
 
 
 if __name__ == "__main__":
-    success = run_notebook_pipeline()
+    args = pipeline_arguments("Run the metadata post-preparation pipeline")
+    success = run_notebook_pipeline(args.mode, args.workers, args.force, args.use_cache)
     sys.exit(0 if success else 1)
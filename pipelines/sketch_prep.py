@@ -1,10 +1,15 @@
-import papermill as pm
 from pathlib import Path
 import sys
 import os
 
+sys.path.append(str(Path(__file__).resolve().parent.parent / "utils"))
+from stage_runner import notebook_stage, pipeline_arguments, run_pipeline
 
-def run_notebook_pipeline():
+# Relative to notebooks/sktech_creation
+IMAGES = Path("../../output/amazing_logos_v4/images")
+
+
+def run_notebook_pipeline(mode="inprocess", n_workers=None, force=(), use_cache=True):
     """Run the sketch preparation pipeline (sketch generation + map generation)."""
 
     script_dir = Path(__file__).parent
@@ -23,37 +28,30 @@ def run_notebook_pipeline():
 
     # Order: first generate sketches (if that notebook creates them), then generate maps
     pipeline_steps = [
-        "sketch_gen.ipynb",  # assumed to create or collect sketches
-        "sketch_postproc.ipynb",  # post-processes the generated sketches
+        notebook_stage("sketch_gen.ipynb",  # assumed to create or collect sketches
+                       inputs=[IMAGES / "balanced_sample_2k_512x512"],
+                       outputs=[IMAGES / "balanced_sample_2k_512x512_sketches"]),
+        notebook_stage("sketch_postproc.ipynb",  # post-processes the generated sketches
+                       inputs=[IMAGES / "balanced_sample_2k_512x512_sketches"],
+                       outputs=[IMAGES / "balanced_sample_2k_512x512_sketches_postproc"]),
     ]
 
+    for stage in pipeline_steps:
+        if not Path(stage["notebook"]).exists():
+            print(f"❌ Missing notebook: {stage['notebook']}")
+            return False
+
     print("🚀 Starting Sketch Preparation Pipeline...")
 
-    for i, notebook in enumerate(pipeline_steps, 1):
-        input_path = Path(notebook)
-        if not input_path.exists():
-            print(f"❌ Missing notebook: {input_path}")
-            return False
-        output_path = output_dir / f"executed_{notebook}"
-
-        print(f"\n📋 Step {i}/{len(pipeline_steps)}: {notebook}")
-
-        try:
-            pm.execute_notebook(
-                input_path=str(input_path),
-                output_path=str(output_path),
-                progress_bar=True,
-            )
-            print(f"✅ {notebook} completed successfully")
-        except Exception as e:
-            print(f"❌ {notebook} failed with error: {e}")
-            print("🛑 Pipeline stopped due to error")
-            return False
+    if not run_pipeline(pipeline_steps, ".", mode=mode, n_workers=n_workers, executed_dir=output_dir,
+                        force=force, use_cache=use_cache):
+        return False
 
     print("\n🎉 Sketch preparation pipeline completed successfully!")
     return True
 
 
 if __name__ == "__main__":
-    success = run_notebook_pipeline()
+    args = pipeline_arguments("Run the sketch preparation pipeline")
+    success = run_notebook_pipeline(args.mode, args.workers, args.force, args.use_cache)
     sys.exit(0 if success else 1)
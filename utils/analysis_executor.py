@@ -0,0 +1,137 @@
+"""Process pool for the logo analysis (replacement for p_apply in the filter stage).
+
+The paths are sent to the workers in chunks, every worker decodes and analyses its chunk
+and sends back one NumPy record array (ANALYSIS_METRICS as float columns) instead of one
+pickled pd.Series per logo. Chunks are collected as soon as they are finished, so the
+caller can show progress or write results while the pool is still running.
+
+With `image_store` the "paths" are ids of a packed image store (see image_store.py) and
+the workers read the pixels from the memory map instead of decoding PNG files.
+
+Example:
+    results, worker_stats = run_analysis(batch_files, color_mode='histogram')
+    results, worker_stats = run_analysis(ids, image_store=store_path)
+"""
+
+import multiprocessing
+import os
+import time
+
+import cv2
+import numpy as np
+import pandas as pd
+
+from image_store import get_image, open_image_store
+from images import ANALYSIS_METRICS, analyze_logo
+
+# 'index' = position in the input list, 'ok' = False if the image could not be analysed
+RESULT_DTYPE = np.dtype([('index', np.int64), ('ok', np.bool_)] + [(m, np.float64) for m in ANALYSIS_METRICS])
+
+DEFAULT_CHUNK_SIZE = 32
+
+
+def available_cores():
+    """Number of cores this process may use (respects affinity / cgroup cpusets)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _init_worker():
+    """One thread per worker, the parallelism comes from the processes"""
+    cv2.setNumThreads(1)
+    try:
+        from threadpoolctl import threadpool_limits
+        global _thread_limits
+        _thread_limits = threadpool_limits(1)
+    except ImportError:
+        pass
+
+
+def analyze_chunk(task):
+    """Analyse a chunk of paths
+
+    Args:
+        task: (start index, list of paths or store ids, color_mode, max_colors, image store path or None)
+
+    Returns:
+        (worker pid, seconds, record array with RESULT_DTYPE)
+    """
+    start_index, paths, color_mode, max_colors, image_store = task
+    start = time.perf_counter()
+    store = open_image_store(image_store) if image_store is not None else None
+    records = np.zeros(len(paths), dtype=RESULT_DTYPE)
+    records['index'] = np.arange(start_index, start_index + len(paths))
+    for i, path in enumerate(paths):
+        try:
+            image = get_image(store, path, bgr=True) if store is not None else path
+            metrics = analyze_logo(image, max_colors, color_mode)
+        except Exception as e:
+            print(f"Fehler bei {os.path.basename(path)}: {e}")
+            continue
+        records[i]['ok'] = True
+        for metric in ANALYSIS_METRICS:
+            records[i][metric] = metrics[metric]
+    return os.getpid(), time.perf_counter() - start, records
+
+
+def iter_analysis(paths, color_mode='exact', max_colors=10, n_workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                  image_store=None):
+    """Analyse all paths in a process pool and yield the results chunk by chunk
+
+    Chunks arrive in completion order, use the 'index' field to map them back.
+
+    Yields:
+        (worker pid, seconds, record array)
+    """
+    paths = [str(p) for p in paths]
+    n_workers = n_workers or available_cores()
+    tasks = [
+        (start, paths[start:start + chunk_size], color_mode, max_colors, str(image_store) if image_store is not None else None)
+        for start in range(0, len(paths), chunk_size)
+    ]
+    if n_workers == 1:
+        _init_worker()
+        for task in tasks:
+            yield analyze_chunk(task)
+        return
+
+    with multiprocessing.Pool(n_workers, initializer=_init_worker) as pool:
+        yield from pool.imap_unordered(analyze_chunk, tasks)
+
+
+def run_analysis(paths, color_mode='exact', max_colors=10, n_workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 verbose=True, image_store=None):
+    """Analyse all paths and collect the results
+
+    Args:
+        image_store: optional path of a packed image store, `paths` are then store ids
+
+    Returns:
+        (results, worker_stats) - results has one row per path (same order, metrics and 'ok'),
+        worker_stats one row per worker with chunks, images, seconds and images_per_second
+    """
+    n_workers = n_workers or available_cores()
+    records = np.zeros(len(paths), dtype=RESULT_DTYPE)
+    stats = {}
+    done = 0
+    start = time.perf_counter()
+
+    for pid, seconds, chunk in iter_analysis(paths, color_mode, max_colors, n_workers, chunk_size, image_store):
+        records[chunk['index']] = chunk
+        worker = stats.setdefault(pid, {'worker': pid, 'chunks': 0, 'images': 0, 'seconds': 0.0})
+        worker['chunks'] += 1
+        worker['images'] += len(chunk)
+        worker['seconds'] += seconds
+        done += len(chunk)
+        if verbose:
+            elapsed = time.perf_counter() - start
+            print(f"\r   ⚙️ {done:,}/{len(paths):,} Logos | {done / elapsed:.1f} Logos/s", end='', flush=True)
+    if verbose and paths:
+        print()
+
+    worker_stats = pd.DataFrame(list(stats.values()), columns=['worker', 'chunks', 'images', 'seconds'])
+    worker_stats['images_per_second'] = worker_stats['images'] / worker_stats['seconds'].where(worker_stats['seconds'] > 0)
+
+    results = pd.DataFrame(records).drop(columns='index')
+    return results, worker_stats
@@ -0,0 +1,83 @@
+"""Process-wide cache of the ControlNet annotators (controlnet_aux).
+
+`LineartDetector` and `HEDdetector` load their weights from 'lllyasviel/Annotators'; they
+are loaded on first use per process and then reused for every image, so the per-image cost
+of the control image is only the inference. `evict_annotator` frees them again (e.g.
+before loading a diffusion pipeline on a small machine).
+
+Example:
+    detector = get_annotator('lineart')
+    control_image = make_control_image(image, 'scribble')
+    evict_annotator()
+"""
+
+import gc
+import time
+
+ANNOTATOR_REPO = 'lllyasviel/Annotators'
+
+# ControlNet model type -> annotator that creates its control image
+MODEL_ANNOTATORS = {
+    'lineart': 'lineart',
+    'lineart_anime': 'lineart',
+    'scribble': 'hed',
+    'canny': 'canny',
+}
+
+# Loaded annotators of this process: kind -> detector
+_annotators = {}
+# kind -> seconds of the last load
+_load_seconds = {}
+
+
+def _load(kind):
+    try:
+        from controlnet_aux import CannyDetector, HEDdetector, LineartDetector
+    except ImportError:
+        raise ImportError("controlnet-aux not installed. Install via: pip install controlnet-aux --upgrade")
+
+    if kind == 'lineart':
+        return LineartDetector.from_pretrained(ANNOTATOR_REPO)
+    if kind == 'hed':
+        return HEDdetector.from_pretrained(ANNOTATOR_REPO)
+    if kind == 'canny':
+        return CannyDetector()
+    raise ValueError(f"Unbekannter Annotator: {kind} (erlaubt: lineart, hed, canny)")
+
+
+def get_annotator(kind):
+    """Annotator of this kind ('lineart', 'hed', 'canny'), loaded on first use"""
+    if kind not in _annotators:
+        start = time.perf_counter()
+        _annotators[kind] = _load(kind)
+        _load_seconds[kind] = time.perf_counter() - start
+        print(f"🔄 Annotator {kind} geladen in {_load_seconds[kind]:.1f}s")
+    return _annotators[kind]
+
+
+def evict_annotator(kind=None):
+    """Drop one annotator (None = all) from the cache"""
+    kinds = list(_annotators) if kind is None else [kind]
+    for name in kinds:
+        _annotators.pop(name, None)
+    gc.collect()
+
+
+def loaded_annotators():
+    """{kind: load seconds} of the annotators currently in the cache"""
+    return {kind: _load_seconds[kind] for kind in _annotators}
+
+
+def make_control_image(image, model_type):
+    """Control image for a ControlNet model type (lineart, lineart_anime, scribble, canny)
+
+    Args:
+        image: PIL image (RGB)
+    """
+    kind = MODEL_ANNOTATORS.get(model_type, 'canny')
+    detector = get_annotator(kind)
+    if kind == 'hed':
+        return detector(image, scribble=True)
+    if kind == 'canny':
+        return detector(image, low_threshold=50, high_threshold=150)
+    return detector(image)
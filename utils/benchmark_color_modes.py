@@ -0,0 +1,83 @@
+"""Benchmark and agreement report for the color complexity modes in `images.py`.
+
+Every image is decoded once and analysed with each mode in `COLOR_MODES`. The report
+shows the time per image and how often the fast modes agree with the exact mode, so the
+mode for a run of `filter_minimalistic_logos.ipynb` can be picked per dataset.
+
+Example:
+    python benchmark_color_modes.py ../output/amazing_logos_v4/images/total_after_cleanup --limit 200
+"""
+
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from images import COLOR_MODES, color_complexity_from_array, load_image
+
+
+def compare_color_modes(image_paths, modes=COLOR_MODES, max_colors=10, reference='exact'):
+    """Run every color mode on the same images.
+
+    Returns:
+        (per_image, summary) - per_image has one row per image and mode,
+        summary one row per mode with timing and agreement with `reference`.
+    """
+    rows = []
+    for path in image_paths:
+        img = load_image(path)
+        for mode in modes:
+            start = time.perf_counter()
+            result = color_complexity_from_array(img, max_colors, mode)
+            rows.append({
+                'logo_path': str(path),
+                'mode': mode,
+                'seconds': time.perf_counter() - start,
+                **result,
+            })
+
+    per_image = pd.DataFrame(rows)
+    if per_image.empty or reference not in modes:
+        return per_image, pd.DataFrame()
+
+    ref = per_image[per_image['mode'] == reference].set_index('logo_path')
+    summary = []
+    for mode in modes:
+        current = per_image[per_image['mode'] == mode].set_index('logo_path').loc[ref.index]
+        diff = (current['dominant_colors'] - ref['dominant_colors']).abs()
+        summary.append({
+            'mode': mode,
+            'images': len(current),
+            'seconds_per_image': current['seconds'].mean(),
+            'speedup': ref['seconds'].sum() / current['seconds'].sum(),
+            'dominant_equal': (diff == 0).mean(),
+            'dominant_within_1': (diff <= 1).mean(),
+            'dominant_mean_abs_diff': diff.mean(),
+            'unique_colors_equal': (current['unique_colors'] == ref['unique_colors']).mean(),
+        })
+    return per_image, pd.DataFrame(summary)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare color complexity modes")
+    parser.add_argument("image_dir", help="Folder with PNG logos")
+    parser.add_argument("--limit", type=int, default=100, help="Number of images (random sample)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=None, help="Optional CSV for the per-image results")
+    args = parser.parse_args()
+
+    paths = sorted(Path(args.image_dir).glob('*.png'))
+    if len(paths) > args.limit:
+        rng = np.random.default_rng(args.seed)
+        paths = [paths[i] for i in sorted(rng.choice(len(paths), args.limit, replace=False))]
+
+    print(f"📊 Vergleiche {COLOR_MODES} auf {len(paths)} Logos...")
+    per_image, summary = compare_color_modes(paths)
+    print(summary.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+    if args.out:
+        per_image.to_csv(args.out, index=False)
+        print(f"💾 Ergebnisse gespeichert: {args.out}")
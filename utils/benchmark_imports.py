@@ -0,0 +1,72 @@
+"""Import-time benchmark for the analysis modules.
+
+Every module is imported in a fresh interpreter (as a pool worker or papermill kernel
+would do it). The report shows the import time, the peak RSS of the process and whether
+one of the heavy frameworks was loaded. The exit code is 1 if a module pulls in a heavy
+framework or exceeds the time budget, so the check can run in CI.
+
+Example:
+    python benchmark_imports.py
+    python benchmark_imports.py images minimalism_filter --repeat 5 --budget 1.5
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+UTILS_DIR = Path(__file__).resolve().parent
+
+# Must not be imported by the analysis modules
+HEAVY_MODULES = ('torch', 'diffusers', 'controlnet_aux', 'transformers', 'sklearn')
+
+DEFAULT_MODULES = ('images', 'minimalism_filter', 'analysis_executor', 'feature_store')
+
+_PROBE = """
+import json, resource, sys, time
+sys.path.insert(0, {utils_dir!r})
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': seconds,
+    'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy': [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure_import(module, repeat=3):
+    """Import `module` `repeat` times in a new interpreter and keep the fastest run"""
+    runs = []
+    for _ in range(repeat):
+        probe = _PROBE.format(utils_dir=str(UTILS_DIR), module=module, heavy=HEAVY_MODULES)
+        out = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    best = min(runs, key=lambda run: run['seconds'])
+    return {'module': module, **best, 'heavy': ', '.join(best['heavy'])}
+
+
+def benchmark_imports(modules=DEFAULT_MODULES, repeat=3):
+    return pd.DataFrame([measure_import(module, repeat) for module in modules])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure import time of the analysis modules")
+    parser.add_argument("modules", nargs='*', default=list(DEFAULT_MODULES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget", type=float, default=2.0, help="Maximum import time in seconds")
+    args = parser.parse_args()
+
+    report = benchmark_imports(args.modules, args.repeat)
+    print(report.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+    failed = report[(report['heavy'] != '') | (report['seconds'] > args.budget)]
+    if len(failed):
+        print(f"❌ Zu teuer oder mit schweren Frameworks: {', '.join(failed['module'])}")
+        sys.exit(1)
+    print("✅ Alle Imports ohne schwere Frameworks und im Zeitbudget")
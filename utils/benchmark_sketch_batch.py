@@ -0,0 +1,64 @@
+"""Throughput of the batched sketch generation vs. the per-image loop.
+
+The same images are generated once with `generate_sketch` (one diffusion call and one
+prompt encoding per image) and with `generate_sketches` for every batch size, each run
+into its own output folder. The report shows images per minute and the speedup against
+the per-image loop, so the batch size can be picked per host.
+
+Example:
+    python benchmark_sketch_batch.py ../output/amazing_logos_v4/images/balanced_sample_2k_512x512 --limit 16 --batch-sizes 2 4 8
+"""
+
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from sketch_controlnet import generate_sketch, generate_sketches, setup_sketch_pipeline
+
+
+def compare_sketch_batching(image_paths, pipeline_info, output_dir, batch_sizes=(2, 4)):
+    """Per-image loop and generate_sketches with each batch size on the same images
+
+    Returns:
+        DataFrame with one row per run: 'run', 'batch_size', 'images', 'seconds',
+        'images_per_minute' and 'speedup' (vs. the per-image loop)
+    """
+    output_dir = Path(output_dir)
+    rows = []
+
+    loop_dir = output_dir / 'loop'
+    loop_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    generated = sum(generate_sketch(path, pipeline_info, loop_dir) is not None for path in image_paths)
+    seconds = time.perf_counter() - start
+    rows.append({'run': 'generate_sketch', 'batch_size': 1, 'images': generated, 'seconds': seconds})
+
+    for batch_size in batch_sizes:
+        stats = generate_sketches(image_paths, pipeline_info, output_dir / f'batch_{batch_size}',
+                                  batch_size=batch_size, skip_existing=False)
+        rows.append({'run': 'generate_sketches', 'batch_size': batch_size,
+                     'images': stats['images'], 'seconds': stats['seconds']})
+
+    report = pd.DataFrame(rows)
+    report['images_per_minute'] = report['images'] / report['seconds'] * 60
+    report['speedup'] = report['images_per_minute'] / report['images_per_minute'].iloc[0]
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare batched and per-image sketch generation")
+    parser.add_argument("image_dir", help="Folder with PNG logos")
+    parser.add_argument("--limit", type=int, default=8, help="Number of images (first N)")
+    parser.add_argument("--batch-sizes", type=int, nargs='+', default=[2, 4])
+    parser.add_argument("--model-type", default="lineart")
+    parser.add_argument("--out", default="sketch_batch_benchmark", help="Output folder for the sketches")
+    args = parser.parse_args()
+
+    paths = sorted(Path(args.image_dir).glob('*.png'))[:args.limit]
+    pipeline_info = setup_sketch_pipeline(args.model_type)
+    print(f"📊 Vergleiche Einzelbild-Schleife und Batches {args.batch_sizes} auf {len(paths)} Logos...")
+    report = compare_sketch_batching(paths, pipeline_info, args.out, args.batch_sizes)
+    print(report.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
@@ -0,0 +1,100 @@
+"""Seconds per denoising step of the sketch pipeline for every CPU profile.
+
+Every profile runs in its own fresh process (thread settings of PyTorch can only be set
+once per process): the pipeline is set up with the profile, one warm-up generation runs
+(torch.compile compiles here) and then the steps of a timed generation are measured with
+the step callback of the pipeline. The fastest profile of a host can then be set with
+SKETCH_CPU_PROFILE or `setup_sketch_pipeline(..., profile=...)`.
+
+Example:
+    python benchmark_sketch_profiles.py --image logo.png --profiles default fast compiled --threads 16
+"""
+
+import multiprocessing
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from PIL import Image
+
+
+def measure_profile(profile, model_type='lineart', image_path=None, steps=10):
+    """Set up the pipeline with `profile` and time the denoising steps of one generation
+
+    Returns:
+        dict with 'profile', 'load_seconds', 'seconds_per_step' (median), 'threads' and
+        'bf16' (autocast really active)
+    """
+    import torch
+    from sketch_controlnet import (IMAGE_SIZE, _prepare_image, make_control_image, resolve_cpu_profile,
+                                   setup_sketch_pipeline, sketch_inference_context)
+
+    name = resolve_cpu_profile(profile)[0]
+    start = time.perf_counter()
+    pipe, model_type = setup_sketch_pipeline(model_type, device='cpu', profile=profile)
+    load_seconds = time.perf_counter() - start
+    if pipe is None:
+        return {'profile': name, 'load_seconds': load_seconds, 'seconds_per_step': None}
+
+    image = _prepare_image(image_path) if image_path else Image.new('RGB', IMAGE_SIZE, 'white')
+    control_image = make_control_image(image, model_type)
+    stamps = []
+
+    def on_step_end(pipeline, step, timestep, callback_kwargs):
+        stamps.append(time.perf_counter())
+        return callback_kwargs
+
+    kwargs = dict(prompt="sketch", image=control_image, num_inference_steps=steps,
+                  generator=torch.Generator().manual_seed(42))
+    with sketch_inference_context(pipe):
+        pipe(**{**kwargs, 'num_inference_steps': 2})  # warm-up (and compilation)
+        start = time.perf_counter()
+        pipe(**kwargs, callback_on_step_end=on_step_end)
+    durations = [b - a for a, b in zip([start] + stamps[:-1], stamps)]
+    return {
+        'profile': name,
+        'load_seconds': load_seconds,
+        'seconds_per_step': statistics.median(durations),
+        'threads': pipe.cpu_settings['num_threads'] or torch.get_num_threads(),
+        'bf16': pipe.cpu_settings['bf16_autocast_active'],
+    }
+
+
+def compare_profiles(profiles, model_type='lineart', image_path=None, steps=10):
+    """measure_profile for every profile, each in a new process
+
+    Returns:
+        DataFrame with one row per profile and 'speedup' vs. the first profile
+    """
+    rows = []
+    context = multiprocessing.get_context('spawn')
+    for profile in profiles:
+        print(f"⏱️ Profil {profile if isinstance(profile, str) else profile.get('name', 'custom')}...")
+        with ProcessPoolExecutor(1, mp_context=context) as pool:
+            rows.append(pool.submit(measure_profile, profile, model_type, image_path, steps).result())
+    report = pd.DataFrame(rows)
+    report['speedup'] = report['seconds_per_step'].iloc[0] / report['seconds_per_step']
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from sketch_controlnet import CPU_PROFILES
+
+    parser = argparse.ArgumentParser(description="Seconds per denoising step for the CPU profiles")
+    parser.add_argument("--profiles", nargs='+', default=list(CPU_PROFILES), choices=list(CPU_PROFILES))
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads for all profiles")
+    parser.add_argument("--interop-threads", type=int, default=None)
+    parser.add_argument("--model-type", default="lineart")
+    parser.add_argument("--image", default=None, help="Logo for the control image (default: blank)")
+    parser.add_argument("--steps", type=int, default=10)
+    args = parser.parse_args()
+
+    profiles = [
+        {**CPU_PROFILES[name], 'name': name, 'num_threads': args.threads, 'interop_threads': args.interop_threads}
+        for name in args.profiles
+    ]
+    report = compare_profiles(profiles, args.model_type, args.image, args.steps)
+    print(report.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
@@ -0,0 +1,127 @@
+"""Append-only checkpoint journal for long batch runs.
+
+Every batch is written once as its own Parquet segment, then a small `manifest.json` is
+replaced atomically. The manifest is the only source of truth: a segment that was written
+before a crash but is not listed in the manifest is ignored and simply overwritten when the
+batch runs again. The cost of a checkpoint therefore depends only on the batch size, not
+on how many batches are already done.
+
+Layout:
+    <journal_dir>/manifest.json
+    <journal_dir>/segment_00001.parquet
+    ...
+
+Example:
+    manifest = open_journal(results_path / 'journal')
+    append_segment(manifest, batch_num, batch_analysis, state=progress)
+    analysis_df = read_journal(manifest)
+"""
+
+import json
+import os
+import time
+from pathlib import Path, PurePath
+
+import pandas as pd
+
+MANIFEST_NAME = 'manifest.json'
+JOURNAL_VERSION = 1
+
+
+def _write_atomic(path, write):
+    """Write to a temporary file and replace `path` in one step"""
+    tmp_path = path.with_name(path.name + '.tmp')
+    write(tmp_path)
+    with open(tmp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _write_manifest(manifest):
+    manifest['updated'] = time.time()
+    journal_dir = Path(manifest['journal_dir'])
+    data = {k: v for k, v in manifest.items() if k != 'journal_dir'}
+    _write_atomic(
+        journal_dir / MANIFEST_NAME,
+        lambda tmp: tmp.write_text(json.dumps(data, indent=2), encoding='utf-8')
+    )
+
+
+def open_journal(journal_dir):
+    """Load the manifest of a journal or create a new, empty one
+
+    Returns:
+        manifest dict with 'segments' (one entry per finished batch) and 'state'
+        (free-form progress information of the caller)
+    """
+    journal_dir = Path(journal_dir)
+    journal_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = journal_dir / MANIFEST_NAME
+
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+        if manifest.get('version') != JOURNAL_VERSION:
+            raise ValueError(f"Unbekannte Journal-Version in {manifest_path}: {manifest.get('version')}")
+    else:
+        manifest = {'version': JOURNAL_VERSION, 'created': time.time(), 'segments': [], 'state': {}}
+
+    manifest['journal_dir'] = str(journal_dir)
+    return manifest
+
+
+def completed_batches(manifest):
+    """Batch numbers that are already in the journal"""
+    return {segment['batch'] for segment in manifest['segments']}
+
+
+def total_rows(manifest):
+    return sum(segment['rows'] for segment in manifest['segments'])
+
+
+def _to_parquet_frame(df):
+    """Path objects -> str, Parquet cannot store them"""
+    df = df.copy()
+    for column in df.columns[df.dtypes == object]:
+        if df[column].map(lambda value: isinstance(value, PurePath)).any():
+            df[column] = df[column].map(lambda value: str(value) if isinstance(value, PurePath) else value)
+    return df
+
+
+def append_segment(manifest, batch, df, state=None):
+    """Write the results of one batch and commit them in the manifest
+
+    Args:
+        manifest: dict from open_journal (updated in place)
+        batch: batch number (a batch that is already in the journal is replaced)
+        df: results of the batch
+        state: optional dict stored as manifest['state'] in the same atomic step
+    """
+    journal_dir = Path(manifest['journal_dir'])
+    file_name = f'segment_{batch:05d}.parquet'
+    _write_atomic(journal_dir / file_name, lambda tmp: _to_parquet_frame(df).to_parquet(tmp, index=False))
+
+    manifest['segments'] = [s for s in manifest['segments'] if s['batch'] != batch]
+    manifest['segments'].append({'batch': batch, 'file': file_name, 'rows': len(df), 'written': time.time()})
+    manifest['segments'].sort(key=lambda s: s['batch'])
+    if state is not None:
+        manifest['state'] = state
+    _write_manifest(manifest)
+
+
+def update_state(manifest, state):
+    """Only update the progress information (e.g. after an error)"""
+    manifest['state'] = state
+    _write_manifest(manifest)
+
+
+def read_journal(manifest, columns=None):
+    """All committed segments as one DataFrame (in batch order)
+
+    Args:
+        columns: optional list of columns to read
+    """
+    journal_dir = Path(manifest['journal_dir'])
+    frames = [pd.read_parquet(journal_dir / s['file'], columns=columns) for s in manifest['segments']]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,92 @@
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+import checkpoint_journal
+from checkpoint_journal import (append_segment, completed_batches, open_journal, read_journal, total_rows,
+                                update_state)
+
+def batch_frame(batch, rows=3):
+    return pd.DataFrame({
+        'filename': [f"logo_{batch}_{i}.png" for i in range(rows)],
+        'logo_path': [Path('logos') / f"logo_{batch}_{i}.png" for i in range(rows)],
+        'score': [batch + i / 10 for i in range(rows)],
+    })
+
+def test_append_and_read():
+    """Segments are read back in batch order, a repeated batch replaces its segment."""
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = open_journal(Path(tmp) / 'journal')
+        for batch in (2, 1, 3):
+            append_segment(manifest, batch, batch_frame(batch), state={'last_batch': batch})
+        append_segment(manifest, 2, batch_frame(2, rows=1))
+
+        df = read_journal(manifest)
+        assert df['filename'].tolist() == [f"logo_{b}_{i}.png" for b, rows in ((1, 3), (2, 1), (3, 3)) for i in range(rows)]
+        assert df['logo_path'].tolist() == [str(Path('logos') / name) for name in df['filename']]
+        assert read_journal(manifest, columns=['score']).columns.tolist() == ['score']
+
+        # A new process sees the same journal
+        reopened = open_journal(Path(tmp) / 'journal')
+        assert completed_batches(reopened) == {1, 2, 3}
+        assert total_rows(reopened) == len(df) == 7
+        assert reopened['state'] == {'last_batch': 3}
+        update_state(reopened, {'error': 'stopped'})
+        assert open_journal(Path(tmp) / 'journal')['state'] == {'error': 'stopped'}
+
+        assert read_journal(open_journal(Path(tmp) / 'empty')).empty
+
+    print("Journal segments are appended, replaced and read in batch order")
+
+def test_crash_keeps_committed_state():
+    """A batch that fails while its segment or the manifest is written leaves the journal as before."""
+
+    with tempfile.TemporaryDirectory() as tmp:
+        journal_dir = Path(tmp) / 'journal'
+        manifest = open_journal(journal_dir)
+        append_segment(manifest, 1, batch_frame(1), state={'last_batch': 1})
+        manifest_before = (journal_dir / 'manifest.json').read_text(encoding='utf-8')
+
+        # Segment write fails (a column Parquet cannot store)
+        broken = batch_frame(2).assign(score=[1, 'two', object()])
+        failed = False
+        try:
+            append_segment(manifest, 2, broken, state={'last_batch': 2})
+        except Exception:
+            failed = True
+        assert failed and not (journal_dir / 'segment_00002.parquet').exists()
+
+        # Segment written, crash before the new manifest replaces the old one: the segment is not committed
+        replace = checkpoint_journal.os.replace
+
+        def crash_on_manifest(src, dst):
+            if Path(dst).name == 'manifest.json':
+                raise KeyboardInterrupt
+            replace(src, dst)
+
+        checkpoint_journal.os.replace = crash_on_manifest
+        failed = False
+        try:
+            append_segment(open_journal(journal_dir), 2, batch_frame(2), state={'last_batch': 2})
+        except KeyboardInterrupt:
+            failed = True
+        finally:
+            checkpoint_journal.os.replace = replace
+        assert failed and (journal_dir / 'segment_00002.parquet').exists()
+        assert (journal_dir / 'manifest.json').read_text(encoding='utf-8') == manifest_before
+
+        reopened = open_journal(journal_dir)
+        assert completed_batches(reopened) == {1}
+        assert read_journal(reopened)['filename'].tolist() == batch_frame(1)['filename'].tolist()
+
+        # Running the batch again overwrites the uncommitted segment
+        append_segment(reopened, 2, batch_frame(2, rows=2))
+        assert total_rows(open_journal(journal_dir)) == 5
+
+    print("Failed segment and manifest writes leave the committed journal unchanged")
+
+if __name__ == "__main__":
+    test_append_and_read()
+    test_crash_keeps_committed_state()
@@ -1,20 +1,247 @@
 import pandas as pd
+import numpy as np
 import re
+import os
+import hashlib
+import importlib
+import pickle
 from collections import defaultdict
-import random
-from consolidation_maps import get_consolidated_map
+from pathlib import Path
 from text import normalize_single_tag
+from tag_vocab import append_tags, build_tag_matrix, render_tags
 
-# Get the merged consolidation map
-consolidation_map = get_consolidated_map()
+# Bump when the structure of the compiled lookup changes (invalidates persisted lookups)
+LOOKUP_VERSION = 1
+CONSOLIDATION_MAPS_PATH = Path(__file__).with_name('consolidation_maps.py')
+
+# Compiled lookup, built or loaded once per process
+_lookup = None
 
 def normalize_category(category):
     """Normalisiert Kategorienamen für besseren Vergleich"""
     return re.sub(r'[^\w\s]', '', category.lower().strip()).replace('_', ' ')
 
+def get_lookup_key():
+    """Schlüssel für die kompilierte Lookup: Hash des Quelltexts von consolidation_maps.py + LOOKUP_VERSION"""
+    digest = hashlib.sha256(CONSOLIDATION_MAPS_PATH.read_bytes()).hexdigest()[:16]
+    return f"v{LOOKUP_VERSION}_{digest}"
+
+def build_consolidation_lookup():
+    """Kompiliert alle Tabellen, die für die Konsolidierung gebraucht werden
+    
+    Returns:
+        dict mit
+            consolidation_map: gemergte consolidation_map {consolidated_category: [variations]}
+            category_to_main: Reverse-Index {variation: consolidated_category}
+            partial_match_index: Index für das partielle Matching (siehe build_partial_match_index)
+            main_category_map: {normalisierte consolidated_category: main_category}
+            main_category_keywords: {main_category: [keywords]} für map_category_to_main
+            main_category_matcher: kompilierter Keyword-Matcher (siehe build_keyword_matcher)
+            conflicts: {variation: [consolidated_categories]} für Variationen unter mehreren Kategorien;
+                gewinnt jeweils die letzte Kategorie
+    """
+    from consolidation_maps import get_consolidated_map, main_category_groups, main_category_keywords
+    
+    consolidation_map = get_consolidated_map()
+    
+    # Create reverse mapping from original categories to consolidated categories
+    category_to_main = {}
+    owners = defaultdict(list)
+    for main_cat, variations in consolidation_map.items():
+        for variation in variations:
+            category_to_main[variation] = main_cat
+            if main_cat not in owners[variation]:
+                owners[variation].append(main_cat)
+    conflicts = {variation: cats for variation, cats in owners.items() if len(cats) > 1}
+    
+    main_category_map = {}
+    for main_cat, keys in main_category_groups.items():
+        for key in keys:
+            main_category_map[normalize_category(key)] = main_cat
+    
+    return {
+        'consolidation_map': consolidation_map,
+        'category_to_main': category_to_main,
+        'partial_match_index': build_partial_match_index(category_to_main),
+        'main_category_map': main_category_map,
+        'main_category_keywords': main_category_keywords,
+        'main_category_matcher': build_keyword_matcher(main_category_keywords),
+        'conflicts': conflicts,
+    }
+
+def build_keyword_matcher(keyword_buckets):
+    """Kompiliert alle Keywords zu einem einzigen Multi-Pattern-Matcher
+    
+    Die Alternativen stehen in Prioritätsreihenfolge (Bucket-Reihenfolge, dann Keyword-Reihenfolge).
+    Der Lookahead findet an jeder Position das Keyword mit der höchsten Priorität, auch überlappend.
+    
+    Returns:
+        (pattern, keyword_priority) mit keyword_priority {keyword: (priority, main_category)}
+    """
+    keyword_priority = {}
+    for main_cat, keywords in keyword_buckets.items():
+        for kw in keywords:
+            # The first bucket containing a keyword wins
+            keyword_priority.setdefault(kw, (len(keyword_priority), main_cat))
+    ordered = sorted(keyword_priority, key=lambda kw: keyword_priority[kw][0])
+    pattern = re.compile('(?=(' + '|'.join(re.escape(kw) for kw in ordered) + '))')
+    return pattern, keyword_priority
+
+def match_keyword_bucket(text, matcher):
+    """Liefert den Bucket des Keywords mit der höchsten Priorität, das in `text` vorkommt (sonst None)"""
+    pattern, keyword_priority = matcher
+    best = None
+    for match in pattern.finditer(text):
+        priority, main_cat = keyword_priority[match.group(1)]
+        if best is None or priority < best[0]:
+            best = (priority, main_cat)
+            if priority == 0:
+                break
+    return best[1] if best else None
+
+def get_consolidation_lookup(cache_dir=None, reload=False):
+    """Liefert die kompilierte Lookup, einmal pro Prozess gebaut
+    
+    Args:
+        cache_dir: Optionaler Ordner, in dem die Lookup als Pickle gespeichert wird.
+            Standard ist die Umgebungsvariable CONSOLIDATION_LOOKUP_CACHE (falls gesetzt).
+            Die Datei ist an den Hash von consolidation_maps.py gebunden und wird bei
+            Änderungen der Maps neu gebaut.
+        reload: Lookup neu laden, z.B. nachdem consolidation_maps.py im Notebook geändert wurde
+    """
+    global _lookup
+    if _lookup is not None and not reload:
+        return _lookup
+    
+    if reload:
+        import consolidation_maps
+        importlib.reload(consolidation_maps)
+    
+    key = get_lookup_key()
+    cache_dir = cache_dir or os.environ.get('CONSOLIDATION_LOOKUP_CACHE')
+    cache_path = Path(cache_dir) / f"consolidation_lookup_{key}.pkl" if cache_dir else None
+    
+    lookup = None
+    if cache_path is not None and cache_path.exists():
+        try:
+            with open(cache_path, 'rb') as f:
+                lookup = pickle.load(f)
+        except Exception as e:
+            print(f"⚠️ Could not load consolidation lookup from {cache_path}: {e}")
+    
+    if lookup is None:
+        lookup = build_consolidation_lookup()
+        if cache_path is not None:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first so parallel workers never read a partial file
+            tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(lookup, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+    
+    _lookup = lookup
+    return lookup
+
+def __getattr__(name):
+    # `from consolidation import consolidation_map` keeps working, built on first access
+    if name == 'consolidation_map':
+        return get_consolidation_lookup()['consolidation_map']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def build_partial_match_index(category_to_main):
+    """Baut die Indizes für das partielle Matching in consolidate_categories
+    
+    Args:
+        category_to_main: Dictionary {variation: consolidated_category}
+    
+    Returns:
+        dict mit
+            entries: Liste von (variation, consolidated_category, Wortmenge) in der Reihenfolge von category_to_main
+            token_index: {Wort: [Positionen in entries]} für die Jaccard-Kandidaten
+            length_index: {Länge: [Positionen in entries]} für die Substring-Kandidaten (Länge >= 3)
+    """
+    entries = []
+    token_index = defaultdict(list)
+    length_index = defaultdict(list)
+    for norm_cat, main_cat in category_to_main.items():
+        cat_words = frozenset(norm_cat.split())
+        # Entries without words can never match
+        if not cat_words:
+            continue
+        position = len(entries)
+        entries.append((norm_cat, main_cat, cat_words))
+        for word in cat_words:
+            token_index[word].append(position)
+        if len(norm_cat) >= 3:
+            length_index[len(norm_cat)].append(position)
+    return {
+        'entries': entries,
+        'token_index': dict(token_index),
+        'length_index': dict(length_index),
+    }
+
+def find_partial_match(normalized, index):
+    """Findet die beste partielle Übereinstimmung für eine normalisierte Kategorie
+    
+    Liefert dasselbe Ergebnis wie ein vollständiger Durchlauf über alle Einträge:
+    Bewertet werden nur Einträge mit gemeinsamem Wort (Jaccard) oder passender Länge (Substring).
+    
+    Returns:
+        (best_match, max_overlap) - best_match ist None, wenn keine Übereinstimmung > 0.5 gefunden wurde
+    """
+    norm_words = set(normalized.split())
+    if not norm_words:
+        return None, 0
+    
+    entries = index['entries']
+    candidates = set()
+    for word in norm_words:
+        candidates.update(index['token_index'].get(word, ()))
+    
+    # A substring match needs a length ratio > 0.7 in either direction
+    length = len(normalized)
+    if length >= 3:
+        length_index = index['length_index']
+        for cat_length in range(int(length * 0.7), int(length / 0.7) + 2):
+            for position in length_index.get(cat_length, ()):
+                norm_cat = entries[position][0]
+                if (norm_cat in normalized and cat_length / length > 0.7) or \
+                   (normalized in norm_cat and length / cat_length > 0.7):
+                    candidates.add(position)
+    
+    best_match = None
+    max_overlap = 0
+    # Score in the original order so that ties resolve to the same entry as before
+    for position in sorted(candidates):
+        norm_cat, main_cat, cat_words = entries[position]
+        overlap = 0
+        
+        # Common words (must have at least one common word)
+        common_words = norm_words.intersection(cat_words)
+        if common_words:
+            # Calculate Jaccard similarity (intersection over union)
+            union_words = norm_words.union(cat_words)
+            overlap = len(common_words) / len(union_words)
+        
+        # Substring matching (more strict - must be significant portion)
+        if len(norm_cat) >= 3 and length >= 3:  # Minimum length check
+            if (norm_cat in normalized and len(norm_cat) / length > 0.7) or \
+               (normalized in norm_cat and length / len(norm_cat) > 0.7):
+                overlap = max(overlap, 0.9)  # High confidence for good substring matches
+        
+        # Only accept matches with significant overlap and avoid weak matches
+        if overlap > max_overlap and overlap > 0.5:
+            max_overlap = overlap
+            best_match = main_cat
+    
+    return best_match, max_overlap
+
 def consolidate_categories(df):
     """Konsolidiert ähnliche Kategorien basierend auf der consolidation_map
     
+    Jede unterschiedliche Kategorie wird nur einmal aufgelöst und das Ergebnis
+    anschließend auf alle Zeilen übertragen.
+    
     Args:
         df: DataFrame mit einer 'category' Spalte und optional einer 'tags' Spalte
     
@@ -25,131 +252,79 @@ def consolidate_categories(df):
         unmatched_categories: Liste der Kategorien, die nicht gemappt werden konnten
         consolidation_mapping: Dictionary mit {consolidated_category: {'count': int, 'original_categories': [list]}}
     """
-    # Create reverse mapping from original categories to consolidated categories
-    category_to_main = {}
-    for main_cat, variations in consolidation_map.items():
-        for variation in variations:
-            category_to_main[variation] = main_cat
+    lookup = get_consolidation_lookup()
+    category_to_main = lookup['category_to_main']
+    partial_match_index = lookup['partial_match_index']
     
-    # Track unmatched categories and consolidation mapping
-    unmatched_categories = []
-    consolidation_mapping = defaultdict(lambda: {'count': 0, 'original_categories': []})
-    
-    def map_category(category):
-        """Map a single category to its consolidated form"""
-        if pd.isna(category):
-            return category
-        
-        original_category = str(category)
-        
-        # Normalize the category
-        normalized = normalize_category(original_category)
-        
-        # Debug: randomly enable debug output for categories
-        # debug_category = random.random() < 0.10  # 10% chance to enable debug output
-        # if debug_category:
-        #     print(f"DEBUG: Processing '{original_category}' -> normalized: '{normalized}'")
-        
+    def map_category(normalized):
+        """Map a single normalized category to its consolidated form (None if unmatched)"""
         # 1. Exact match
         if normalized in category_to_main:
-            consolidated = category_to_main[normalized]
-            # if debug_category:
-            #     print(f"DEBUG: Exact match found: '{normalized}' -> '{consolidated}'")
-            consolidation_mapping[consolidated]['count'] += 1
-            if original_category not in consolidation_mapping[consolidated]['original_categories']:
-                consolidation_mapping[consolidated]['original_categories'].append(original_category)
-            return consolidated
-        
-        # 2. Partial string matching
-        best_match = None
-        max_overlap = 0
+            return category_to_main[normalized]
         
-        for norm_cat, main_cat in category_to_main.items():
-            overlap = 0
-            norm_words = set(normalized.split())
-            cat_words = set(norm_cat.split())
-            
-            # Only proceed if there are actual words to compare
-            if not norm_words or not cat_words:
-                continue
-            
-            # Common words (must have at least one common word)
-            common_words = norm_words.intersection(cat_words)
-            if common_words:
-                # Calculate Jaccard similarity (intersection over union)
-                union_words = norm_words.union(cat_words)
-                overlap = len(common_words) / len(union_words)
-            
-            # Substring matching (more strict - must be significant portion)
-            if len(norm_cat) >= 3 and len(normalized) >= 3:  # Minimum length check
-                if (norm_cat in normalized and len(norm_cat) / len(normalized) > 0.7) or \
-                   (normalized in norm_cat and len(normalized) / len(norm_cat) > 0.7):
-                    overlap = max(overlap, 0.9)  # High confidence for good substring matches
-            
-            # Only accept matches with significant overlap and avoid weak matches
-            if overlap > max_overlap and overlap > 0.5:  # Increased threshold from 0.3 to 0.5
-                max_overlap = overlap
-                best_match = main_cat
-        
-        if best_match:
-            # if debug_category:
-            #     print(f"DEBUG: Partial match found: '{normalized}' -> '{best_match}' (overlap: {max_overlap:.3f})")
-            consolidation_mapping[best_match]['count'] += 1
-            if original_category not in consolidation_mapping[best_match]['original_categories']:
-                consolidation_mapping[best_match]['original_categories'].append(original_category)
-            return best_match
+        # 2. Partial string matching (only candidates from the index are scored)
+        best_match, _ = find_partial_match(normalized, partial_match_index)
+        return best_match
+    
+    # Create a copy of the DataFrame
+    result_df = df.copy()
+    
+    # Categories that are NA stay untouched and are not tracked
+    valid = result_df['category'].notna().to_numpy()
+    original = result_df['category'][valid].astype(str)
+    counts = original.value_counts()
+    
+    # Resolve each distinct category exactly once, in order of first appearance
+    unmatched_categories = []
+    consolidation_mapping = {}
+    unique_to_consolidated = {}
+    resolved = {}
+    for original_category in original.unique():
+        normalized = normalize_category(original_category)
+        if normalized not in resolved:
+            resolved[normalized] = map_category(normalized)
+        consolidated = resolved[normalized]
         
         # If no match found, track as unmatched and keep the original category
-        # if debug_category:
-        #     print(f"DEBUG: No match found for '{normalized}', keeping original")
-        if original_category not in unmatched_categories:
+        if consolidated is None:
             unmatched_categories.append(original_category)
-        consolidation_mapping[original_category]['count'] += 1
-        if original_category not in consolidation_mapping[original_category]['original_categories']:
-            consolidation_mapping[original_category]['original_categories'].append(original_category)
-        return original_category
-    
-    # Create a copy of the DataFrame and apply the mapping
-    result_df = df.copy()
+            consolidated = original_category
+        
+        unique_to_consolidated[original_category] = consolidated
+        entry = consolidation_mapping.setdefault(consolidated, {'count': 0, 'original_categories': []})
+        entry['count'] += int(counts[original_category])
+        entry['original_categories'].append(original_category)
     
-    # Check if tags column exists
-    has_tags = 'tags' in result_df.columns
+    # Broadcast the consolidated categories back to all rows
+    consolidated_values = original.map(unique_to_consolidated).to_numpy(dtype=object)
+    category_values = result_df['category'].to_numpy(dtype=object, copy=True)
+    category_values[valid] = consolidated_values
+    result_df['category'] = category_values
     
-    # Apply category mapping and update tags if present
-    def process_row(row):
-        original_category = row['category']
-        consolidated_category = map_category(original_category)
+    # Add the original category to the tags only if the category actually changed
+    if 'tags' in result_df.columns:
+        tag_to_add = {
+            original_category: normalize_single_tag(original_category)
+            for original_category, consolidated in unique_to_consolidated.items()
+            if consolidated != 'unclassified'
+            and normalize_category(str(consolidated)) != normalize_category(original_category)
+        }
+        changed = original.isin(tag_to_add.keys()).to_numpy()
         
-        # Update the category
-        row['category'] = consolidated_category
+        tag_values = result_df['tags'].to_numpy(dtype=object, copy=True)
+        positions = np.flatnonzero(valid)[changed]
         
-        # Add consolidated category to tags only if the category actually changed
-        if (has_tags and 
-            consolidated_category != 'unclassified' and 
-            normalize_category(str(consolidated_category)) != normalize_category(str(original_category))):
-            
-            current_tags = row.get('tags', '')
-            if pd.isna(current_tags):
-                current_tags = ''
-            
-            # Parse existing tags
-            existing_tags = [tag.strip() for tag in str(current_tags).split(',') if tag.strip()]
-            
-            # Add consolidated category if not already present
-            if consolidated_category not in existing_tags:
-                existing_tags.append(normalize_single_tag(original_category))
-                row['tags'] = ', '.join(existing_tags)
-
-                # Random debug output (1% chance)
-                if random.random() < 0.01:
-                    print(f"DEBUG TAG ADD: '{original_category}' -> '{consolidated_category}' | Tags: {existing_tags}")
-            
-        return row
-    
-    # Apply the processing to each row
-    result_df = result_df.apply(process_row, axis=1)
-    
-    return result_df, unmatched_categories, dict(consolidation_mapping)
+        # Append the tag unless the consolidated category is already one of the row's tags
+        tag_matrix = build_tag_matrix(pd.Series(tag_values[positions]), normalize=False)
+        tag_matrix, appended = append_tags(
+            tag_matrix,
+            original[changed].map(tag_to_add).tolist(),
+            skip_if_present=consolidated_values[changed],
+        )
+        tag_values[positions[appended]] = render_tags(tag_matrix).to_numpy()[appended]
+        result_df['tags'] = tag_values
+    
+    return result_df, unmatched_categories, consolidation_mapping
 
 def analyze_categories(df):
     """Analysiert die ursprünglichen Kategorien um Muster zu erkennen"""
@@ -176,80 +351,27 @@ def map_category_to_main(category):
 
     cat = normalize_category(str(category))
 
-    grouped_map = {
-        'real_estate_construction': [
-            'real_estate_residential', 'real_estate_commercial', 'real_estate_development',
-            'construction_general', 'construction_home', 'construction_specialty', 'construction_materials'
-        ],
-        'food_beverage': [
-            'restaurant_dining', 'cafe_coffee', 'bar_nightlife', 'brewery_alcohol', 'catering_events',
-            'food_production', 'grocery_retail', 'beverage_general'
-        ],
-        'tech': [
-            'software_development', 'web_digital', 'it_services', 'telecommunications', 'fintech_crypto',
-            'data_analytics', 'tech_hardware'
-        ],
-        'health': [
-            'healthcare_general', 'dental_services', 'medical_specialty', 'wellness_fitness',
-            'mental_health', 'veterinary'
-        ],
-        'education': [
-            'education_k12', 'higher_education', 'training_development', 'educational_services'
-        ],
-        'retail_hospitality': [
-            'retail_general', 'ecommerce_online', 'hotels_lodging', 'hospitality_services',
-            'fashion_apparel', 'home_goods'
-        ],
-        'professional_financial_legal': [
-            'financial_services', 'accounting_tax', 'insurance_services', 'legal_services',
-            'consulting_business', 'marketing_advertising'
-        ],
-        'manufacturing_transport': [
-            'manufacturing_general', 'automotive_transport', 'vehicle_sales', 'transportation_services',
-            'import_export', 'chemical_materials', 'energy_utilities'
-        ],
-        'entertainment_sports_media': [
-            'music_industry', 'film_video', 'arts_culture', 'entertainment_venues', 'sports_recreation',
-            'gaming_entertainment', 'media_publishing'
-        ],
-        'other': ['unclassified']
-    }
-
-    explicit_map = {}
-    for main_cat, keys in grouped_map.items():
-        for key in keys:
-            explicit_map[normalize_category(key)] = main_cat
-
+    lookup = get_consolidation_lookup()
+    explicit_map = lookup['main_category_map']
     if cat in explicit_map:
         return explicit_map[cat]
 
-    keyword_buckets = {
-        'real_estate_construction': ['real', 'estate', 'property', 'construction', 'builder', 'developer', 'contractor', 'housing', 'residential', 'commercial'],
-        'food_beverage': ['restaurant', 'cafe', 'coffee', 'bar', 'beer', 'brewery', 'food', 'grocery', 'catering', 'beverage', 'deli', 'bakery'],
-        'tech': ['software', 'web', 'digital', 'it', 'tech', 'data', 'analytics', 'cloud', 'saas', 'blockchain', 'crypto', 'ai', 'machine', 'telecom', 'telecommunications'],
-        'health': ['health', 'medical', 'clinic', 'dental', 'vet', 'veterinary', 'wellness', 'fitness', 'therapy', 'hospital', 'med'],
-        'education': ['school', 'education', 'academy', 'university', 'college', 'training', 'tutoring', 'learning'],
-        'retail_hospitality': ['retail', 'shop', 'store', 'boutique', 'hotel', 'lodging', 'hospitality', 'fashion', 'ecommerce', 'home'],
-        'professional_financial_legal': ['finance', 'financial', 'bank', 'accounting', 'insurance', 'legal', 'law', 'consult', 'marketing', 'hr', 'human resources'],
-        'manufacturing_transport': ['manufactur', 'factory', 'industrial', 'vehicle', 'automotive', 'transport', 'logistic', 'shipping', 'energy', 'chemical'],
-        'entertainment_sports_media': ['music', 'film', 'movie', 'media', 'entertain', 'sport', 'gaming', 'theatre', 'arts'],
-        'other': ['community', 'religion', 'government', 'nonprofit', 'charity', 'unclass', 'other', 'misc', 'service']
-    }
-
-    for main_cat, keywords in keyword_buckets.items():
-        for kw in keywords:
-            if kw in cat:
-                return main_cat
-
-    return 'other'
+    main_cat = match_keyword_bucket(cat, lookup['main_category_matcher'])
+    return main_cat if main_cat is not None else 'other'
 
 
 def add_main_category_column(df, source_col='category', target_col='category_main'):
-    """Add a column to the DataFrame with the main consolidated category."""
+    """Add a column to the DataFrame with the main consolidated category.
+
+    Each distinct category is mapped once, the result is broadcast to all rows.
+    """
     result = df.copy()
     if source_col not in result.columns:
         raise ValueError(f"Source column '{source_col}' not found in dataframe")
 
-    result[target_col] = result[source_col].apply(map_category_to_main)
+    # NA values get code -1, which picks the trailing 'other'
+    codes, uniques = pd.factorize(result[source_col])
+    main_categories = np.array([map_category_to_main(value) for value in uniques] + ['other'], dtype=object)
+    result[target_col] = main_categories[codes]
     return result
 
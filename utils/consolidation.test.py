@@ -0,0 +1,188 @@
+import random
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import consolidation
+from consolidation import (consolidate_categories, find_partial_match, get_consolidation_lookup, match_keyword_bucket,
+                           normalize_category)
+from text import normalize_single_tag
+
+def full_scan_partial_match(normalized, category_to_main):
+    """Partial matching as before the index: score every entry of category_to_main."""
+    best_match = None
+    max_overlap = 0
+    for norm_cat, main_cat in category_to_main.items():
+        overlap = 0
+        norm_words = set(normalized.split())
+        cat_words = set(norm_cat.split())
+        if not norm_words or not cat_words:
+            continue
+        common_words = norm_words.intersection(cat_words)
+        if common_words:
+            overlap = len(common_words) / len(norm_words.union(cat_words))
+        if len(norm_cat) >= 3 and len(normalized) >= 3:
+            if (norm_cat in normalized and len(norm_cat) / len(normalized) > 0.7) or \
+               (normalized in norm_cat and len(normalized) / len(norm_cat) > 0.7):
+                overlap = max(overlap, 0.9)
+        if overlap > max_overlap and overlap > 0.5:
+            max_overlap = overlap
+            best_match = main_cat
+    return best_match, max_overlap
+
+def partial_match_examples(category_to_main, n=300, seed=0):
+    """Known categories with changed words, cut ends and unknown words (plus edge cases)."""
+    rng = random.Random(seed)
+    keys = list(category_to_main)
+    examples = ['', ' ', 'x', 'ab', 'abc', 'zzz unknown category', 'tech', 'coffee shop and bar']
+    for _ in range(n):
+        words = rng.choice(keys).split()
+        change = rng.randrange(4)
+        if change == 0 and len(words) > 1:
+            words.pop(rng.randrange(len(words)))
+        elif change == 1:
+            words.append(rng.choice(['services', 'group', 'studio', 'xyz']))
+        elif change == 2:
+            words = words + rng.choice(keys).split()
+        text = ' '.join(words)
+        if change == 3 and len(text) > 4:
+            text = text[1:-1]
+        examples.append(normalize_category(text))
+    return examples
+
+def test_partial_match_index():
+    """find_partial_match must return the same match and overlap as the full scan."""
+
+    lookup = get_consolidation_lookup()
+    category_to_main = lookup['category_to_main']
+    examples = partial_match_examples(category_to_main)
+
+    for normalized in examples:
+        expected = full_scan_partial_match(normalized, category_to_main)
+        actual = find_partial_match(normalized, lookup['partial_match_index'])
+        assert actual == expected, f"Mismatch for {normalized!r}: {actual} != {expected}"
+
+    print(f"find_partial_match matches the full scan for {len(examples)} categories")
+
+def row_by_row_consolidation(df, category_to_main):
+    """consolidate_categories as before: every row resolved and its tags updated on its own."""
+    unmatched, mapping = [], {}
+    categories, tags = [], []
+    for category, current_tags in zip(df['category'], df['tags']):
+        if pd.isna(category):
+            categories.append(category)
+            tags.append(current_tags)
+            continue
+        original = str(category)
+        normalized = normalize_category(original)
+        consolidated = category_to_main.get(normalized) or full_scan_partial_match(normalized, category_to_main)[0]
+        if consolidated is None:
+            consolidated = original
+            if original not in unmatched:
+                unmatched.append(original)
+        entry = mapping.setdefault(consolidated, {'count': 0, 'original_categories': []})
+        entry['count'] += 1
+        if original not in entry['original_categories']:
+            entry['original_categories'].append(original)
+
+        if consolidated != 'unclassified' and normalize_category(consolidated) != normalize_category(original):
+            existing = [tag.strip() for tag in str('' if pd.isna(current_tags) else current_tags).split(',') if tag.strip()]
+            if consolidated not in existing:
+                current_tags = ', '.join(existing + [normalize_single_tag(original)])
+        categories.append(consolidated)
+        tags.append(current_tags)
+    return categories, tags, unmatched, mapping
+
+def test_consolidate_categories():
+    """Resolving each distinct category once must give the same rows as resolving every row."""
+
+    lookup = get_consolidation_lookup()
+    category_to_main = lookup['category_to_main']
+    rng = random.Random(1)
+    distinct = partial_match_examples(category_to_main, n=40, seed=1) + ['Tech & IT', 'Coffee Shop', 'Unknown Thing']
+    distinct = [category for category in distinct if category.strip()]
+    categories = [rng.choice(distinct) for _ in range(500)] + [None, np.nan]
+    tags = [rng.choice(['', 'modern, tech', 'food', None, np.nan, 'coffee shop, bar', 'software development'])
+            for _ in categories]
+    df = pd.DataFrame({'category': categories, 'tags': tags})
+
+    result_df, unmatched, mapping = consolidate_categories(df)
+    expected_categories, expected_tags, expected_unmatched, expected_mapping = row_by_row_consolidation(df, category_to_main)
+
+    for i, (actual, expected) in enumerate(zip(result_df['category'], expected_categories)):
+        assert actual == expected or (pd.isna(actual) and pd.isna(expected)), f"Row {i}: {actual!r} != {expected!r}"
+    for i, (actual, expected) in enumerate(zip(result_df['tags'], expected_tags)):
+        assert actual == expected or (pd.isna(actual) and pd.isna(expected)), f"Tags of row {i}: {actual!r} != {expected!r}"
+    assert unmatched == expected_unmatched
+    assert mapping == expected_mapping
+
+    print(f"consolidate_categories matches row-by-row resolution for {len(df)} rows "
+          f"({len(set(distinct))} distinct categories)")
+
+def test_lookup_cache():
+    """The lookup is built from consolidation_maps once and read back unchanged from the pickle."""
+
+    from consolidation_maps import get_consolidated_map
+
+    with tempfile.TemporaryDirectory() as tmp:
+        built = get_consolidation_lookup(cache_dir=tmp, reload=True)
+        cache_files = list(Path(tmp).glob('consolidation_lookup_*.pkl'))
+        assert [p.name for p in cache_files] == [f"consolidation_lookup_{consolidation.get_lookup_key()}.pkl"]
+
+        # A second process only reads the pickle
+        build = consolidation.build_consolidation_lookup
+        consolidation._lookup = None
+        consolidation.build_consolidation_lookup = None
+        try:
+            loaded = get_consolidation_lookup(cache_dir=tmp)
+        finally:
+            consolidation.build_consolidation_lookup = build
+        assert loaded is not built
+        for name in ('consolidation_map', 'category_to_main', 'main_category_map', 'main_category_keywords', 'conflicts'):
+            assert loaded[name] == built[name], f"{name} differs after loading the pickle"
+        assert loaded['main_category_matcher'][0].pattern == built['main_category_matcher'][0].pattern
+
+    # Reverse index: every variation points to its (last) consolidated category
+    expected = {}
+    for consolidated, variations in get_consolidated_map().items():
+        for variation in variations:
+            expected[variation] = consolidated
+    assert built['category_to_main'] == expected
+    for variation, owners in built['conflicts'].items():
+        assert len(owners) > 1 and expected[variation] == owners[-1]
+    assert consolidation.consolidation_map == built['consolidation_map']
+
+    print(f"Consolidation lookup with {len(expected)} variations survives the pickle cache")
+
+def keyword_loop(text, keyword_buckets):
+    """Main category keywords as before the matcher: first bucket and keyword that occurs in text."""
+    for main_cat, keywords in keyword_buckets.items():
+        for kw in keywords:
+            if kw in text:
+                return main_cat
+    return None
+
+def test_keyword_matcher():
+    """match_keyword_bucket must pick the same bucket as the nested keyword loop."""
+
+    lookup = get_consolidation_lookup()
+    keyword_buckets = lookup['main_category_keywords']
+    texts = list(lookup['category_to_main']) + list(lookup['category_to_main'].values()) + [
+        '', 'itself', 'health tech', 'hospitality', 'vet clinic and bakery', 'unclassified', 'a b c',
+        'medical data analytics', 'sportswear retail', 'human resources consulting',
+    ]
+
+    for text in texts:
+        expected = keyword_loop(text, keyword_buckets)
+        actual = match_keyword_bucket(text, lookup['main_category_matcher'])
+        assert actual == expected, f"Mismatch for {text!r}: {actual} != {expected}"
+
+    print(f"match_keyword_bucket matches the keyword loop for {len(texts)} texts")
+
+if __name__ == "__main__":
+    test_partial_match_index()
+    test_consolidate_categories()
+    test_lookup_cache()
+    test_keyword_matcher()
@@ -133,3 +133,57 @@ consolidation_map = {
     'wellness_fitness': ["acupuncture", "alternative holistic health service", "alternative medicine", "bodybuilding", "chiropractic", "chiropractic wellness", "dietary supplement", "dietary supplements", "fitness", "fitness center", "fitness club", "fitness education", "fitness equipment", "fitness health", "fitness leisure", "fitness studio", "fitness training", "gym", "health and well being", "health and wellness", "health club", "health coach", "health fitness", "health foods", "holistic", "holistic health", "holistic wellness", "massage", "massage therapy", "maternity", "meditation", "naturopathy", "nutrition", "nutrition consulting", "nutrition fitness", "nutrition health", "nutritional manufacturing", "nutritional research", "personal fitness", "personal professional", "physical therapy", "pilates", "pilates studio", "pysiotherapy", "spa", "sports and recreation", "weight management", "wellbeing", "wellness", "wellness center", "wellness fitness", "wellness spa", "yoga", "yoga instruction", "yoga therapy", "yoga wellness"],
     'wholesale_distribution': ["commerce exchange", "commodities", "distributing", "distribution", "distribution and fulfillment", "distribution services", "distributor", "food distributor", "food packaging distribution", "fulfillment", "import export", "liquor", "logistics", "paper merchant", "supply chain", "trading warehouse", "tropical fruit wholesaler", "warehousing", "wholesale", "wholesale bakery", "wholesale distribution", "wholesale grocery", "wholesale market", "wholesale seafood", "wholesale tile", "wine distributor"]
 }
+
+# Main categories: consolidated categories grouped into 10 main categories
+main_category_groups = {
+    'real_estate_construction': [
+        'real_estate_residential', 'real_estate_commercial', 'real_estate_development',
+        'construction_general', 'construction_home', 'construction_specialty', 'construction_materials'
+    ],
+    'food_beverage': [
+        'restaurant_dining', 'cafe_coffee', 'bar_nightlife', 'brewery_alcohol', 'catering_events',
+        'food_production', 'grocery_retail', 'beverage_general'
+    ],
+    'tech': [
+        'software_development', 'web_digital', 'it_services', 'telecommunications', 'fintech_crypto',
+        'data_analytics', 'tech_hardware'
+    ],
+    'health': [
+        'healthcare_general', 'dental_services', 'medical_specialty', 'wellness_fitness',
+        'mental_health', 'veterinary'
+    ],
+    'education': [
+        'education_k12', 'higher_education', 'training_development', 'educational_services'
+    ],
+    'retail_hospitality': [
+        'retail_general', 'ecommerce_online', 'hotels_lodging', 'hospitality_services',
+        'fashion_apparel', 'home_goods'
+    ],
+    'professional_financial_legal': [
+        'financial_services', 'accounting_tax', 'insurance_services', 'legal_services',
+        'consulting_business', 'marketing_advertising'
+    ],
+    'manufacturing_transport': [
+        'manufacturing_general', 'automotive_transport', 'vehicle_sales', 'transportation_services',
+        'import_export', 'chemical_materials', 'energy_utilities'
+    ],
+    'entertainment_sports_media': [
+        'music_industry', 'film_video', 'arts_culture', 'entertainment_venues', 'sports_recreation',
+        'gaming_entertainment', 'media_publishing'
+    ],
+    'other': ['unclassified']
+}
+
+# Keywords for categories without explicit main category (checked in this order)
+main_category_keywords = {
+    'real_estate_construction': ['real', 'estate', 'property', 'construction', 'builder', 'developer', 'contractor', 'housing', 'residential', 'commercial'],
+    'food_beverage': ['restaurant', 'cafe', 'coffee', 'bar', 'beer', 'brewery', 'food', 'grocery', 'catering', 'beverage', 'deli', 'bakery'],
+    'tech': ['software', 'web', 'digital', 'it', 'tech', 'data', 'analytics', 'cloud', 'saas', 'blockchain', 'crypto', 'ai', 'machine', 'telecom', 'telecommunications'],
+    'health': ['health', 'medical', 'clinic', 'dental', 'vet', 'veterinary', 'wellness', 'fitness', 'therapy', 'hospital', 'med'],
+    'education': ['school', 'education', 'academy', 'university', 'college', 'training', 'tutoring', 'learning'],
+    'retail_hospitality': ['retail', 'shop', 'store', 'boutique', 'hotel', 'lodging', 'hospitality', 'fashion', 'ecommerce', 'home'],
+    'professional_financial_legal': ['finance', 'financial', 'bank', 'accounting', 'insurance', 'legal', 'law', 'consult', 'marketing', 'hr', 'human resources'],
+    'manufacturing_transport': ['manufactur', 'factory', 'industrial', 'vehicle', 'automotive', 'transport', 'logistic', 'shipping', 'energy', 'chemical'],
+    'entertainment_sports_media': ['music', 'film', 'movie', 'media', 'entertain', 'sport', 'gaming', 'theatre', 'arts'],
+    'other': ['community', 'religion', 'government', 'nonprofit', 'charity', 'unclass', 'other', 'misc', 'service']
+}
@@ -0,0 +1,171 @@
+"""Persistent store for image analysis results (SQLite).
+
+Results are keyed by the content hash of the image file and the analyzer version, so a
+rerun of `filter_minimalistic_logos.ipynb` only analyses new or changed images, and a
+change of the thresholds or the score only needs a lookup. Renamed or copied files hit
+the same entry, a new analyzer version (see images.ANALYZER_VERSION) misses on purpose.
+
+The `files` table remembers the hash per path together with size and mtime, so unchanged
+files are not read again.
+
+Example:
+    conn = connect_feature_store(results_path / 'feature_store.sqlite')
+    hashes = file_hashes(conn, paths)
+    cached = lookup_features(conn, hashes, version)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+
+# SQLite limit for host parameters per statement (older versions: 999)
+_QUERY_CHUNK = 900
+
+# Connections per (path, pid), so forked workers never share a connection
+_connections = {}
+
+
+def content_hash(data):
+    """Hash of the raw file content (hex, 32 chars)"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def connect_feature_store(path):
+    """Open (and create) the feature store, one connection per process and path"""
+    key = (str(path), os.getpid())
+    if key in _connections:
+        return _connections[key]
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=60)
+    # WAL: readers do not block the writer, several processes can use the store
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS features (
+            content_hash TEXT NOT NULL,
+            analyzer_version TEXT NOT NULL,
+            metrics TEXT NOT NULL,
+            PRIMARY KEY (content_hash, analyzer_version)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            content_hash TEXT NOT NULL
+        )
+    """)
+    conn.commit()
+    _connections[key] = conn
+    return conn
+
+
+def _chunks(values, size=_QUERY_CHUNK):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def file_hashes(conn, paths):
+    """Content hashes for a list of files
+
+    Files whose size and mtime match the `files` table are not read again.
+
+    Returns:
+        list of hashes in the order of `paths`
+    """
+    paths = [str(p) for p in paths]
+    known = {}
+    for chunk in _chunks(paths):
+        placeholders = ','.join('?' * len(chunk))
+        rows = conn.execute(
+            f"SELECT path, size, mtime_ns, content_hash FROM files WHERE path IN ({placeholders})", chunk
+        )
+        known.update({path: (size, mtime_ns, h) for path, size, mtime_ns, h in rows})
+
+    hashes = []
+    updates = []
+    for path in paths:
+        stat = os.stat(path)
+        entry = known.get(path)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            hashes.append(entry[2])
+            continue
+        h = content_hash(Path(path).read_bytes())
+        hashes.append(h)
+        updates.append((path, stat.st_size, stat.st_mtime_ns, h))
+
+    if updates:
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", updates)
+    return hashes
+
+
+def lookup_features(conn, hashes, analyzer_version):
+    """Stored metrics for the given hashes
+
+    Returns:
+        dict hash -> metrics dict (only hashes that are in the store)
+    """
+    found = {}
+    unique = list(dict.fromkeys(hashes))
+    for chunk in _chunks(unique):
+        placeholders = ','.join('?' * len(chunk))
+        rows = conn.execute(
+            f"SELECT content_hash, metrics FROM features "
+            f"WHERE analyzer_version = ? AND content_hash IN ({placeholders})",
+            [analyzer_version, *chunk]
+        )
+        found.update({h: json.loads(metrics) for h, metrics in rows})
+    return found
+
+
+def store_features(conn, hashes, metrics, analyzer_version):
+    """Save metrics (list of dicts, same order as `hashes`)"""
+    rows = [
+        (h, analyzer_version, json.dumps({k: _to_builtin(v) for k, v in m.items()}))
+        for h, m in zip(hashes, metrics)
+    ]
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO features VALUES (?, ?, ?)", rows)
+
+
+def _to_builtin(value):
+    """numpy scalars -> int/float for json"""
+    return value.item() if hasattr(value, 'item') else value
+
+
+def analyze_with_store(conn, paths, analyzer_version, analyze_missing):
+    """Look up all paths and only analyse the ones that are not stored yet
+
+    Args:
+        conn: connection from connect_feature_store
+        paths: list of image paths
+        analyzer_version: version string (images.analyzer_version)
+        analyze_missing: function list of paths -> DataFrame with one row of metrics per path
+            (e.g. a p_apply over analyze_logo_row); rows with all metrics 0 count as errors
+
+    Returns:
+        DataFrame with the metrics in the order of `paths` and a bool column 'cached'
+    """
+    hashes = file_hashes(conn, paths)
+    found = lookup_features(conn, hashes, analyzer_version)
+
+    missing = [i for i, h in enumerate(hashes) if h not in found]
+    computed_rows = {}
+    if missing:
+        computed = analyze_missing([paths[i] for i in missing])
+        computed_rows = dict(zip(missing, computed.to_dict('records')))
+        # Fallback rows (all metrics 0, decoding failed) are not stored
+        valid = [i for i in missing if any(computed_rows[i].values())]
+        store_features(conn, [hashes[i] for i in valid], [computed_rows[i] for i in valid], analyzer_version)
+
+    missing_set = set(missing)
+    result = pd.DataFrame([computed_rows[i] if i in computed_rows else found[h] for i, h in enumerate(hashes)])
+    result['cached'] = [i not in missing_set for i in range(len(paths))]
+    return result
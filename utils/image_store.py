@@ -0,0 +1,192 @@
+"""Packed image store: one memory-mapped uint8 array per folder instead of one PNG per logo.
+
+All images of a store have the same shape (e.g. 256x256x3), so the pixels live in a single
+`images.npy` (N, H, W, C) that is memory-mapped; `ids.json` keeps the slot order and
+`written.npy` marks the slots that contain an image. Reading or writing one logo by id is a
+dict lookup plus a slice of the memory map, without directory listings or PNG decoding.
+Slots are assigned when the store is created, so several worker processes can write
+different slots of the same store at the same time.
+
+Layout:
+    <store>/meta.json      size, channels, count
+    <store>/ids.json       ids in slot order
+    <store>/images.npy     uint8 (N, H, W, C), RGB
+    <store>/written.npy    uint8 (N,), 1 = slot contains an image
+
+Example:
+    store = create_image_store(store_path, ids, size=(256, 256))
+    put_image(store, image_id, pil_image)
+    img_bgr = get_image(open_image_store(store_path), image_id, bgr=True)
+    export_png(store, output_dir)
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+META_NAME = 'meta.json'
+IDS_NAME = 'ids.json'
+IMAGES_NAME = 'images.npy'
+WRITTEN_NAME = 'written.npy'
+STORE_VERSION = 1
+
+# Opened stores per process (path, mode) -> store, for worker processes
+_open_stores = {}
+
+
+def is_image_store(path):
+    return (Path(path) / META_NAME).exists()
+
+
+def create_image_store(path, ids, size=(256, 256), channels=3):
+    """Create an empty store with one slot per id (an existing store is replaced)
+
+    Args:
+        size: (width, height) like PIL
+        channels: 3 (RGB) or 1 (grayscale, e.g. line art maps)
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    ids = [str(i) for i in ids]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Ids im Image Store müssen eindeutig sein")
+
+    width, height = size
+    shape = (len(ids), height, width, channels)
+    np.lib.format.open_memmap(path / IMAGES_NAME, mode='w+', dtype=np.uint8, shape=shape).flush()
+    np.lib.format.open_memmap(path / WRITTEN_NAME, mode='w+', dtype=np.uint8, shape=(len(ids),)).flush()
+    (path / IDS_NAME).write_text(json.dumps(ids))
+
+    meta = {'version': STORE_VERSION, 'size': [width, height], 'channels': channels, 'count': len(ids)}
+    tmp_path = path / (META_NAME + '.tmp')
+    tmp_path.write_text(json.dumps(meta, indent=2))
+    os.replace(tmp_path, path / META_NAME)
+
+    for key in [key for key in _open_stores if key[0] == str(path)]:
+        del _open_stores[key]
+    return open_image_store(path, mode='r+')
+
+
+def open_image_store(path, mode='r'):
+    """Open a store ('r' read-only, 'r+' read/write), cached per process
+
+    Returns:
+        dict with 'path', 'images' (memmap), 'written' (memmap), 'ids', 'slots' (id -> slot),
+        'size' and 'channels'
+    """
+    key = (str(path), mode)
+    if key in _open_stores:
+        return _open_stores[key]
+
+    path = Path(path)
+    meta = json.loads((path / META_NAME).read_text())
+    if meta.get('version') != STORE_VERSION:
+        raise ValueError(f"Unbekannte Image-Store-Version in {path}: {meta.get('version')}")
+    ids = json.loads((path / IDS_NAME).read_text())
+    store = {
+        'path': str(path),
+        'images': np.load(path / IMAGES_NAME, mmap_mode=mode),
+        'written': np.load(path / WRITTEN_NAME, mmap_mode=mode),
+        'ids': ids,
+        'slots': {image_id: slot for slot, image_id in enumerate(ids)},
+        'size': tuple(meta['size']),
+        'channels': meta['channels'],
+    }
+    _open_stores[key] = store
+    return store
+
+
+def has_image(store, image_id):
+    slot = store['slots'].get(str(image_id))
+    return slot is not None and bool(store['written'][slot])
+
+
+def stored_ids(store):
+    """Ids with an image, in slot order"""
+    written = np.flatnonzero(np.asarray(store['written']))
+    return [store['ids'][slot] for slot in written]
+
+
+def put_image(store, image_id, image):
+    """Write one image (PIL image or uint8 array in RGB with the store shape)"""
+    slot = store['slots'].get(str(image_id))
+    if slot is None:
+        raise KeyError(f"Id nicht im Image Store: {image_id}")
+
+    if isinstance(image, Image.Image):
+        image = image.convert('L' if store['channels'] == 1 else 'RGB')
+    array = np.asarray(image, dtype=np.uint8)
+    if array.ndim == 2:
+        array = array[:, :, None]
+    if array.shape != store['images'].shape[1:]:
+        raise ValueError(f"Bildgröße {array.shape} passt nicht zum Image Store {store['images'].shape[1:]}")
+
+    store['images'][slot] = array
+    store['written'][slot] = 1
+
+
+def get_image(store, image_id, bgr=False):
+    """Image as uint8 array (H, W, C) in RGB, or BGR for OpenCV; (H, W) for 1-channel stores"""
+    slot = store['slots'].get(str(image_id))
+    if slot is None or not store['written'][slot]:
+        raise KeyError(f"Kein Bild im Image Store für: {image_id}")
+    image = np.array(store['images'][slot])
+    if store['channels'] == 1:
+        return image[:, :, 0]
+    return image[:, :, ::-1].copy() if bgr else image
+
+
+def get_pil_image(store, image_id):
+    image = get_image(store, image_id)
+    return Image.fromarray(image, 'L' if image.ndim == 2 else 'RGB')
+
+
+def flush(store):
+    """Write pending changes of the memory maps to disk"""
+    if hasattr(store['images'], 'flush'):
+        store['images'].flush()
+        store['written'].flush()
+
+
+def export_png(store, output_dir, ids=None, compress_level=6, skip_existing=True):
+    """Write images of the store as a plain PNG folder (<id>.png)
+
+    Returns:
+        number of written files
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    written = 0
+    for image_id in (stored_ids(store) if ids is None else ids):
+        path = output_dir / f"{image_id}.png"
+        if skip_existing and path.exists():
+            continue
+        get_pil_image(store, image_id).save(path, 'PNG', compress_level=compress_level)
+        written += 1
+    return written
+
+
+def import_image_folder(folder, path, size=None, channels=3, pattern='*.png'):
+    """Pack an existing folder (<id>.png) into a new store
+
+    Args:
+        size: (width, height); default = size of the first image, other sizes are resized (LANCZOS)
+    """
+    files = sorted(Path(folder).glob(pattern))
+    if not files:
+        raise FileNotFoundError(f"Keine Bilder ({pattern}) in {folder}")
+    if size is None:
+        with Image.open(files[0]) as first:
+            size = first.size
+
+    store = create_image_store(path, [f.stem for f in files], size=size, channels=channels)
+    for f in files:
+        with Image.open(f) as image:
+            if image.size != tuple(size):
+                image = image.resize(size, Image.Resampling.LANCZOS)
+            put_image(store, f.stem, image)
+    flush(store)
+    return store
@@ -1,50 +1,179 @@
+"""Image analysis for logos (OpenCV/NumPy).
+
+The ControlNet sketch generation lives in `sketch_controlnet.py`. The previous names
+(setup_sketch_pipeline, generate_sketch, ...) are still available here, but are only
+imported on first access. This keeps `import images` free of torch/diffusers/controlnet_aux
+for the analysis workers; sklearn is only loaded for KMeans.
+"""
+
 import cv2
 import numpy as np
-from sklearn.cluster import KMeans
 import pandas as pd
-import time
 from pathlib import Path
-from PIL import Image
-from diffusers import StableDiffusionControlNetPipeline, ControlNetModel, UniPCMultistepScheduler
-from controlnet_aux import CannyDetector
-import torch
-from controlnet_aux import LineartDetector
-from controlnet_aux import HEDdetector
-import os
 
+from feature_store import connect_feature_store, content_hash, lookup_features, store_features
 
-def analyze_color_complexity(image_path, max_colors=10):
-    """Analysiert die Farbkomplexität eines Logos"""
-    img = cv2.imread(str(image_path))
-    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+# Kennzahlen von analyze_logo (Reihenfolge wie in den Analyse-CSVs)
+ANALYSIS_METRICS = [
+    'unique_colors', 'dominant_colors', 'color_variance',
+    'edge_pixels', 'edge_ratio', 'edge_density',
+    'num_contours', 'total_contour_length', 'largest_contour_complexity',
+    'whitespace_ratio', 'content_ratio'
+]
+
+# Bei Änderungen an den Analysefunktionen erhöhen, damit der Feature Store neu rechnet
+# (2: Kanten/Formen wieder auf dem IMREAD_GRAYSCALE-Bild wie die Einzelfunktionen)
+ANALYZER_VERSION = 2
+
+
+def analyzer_version(color_mode='exact', max_colors=10):
+    """Versionsschlüssel für den Feature Store (Analyseversion + Parameter)"""
+    return f"v{ANALYZER_VERSION}-{color_mode}-{max_colors}"
+
+
+def load_image(image, flags=cv2.IMREAD_COLOR):
+    """Lädt ein Bild von einem Pfad oder aus den Dateibytes (bereits dekodierte Arrays bleiben unverändert)"""
+    if isinstance(image, np.ndarray):
+        return image
+    if isinstance(image, (bytes, bytearray)):
+        img = cv2.imdecode(np.frombuffer(image, np.uint8), flags)
+        if img is None:
+            raise ValueError("Bild konnte nicht dekodiert werden")
+        return img
+    img = cv2.imread(str(image), flags)
+    if img is None:
+        raise ValueError(f"Bild konnte nicht geladen werden: {image}")
+    return img
+
+
+def read_image_data(image):
+    """Dateibytes eines Pfads (Bytes und bereits dekodierte Arrays bleiben unverändert)"""
+    if isinstance(image, (np.ndarray, bytes, bytearray)):
+        return image
+    return Path(image).read_bytes()
+
+
+def load_gray(data):
+    """Graustufenbild für Kanten/Formen, wie cv2.imread(path, IMREAD_GRAYSCALE)
+    
+    Args:
+        data: Dateibytes (aus read_image_data) oder bereits dekodiertes Array. Arrays haben
+            keine Dateibytes mehr, sie werden per cvtColor umgewandelt.
+    """
+    if isinstance(data, np.ndarray):
+        return to_gray(data)
+    return load_image(data, cv2.IMREAD_GRAYSCALE)
+
+
+def to_gray(img):
+    """Graustufenbild aus einem BGR-Array (Graustufen-Arrays bleiben unverändert)"""
+    if img.ndim == 2:
+        return img
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+# Modi für die Farbkomplexität:
+# - 'exact': KMeans (n_init=10) über alle Pixel (ursprüngliches Verfahren, langsam)
+# - 'kmeans_hist': gewichtetes KMeans über das quantisierte Farbhistogramm (gleiches Ziel, viel weniger Punkte)
+# - 'histogram': Anzahl der quantisierten Farben mit >= 1% der Pixel (ohne Clustering, am schnellsten)
+COLOR_MODES = ('exact', 'kmeans_hist', 'histogram')
+COLOR_QUANT_BITS = 4  # Bits pro Kanal für das quantisierte Histogramm
+
+
+def pack_rgb(pixels):
+    """Packt (N, 3) uint8 Pixel in (N,) uint32 Werte (r << 16 | g << 8 | b)"""
+    pixels = pixels.astype(np.uint32)
+    return (pixels[:, 0] << 16) | (pixels[:, 1] << 8) | pixels[:, 2]
+
+
+def count_unique_colors(pixels):
+    """Exakte Anzahl eindeutiger Farben von (N, 3) uint8 Pixeln
+    
+    Logos bestehen größtenteils aus Flächen gleicher Farbe: benachbarte Wiederholungen
+    werden vor dem Unique entfernt, sortiert wird nur der (meist viel kleinere) Rest.
+    Ein Zähl-Array über alle 2^24 Farben (np.bincount) ist bei 512x512-Logos etwa 10x
+    langsamer, weil 16M Bins angelegt und durchsucht werden müssen.
+    """
+    packed = pack_rgb(pixels)
+    if len(packed) > 1:
+        packed = packed[np.concatenate(([True], packed[1:] != packed[:-1]))]
+    return len(np.unique(packed))
+
+
+def quantized_color_histogram(pixels, bits=COLOR_QUANT_BITS):
+    """Quantisiertes Farbhistogramm
+    
+    Returns:
+        (colors, counts) - Mittelpunkte der belegten Bins als (K, 3) float und Pixelanzahl je Bin
+    """
+    shift = 8 - bits
+    q = (pixels >> shift).astype(np.uint32)
+    codes = (q[:, 0] << (2 * bits)) | (q[:, 1] << bits) | q[:, 2]
+    counts = np.bincount(codes, minlength=1 << (3 * bits))
+    occupied = np.flatnonzero(counts)
+    mask = (1 << bits) - 1
+    colors = np.stack([occupied >> (2 * bits), (occupied >> bits) & mask, occupied & mask], axis=1)
+    colors = (colors << shift) + (1 << shift) / 2
+    return colors.astype(float), counts[occupied]
+
+
+def _count_dominant(cluster_counts, total_pixels):
+    """Nur Cluster mit mindestens 1% der Pixel als "dominant" betrachten (mindestens 1)"""
+    dominant_colors = np.sum(cluster_counts >= total_pixels * 0.01)
+    return max(int(dominant_colors), 1)
+
+
+def color_complexity_from_array(img_bgr, max_colors=10, mode='exact'):
+    """Farbkomplexität eines dekodierten BGR-Bildes
+    
+    Args:
+        mode: siehe COLOR_MODES. unique_colors und color_variance sind in allen Modi exakt,
+            nur dominant_colors wird in den schnellen Modi geschätzt.
+    """
+    if mode not in COLOR_MODES:
+        raise ValueError(f"Unbekannter Farbmodus: {mode} (erlaubt: {COLOR_MODES})")
+    
+    img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
     
     # Reshape für Clustering
     pixels = img_rgb.reshape(-1, 3)
     
-    # Eindeutige Farben zählen
-    unique_pixels = np.unique(pixels, axis=0)
-    unique_colors = len(unique_pixels)
+    if mode == 'exact':
+        # Eindeutige Farben zählen
+        unique_pixels = np.unique(pixels, axis=0)
+        unique_colors = len(unique_pixels)
+    else:
+        # Gepackte Farben ohne Wiederholungen statt zeilenweiser Sortierung
+        unique_colors = count_unique_colors(pixels)
     
     # K-Means für dominante Farben - aber nur wenn mehr als 1 eindeutige Farbe
-    if unique_colors > 1:
+    if unique_colors <= 1:
+        dominant_colors = 1
+    elif mode == 'exact':
         # Verwende die kleinere Zahl zwischen max_colors und tatsächlichen eindeutigen Farben
         n_clusters = min(max_colors, unique_colors)
+        from sklearn.cluster import KMeans
         kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
         kmeans.fit(pixels)
         
         # Analysiere die Cluster-Zentren um wirklich dominante Farben zu finden
-        labels = kmeans.labels_
-        cluster_counts = np.bincount(labels)
-        
-        # Nur Cluster mit mindestens 1% der Pixel als "dominant" betrachten
-        min_cluster_size = len(pixels) * 0.01
-        dominant_colors = np.sum(cluster_counts >= min_cluster_size)
-        
-        # Falls alle Cluster zu klein sind, mindestens 1 dominante Farbe
-        if dominant_colors == 0:
-            dominant_colors = 1
+        dominant_colors = _count_dominant(np.bincount(kmeans.labels_), len(pixels))
     else:
-        dominant_colors = 1
+        colors, counts = quantized_color_histogram(pixels)
+        if mode == 'histogram':
+            dominant_colors = min(_count_dominant(counts, len(pixels)), max_colors)
+        else:
+            # Gewichtetes KMeans über die Histogramm-Bins (Gewicht = Pixelanzahl)
+            n_clusters = min(max_colors, len(colors))
+            if n_clusters <= 1:
+                dominant_colors = 1
+            else:
+                from sklearn.cluster import KMeans
+                kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=3)
+                kmeans.fit(colors, sample_weight=counts)
+                cluster_counts = np.bincount(kmeans.labels_, weights=counts, minlength=n_clusters)
+                dominant_colors = _count_dominant(cluster_counts, len(pixels))
     
     return {
         'unique_colors': unique_colors,
@@ -52,27 +181,25 @@ def analyze_color_complexity(image_path, max_colors=10):
         'color_variance': np.var(pixels.astype(float))
     }
 
-def analyze_edge_complexity(image_path):
-    """Analysiert die Kantenkomplexität"""
-    img = cv2.imread(str(image_path), cv2.IMREAD_GRAYSCALE)
-    
+
+def edge_complexity_from_array(img_gray):
+    """Kantenkomplexität eines Graustufenbildes"""
     # Canny Edge Detection
-    edges = cv2.Canny(img, 50, 150)
+    edges = cv2.Canny(img_gray, 50, 150)
     edge_pixels = np.sum(edges > 0)
-    total_pixels = img.shape[0] * img.shape[1]
+    total_pixels = img_gray.shape[0] * img_gray.shape[1]
     
     return {
         'edge_pixels': edge_pixels,
         'edge_ratio': edge_pixels / total_pixels,
-        'edge_density': edge_pixels / (img.shape[0] * img.shape[1])
+        'edge_density': edge_pixels / (img_gray.shape[0] * img_gray.shape[1])
     }
 
-def analyze_shape_complexity(image_path):
-    """Analysiert die Formkomplexität"""
-    img = cv2.imread(str(image_path), cv2.IMREAD_GRAYSCALE)
-    
+
+def shape_complexity_from_array(img_gray):
+    """Formkomplexität eines Graustufenbildes"""
     # Threshold für Binärbild
-    _, thresh = cv2.threshold(img, 127, 255, cv2.THRESH_BINARY)
+    _, thresh = cv2.threshold(img_gray, 127, 255, cv2.THRESH_BINARY)
     
     # Konturen finden
     contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -95,11 +222,9 @@ def analyze_shape_complexity(image_path):
         'largest_contour_complexity': largest_contour_complexity
     }
 
-def analyze_whitespace(image_path):
-    """Analysiert den Weißraum-Anteil"""
-    img = cv2.imread(str(image_path))
-    img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    
+
+def whitespace_from_array(img_gray):
+    """Weißraum-Anteil eines Graustufenbildes"""
     # Weiße/helle Pixel zählen (Threshold bei 200)
     white_pixels = np.sum(img_gray > 200)
     total_pixels = img_gray.shape[0] * img_gray.shape[1]
@@ -111,322 +236,86 @@ def analyze_whitespace(image_path):
     }
 
 
-# Analyse-Funktion für pandarallel
-def analyze_logo_row(row):
-    """Analysiert ein Logo basierend auf DataFrame-Row"""
-    try:
-        logo_path = row['logo_path']
-        
-        # Alle Analysen durchführen
-        color_analysis = analyze_color_complexity(logo_path)
-        edge_analysis = analyze_edge_complexity(logo_path)
-        shape_analysis = analyze_shape_complexity(logo_path)
-        whitespace_analysis = analyze_whitespace(logo_path)
-        
-        # Ergebnis als Series zurückgeben
-        result = pd.Series({
-            **color_analysis,
-            **edge_analysis,
-            **shape_analysis,
-            **whitespace_analysis
-        })
-        
-        return result
-        
-    except Exception as e:
-        print(f"Fehler bei {row['filename']}: {e}")
-        # Fallback-Werte bei Fehler
-        return pd.Series({
-            'unique_colors': 0,
-            'dominant_colors': 0,
-            'color_variance': 0,
-            'edge_pixels': 0,
-            'edge_ratio': 0,
-            'edge_density': 0,
-            'num_contours': 0,
-            'total_contour_length': 0,
-            'largest_contour_complexity': 0,
-            'whitespace_ratio': 0,
-            'content_ratio': 0
-        })
-    
-
-# Preprocessing function to avoid hand/finger artifacts
-def preprocess_image_for_sketch(image, crop_bottom_percent=5):
-    """
-    Preprocess image to avoid hand/finger artifacts in generated sketches
+def analyze_logo(image, max_colors=10, color_mode='exact'):
+    """Berechnet alle Kennzahlen (ANALYSIS_METRICS) eines Logos, die Datei wird nur einmal gelesen
     
     Args:
-        image: PIL Image
-        crop_bottom_percent: Percentage to crop from bottom to remove potential fingers
-    """
-    width, height = image.size
-    
-    # Option 1: Crop bottom portion where fingers usually appear
-    crop_height = int(height * (100 - crop_bottom_percent) / 100)
-    cropped_image = image.crop((0, 0, width, crop_height))
-    
-    # Resize back to original size with white padding at bottom
-    final_image = Image.new('RGB', (width, height), color='white')
-    final_image.paste(cropped_image, (0, 0))
-    
-    return final_image
-
-
-# Sketch generation parameters
-IMAGE_SIZE = (512, 512)  # ControlNet works best with 512x512
-NUM_INFERENCE_STEPS = 25
-GUIDANCE_SCALE = 8.0
-CONTROLNET_SCALE = 0.8
-# slow on gpu, but fast on cpu, created the nice looking sketches
-def generate_sketch(image_path, pipeline_info, output_dir, use_preprocessing=True):
-    """Generate a human-like sketch from an image using ControlNet"""
-    
-    if pipeline_info is None or pipeline_info[0] is None:
-        print("❌ Pipeline not available")
-        return None
-    
-    pipeline, model_type = pipeline_info
-    print(f"🎨 Generating sketch for: {Path(image_path).name}")
-    print(f"🔧 Using model: {model_type}")
-    start_time = time.time()
-    
-    try:
-        # Load and preprocess the image
-        image = Image.open(image_path).convert("RGB")
-        image = image.resize(IMAGE_SIZE, Image.Resampling.LANCZOS)
-        
-        # Apply preprocessing to avoid finger artifacts
-        if use_preprocessing:
-            print("🧹 Preprocessing image to avoid finger artifacts...")
-            image = preprocess_image_for_sketch(image, crop_bottom_percent=8)
-        
-        # Create control input based on model type
-        print(f"🔍 Creating control input for {model_type}...")
-        
-        if model_type in ['lineart', 'lineart_anime']:
-            # For lineart models, use simpler edge detection
-            processor = LineartDetector.from_pretrained('lllyasviel/Annotators')
-            control_image = processor(image)
-        elif model_type == 'scribble':
-            # For scribble, use HED edge detection
-            processor = HEDdetector.from_pretrained('lllyasviel/Annotators')
-            control_image = processor(image, scribble=True)
-        else:  # canny
-            canny_detector = CannyDetector()
-            control_image = canny_detector(image, low_threshold=50, high_threshold=150)
-        
-        # Optimized prompts for simple line sketches
-        positive_prompt = (
-            "abstact sketch of a logo made by hand with simple drawed lines. The lines are curvy and not straight because it is drawn by hand."
-            # "simple line drawing, minimal sketch, clean lines, "
-            # "black lines on white background, line art, outline drawing, "
-            # "simple sketch, minimalist drawing, basic outline, "
-            # "thin black lines, white background"
-        )
-        
-        negative_prompt = (
-            ""
-            "hands, fingers, human hand, thumb, palm, holding, gripping, pencil, exact match, shadows, straight lines, details"
-            # "colored, filled areas, shading, shadows, gradients, "
-            # "photographic, realistic, 3d render, complex details, "
-            # "textured, painted, thick lines, multiple colors, "
-            # "blurry, low quality, distorted, cartoon faces,"
-            # "person, human body parts, skin, flesh"
-        )
-        
-        print("🚀 Generating simple line sketch...")
-        print(f"   Steps: {NUM_INFERENCE_STEPS}")
-        print(f"   Guidance: {GUIDANCE_SCALE}")
-        print(f"   ControlNet strength: {CONTROLNET_SCALE}")
-        
-        # Generate the sketch with optimized parameters for simple lines
-        result = pipeline(
-            prompt=positive_prompt,
-            image=control_image,
-            negative_prompt=negative_prompt,
-            num_inference_steps=NUM_INFERENCE_STEPS,
-            controlnet_conditioning_scale=CONTROLNET_SCALE,
-            guidance_scale=GUIDANCE_SCALE,
-            generator=torch.Generator().manual_seed(42)  # For reproducible results
-        )
-        
-        sketch = result.images[0]
-        
-        # Save the sketch
-        output_filename = f"{Path(image_path).stem}_sketch_{model_type}.png"
-        output_path = Path(output_dir) / output_filename
-        sketch.save(output_path)
-        
-        generation_time = time.time() - start_time
-        print(f"✅ Sketch generated in {generation_time:.1f} seconds")
-        print(f"💾 Saved to: {output_path}")
-        
-        return {
-            'original': image,
-            'control': control_image,
-            'sketch': sketch,
-            'output_path': output_path,
-            'generation_time': generation_time,
-            'model_type': model_type
-        }
-        
-    except Exception as e:
-        print(f"❌ Error generating sketch: {e}")
-        return None
+        image: Pfad zur Bilddatei, Dateibytes oder bereits dekodiertes BGR-Array
+        color_mode: Modus der Farbkomplexität (siehe COLOR_MODES)
     
+    Wie bei den Einzelfunktionen nutzen Kanten/Formen das direkt in Graustufen dekodierte
+    Bild (IMREAD_GRAYSCALE aus denselben Bytes) und der Weißraum das per cvtColor
+    umgewandelte Farbbild, die Werte sind identisch.
+    """
+    data = read_image_data(image)
+    img = load_image(data)
+    img_gray = load_gray(data)
+    return {
+        **color_complexity_from_array(img, max_colors, color_mode),
+        **edge_complexity_from_array(img_gray),
+        **shape_complexity_from_array(img_gray),
+        **whitespace_from_array(to_gray(img))
+    }
 
-MODEL_CACHE_DIR = '../../models/controlnet_cache'  # Local cache for models
-# Centralized model id maps to keep selection consistent between setup functions
-MODEL_MAP = {
-    'lineart': 'lllyasviel/control_v11p_sd15_lineart',
-    'lineart_anime': 'lllyasviel/control_v11p_sd15s2_lineart_anime',
-    'canny': 'lllyasviel/control_v11p_sd15_canny',
-}
-
-FALLBACK_MODELS = {
-    'lineart': 'lllyasviel/sd-controlnet-canny',
-    'lineart_anime': 'lllyasviel/sd-controlnet-canny',
-    'canny': 'lllyasviel/sd-controlnet-canny',
-    'scribble': 'lllyasviel/sd-controlnet-canny'
-}
 
+def analyze_color_complexity(image_path, max_colors=10, mode='exact'):
+    """Analysiert die Farbkomplexität eines Logos"""
+    return color_complexity_from_array(load_image(image_path), max_colors, mode)
 
-def _load_controlnet_model(model_type: str):
-    """Load a ControlNet model with fallback handling.
+def analyze_edge_complexity(image_path):
+    """Analysiert die Kantenkomplexität"""
+    return edge_complexity_from_array(to_gray(load_image(image_path, cv2.IMREAD_GRAYSCALE)))
 
-    Returns (controlnet, resolved_model_type, model_id_used)
-    """
-    if model_type not in MODEL_MAP and model_type not in FALLBACK_MODELS:
-        print(f"❌ Unknown model type: {model_type}")
-        return None, None, None, None
+def analyze_shape_complexity(image_path):
+    """Analysiert die Formkomplexität"""
+    return shape_complexity_from_array(to_gray(load_image(image_path, cv2.IMREAD_GRAYSCALE)))
 
-    model_id = MODEL_MAP.get(model_type, FALLBACK_MODELS.get(model_type))
-    dtype = torch.bfloat16 if torch.cuda.is_available() else torch.float32
+def analyze_whitespace(image_path):
+    """Analysiert den Weißraum-Anteil"""
+    return whitespace_from_array(to_gray(load_image(image_path)))
 
-    print(f"🔄 Trying primary model: {model_id}")
-    try:
-        controlnet = ControlNetModel.from_pretrained(
-            model_id,
-            torch_dtype=dtype,
-            cache_dir=MODEL_CACHE_DIR,
-        )
-        print(f"✅ Successfully loaded: {model_id}")
-        return controlnet, model_type, model_id, dtype
 
-    except Exception as e:
-        # If there is a specified fallback for this logical model_type, try it
-        fallback = FALLBACK_MODELS.get(model_type)
-        if fallback is None:
-            print(f"❌ ControlNet load failed and no fallback available: {e}")
-            return None, None, None, None
-
-        print(f"⚠️ Primary model failed: {e}")
-        print(f"🔄 Trying fallback model: {fallback}")
-        try:
-            controlnet = ControlNetModel.from_pretrained(
-                fallback,
-                torch_dtype=dtype,
-                cache_dir=MODEL_CACHE_DIR,
-            )
-            print(f"✅ Successfully loaded fallback: {fallback}")
-            # reflect that we ended up using a canny-type controlnet
-            return controlnet, 'canny', fallback, dtype
-
-        except Exception as e2:
-            print(f"❌ Both primary and fallback models failed:")
-            print(f"   Primary error: {e}")
-            print(f"   Fallback error: {e2}")
-            return None, None, None, None
-
-# Setup ControlNet pipeline for sketch generation
-def setup_sketch_pipeline(model_type="lineart"):
-    """Initialize the ControlNet pipeline for generating sketches
+# Analyse-Funktion für pandarallel
+def analyze_logo_row(row, color_mode='exact', feature_store=None):
+    """Analysiert ein Logo basierend auf DataFrame-Row
     
-    model_type options:
-    - 'lineart': Better for simple line drawings
-    - 'lineart_anime': Anime-style line art
-    - 'canny': Edge-based (current approach)
-    - 'scribble': Hand-drawn scribble style
+    Args:
+        feature_store: optionaler Pfad zur Feature-Store-Datenbank; bereits analysierte
+            Bildinhalte werden dort nachgeschlagen statt neu berechnet
     """
-    print(f"🔄 Loading ControlNet model: {model_type}")
-    start_time = time.time()
-    
-    # Centralized model loading
-    controlnet, resolved_type, used_model_id, dtype = _load_controlnet_model(model_type)
-    if controlnet is None:
-        return None, None
-    model_type = resolved_type
-    
-    # Load Stable Diffusion pipeline with ControlNet (moved outside except block)
     try:
-        try:
-            pipe = _load_pipe(True, controlnet, dtype)
-        except TypeError:
-            pipe = _load_pipe(False, controlnet, dtype)
-        
-        pipe = _configure_pipe(pipe)
-        
-        load_time = time.time() - start_time
-        print(f"✅ Pipeline setup complete in {load_time:.1f} seconds")
-        
-        return pipe, model_type
+        if feature_store is None:
+            # Alle Analysen mit einem einzigen Lesevorgang durchführen
+            return pd.Series(analyze_logo(row['logo_path'], color_mode=color_mode))
+
+        conn = connect_feature_store(feature_store)
+        version = analyzer_version(color_mode)
+        data = Path(row['logo_path']).read_bytes()
+        key = content_hash(data)
+        cached = lookup_features(conn, [key], version)
+        if key in cached:
+            return pd.Series(cached[key])
+        metrics = analyze_logo(data, color_mode=color_mode)
+        store_features(conn, [key], [metrics], version)
+        return pd.Series(metrics)
         
     except Exception as e:
-        print(f"❌ Error setting up pipeline: {e}")
-        return None, None
+        print(f"Fehler bei {row['filename']}: {e}")
+        # Fallback-Werte bei Fehler
+        return pd.Series({metric: 0 for metric in ANALYSIS_METRICS})
 
 
-def _configure_pipe(pipe):
-    """Common pipe configuration: scheduler, device placement, and optional accelerations."""
-    # Use faster scheduler
-    pipe.scheduler = UniPCMultistepScheduler.from_config(pipe.scheduler.config)
+# Sketch-Funktionen aus sketch_controlnet (lazy, damit die Analyse ohne torch/diffusers startet)
+SKETCH_EXPORTS = (
+    'preprocess_image_for_sketch', 'IMAGE_SIZE', 'NUM_INFERENCE_STEPS', 'GUIDANCE_SCALE',
+    'CONTROLNET_SCALE', 'generate_sketch', 'MODEL_CACHE_DIR', 'MODEL_MAP', 'FALLBACK_MODELS',
+    'setup_sketch_pipeline', 'generate_sketches', 'SKETCH_BATCH_SIZE', 'get_sketch_pipeline', 'pipeline_stats',
+    'set_pipeline_budget', 'release_sketch_pipelines', 'CPU_PROFILES'
+)
 
-    # Move to GPU if available
-    if torch.cuda.is_available():
-        pipe = pipe.to("cuda")
-        print("🚀 Pipeline loaded on GPU")
-    else:
-        print("💻 Pipeline loaded on CPU")
 
-    # Optional accelerations (xFormers disabled by default)
-    try:
-        # if 'USE_XFORMERS' in globals() and USE_XFORMERS:
-        #     pipe.enable_xformers_memory_efficient_attention()
-        #     print("⚡ XFormers acceleration enabled")
-        # else:
-        print("ℹ️ XFormers disabled (USE_XFORMERS=False)")
-    except Exception as ex:
-        print(f"ℹ️ XFormers not enabled: {ex}")
-
-    try:
-        pipe.enable_attention_slicing()
-    except Exception:
-        pass
-
-    return pipe
-
-
-def _load_pipe(with_safety_args: bool, controlnet, dtype=None):
-    """Load StableDiffusionControlNetPipeline with consistent dtype and cache settings."""
-    if dtype is None:
-        dtype = torch.float16 if torch.cuda.is_available() else torch.float32
-
-    common_kwargs = dict(
-        controlnet=controlnet,
-        torch_dtype=dtype,
-        cache_dir=MODEL_CACHE_DIR,
-    )
-
-    if with_safety_args:
-        return StableDiffusionControlNetPipeline.from_pretrained(
-            "runwayml/stable-diffusion-v1-5",
-            safety_checker=None,
-            requires_safety_checker=False,
-            **common_kwargs,
-        )
-    else:
-        return StableDiffusionControlNetPipeline.from_pretrained(
-            "runwayml/stable-diffusion-v1-5",
-            **common_kwargs,
-        )
\ No newline at end of file
+def __getattr__(name):
+    if name in SKETCH_EXPORTS:
+        import sketch_controlnet
+        return getattr(sketch_controlnet, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,52 @@
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from images import (ANALYSIS_METRICS, analyze_color_complexity, analyze_edge_complexity, analyze_logo,
+                    analyze_logo_row, analyze_shape_complexity, analyze_whitespace)
+from minimalism_filter import cascade_filter_logo
+
+test_logos = sorted((Path(__file__).parent.parent / 'output' / 'final' / 'test' / 'logo').glob('*.png'))
+COLOR_MODE = 'histogram'  # exact for every mode, KMeans would only make the test slow
+
+def single_metrics(path):
+    """All metrics from the standalone analyzers (one decode per analyzer, as in the baseline)."""
+    return {
+        **analyze_color_complexity(path, mode=COLOR_MODE),
+        **analyze_edge_complexity(path),
+        **analyze_shape_complexity(path),
+        **analyze_whitespace(path),
+    }
+
+def test_analyze_logo_matches_single_analyzers():
+    """analyze_logo from a path, from the bytes, per row and via the feature store gives the same values."""
+
+    assert test_logos
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:  # the feature store stays open
+        feature_store = Path(tmp) / 'features.sqlite'
+        for path in test_logos:
+            expected = single_metrics(path)
+            row = pd.Series({'logo_path': path, 'filename': path.name})
+            results = {
+                'path': analyze_logo(path, color_mode=COLOR_MODE),
+                'bytes': analyze_logo(path.read_bytes(), color_mode=COLOR_MODE),
+                'row': analyze_logo_row(row, color_mode=COLOR_MODE).to_dict(),
+                'feature store': analyze_logo_row(row, color_mode=COLOR_MODE, feature_store=feature_store).to_dict(),
+                'feature store (cached)': analyze_logo_row(row, color_mode=COLOR_MODE, feature_store=feature_store).to_dict(),
+            }
+            for source, metrics in results.items():
+                for metric in ANALYSIS_METRICS:
+                    assert metrics[metric] == expected[metric], \
+                        f"{path.name} ({source}): {metric} {metrics[metric]} != {expected[metric]}"
+
+            # The cascade computes the same metrics for the stages it reaches
+            cascade = cascade_filter_logo(path, thresholds={}, color_mode=COLOR_MODE)
+            assert cascade['passed']
+            for metric in ANALYSIS_METRICS:
+                assert cascade[metric] == expected[metric] or metric == 'unique_colors', f"{path.name}: cascade {metric}"
+
+    print(f"analyze_logo matches the single analyzers for {len(test_logos)} logos")
+
+if __name__ == "__main__":
+    test_analyze_logo_matches_single_analyzers()
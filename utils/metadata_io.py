@@ -0,0 +1,230 @@
+"""Columnar intermediates for the metadata cleanup chain (metadata.csv -> ... -> metadata10.csv).
+
+Every step writes its result as Parquet next to the familiar CSV name (metadata7.csv ->
+metadata7.parquet). `category` and `category_main` are stored as categoricals (dictionary
+encoded), ids and texts as typed string columns, so nothing is parsed again on load.
+Empty strings are stored as missing values, so the steps see the same NaN as with the CSV.
+`columns=` reads only the requested columns from the file (projection), e.g. `id` and
+`category_main` for the image extraction, and `categorical=True` keeps the category
+columns as pandas categoricals in memory.
+
+The notebooks keep their `*.csv` path variables, the helpers resolve the Parquet file.
+CSV stays available as export: `write_metadata(..., csv=True)` or the environment variable
+METADATA_EXPORT_CSV=1 for a whole pipeline run. Steps whose input only exists as CSV
+(older runs) still work, `read_metadata` falls back to the CSV file.
+
+When several steps run in one process (stage_runner.py), `keep_in_memory()` makes
+`write_metadata` also keep a copy of the DataFrame, and the next step's `read_metadata`
+of the same path gets it without reading the file again.
+
+Example:
+    df = read_metadata(input_metadata_csv)
+    write_metadata(df_result, output_metadata_csv)
+    metadata_df = read_metadata(metadata_path, columns=['id', 'category_main'], categorical=True)
+"""
+
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+
+CATEGORICAL_COLUMNS = ('category', 'category_main')
+
+# CSV export in addition to Parquet (e.g. for tools that only read CSV)
+EXPORT_CSV = os.environ.get('METADATA_EXPORT_CSV', '0') == '1'
+
+# Parquet path -> DataFrame of the last write_metadata, None = in-memory handover disabled
+_memory = None
+
+
+def metadata_paths(path):
+    """(parquet path, csv path) for a metadata file given with either suffix"""
+    path = Path(path)
+    return path.with_suffix('.parquet'), path.with_suffix('.csv')
+
+
+def metadata_exists(path):
+    parquet_path, csv_path = metadata_paths(path)
+    return parquet_path.exists() or csv_path.exists() or _memory_key(path) in (_memory or {})
+
+
+def _memory_key(path):
+    return str(metadata_paths(path)[0].resolve())
+
+
+def keep_in_memory(enabled=True):
+    """Hand written metadata over to later reads in the same process (False clears it)"""
+    global _memory
+    _memory = {} if enabled else None
+
+
+def forget_metadata(path):
+    """Drop one file from the in-memory handover (e.g. after its last reader ran)"""
+    if _memory is not None:
+        _memory.pop(_memory_key(path), None)
+
+
+def memory_paths():
+    return list(_memory or {})
+
+
+def metadata_file(path):
+    """File that `read_metadata` loads: Parquet if it exists and is not older than the CSV, else the CSV"""
+    parquet_path, csv_path = metadata_paths(path)
+    if parquet_path.exists():
+        if not csv_path.exists() or parquet_path.stat().st_mtime_ns >= csv_path.stat().st_mtime_ns:
+            return parquet_path
+        print(f"⚠️ {csv_path.name} ist neuer als {parquet_path.name}, lese CSV")
+    if csv_path.exists():
+        return csv_path
+    raise FileNotFoundError(f"Weder {parquet_path} noch {csv_path} gefunden")
+
+
+def _memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def read_metadata(path, columns=None, categorical=False, verbose=True):
+    """Load a metadata file of the cleanup chain
+
+    Args:
+        path: metadata path with .csv or .parquet suffix
+        columns: only load these columns (None = all)
+        categorical: category columns as pandas categoricals (much smaller, but new values
+            cannot be assigned and value_counts/groupby also list unused categories)
+    """
+    start = time.perf_counter()
+    key = _memory_key(path)
+    if _memory is not None and key in _memory:
+        source = Path(key)
+        df = _memory[key] if columns is None else _memory[key][list(columns)]
+        df = df.copy()
+    else:
+        source = metadata_file(path)
+        if source.suffix == '.parquet':
+            # Files of older runs can still contain '' where the CSV had missing values
+            df = _blank_to_na(pd.read_parquet(source, columns=columns))
+        else:
+            dtype = {c: 'category' for c in CATEGORICAL_COLUMNS} if categorical else None
+            df = pd.read_csv(source, usecols=columns, dtype=dtype)
+
+    for column in CATEGORICAL_COLUMNS:
+        if column not in df.columns:
+            continue
+        if categorical and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+        elif not categorical and isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object)
+
+    if verbose:
+        origin = ' aus dem Speicher' if _memory is not None and key in _memory else ''
+        print(f"📂 {source.name}{origin}: {len(df):,} Zeilen, {len(df.columns)} Spalten "
+              f"in {time.perf_counter() - start:.2f}s ({_memory_mb(df):.1f} MB)")
+    return df
+
+
+def _blank_to_na(df):
+    """Empty strings as missing values, like `pd.read_csv` reads empty fields (modifies df)"""
+    for column in df.columns:
+        dtype = df[column].dtype
+        if dtype == object or isinstance(dtype, (pd.StringDtype, pd.CategoricalDtype)):
+            # isin instead of eq(''): cells can hold lists or arrays
+            blank = df[column].isin([''])
+            if blank.any():
+                df[column] = df[column].mask(blank)
+                if isinstance(dtype, pd.CategoricalDtype):
+                    df[column] = df[column].cat.remove_unused_categories()
+    return df
+
+
+def _arrow_compatible(df):
+    """Object columns with mixed value types are written as strings (like the CSV would)"""
+    df = _blank_to_na(df.copy(deep=False))
+    for column in df.columns:
+        if df[column].dtype == object and pd.api.types.infer_dtype(df[column], skipna=True) not in ('string', 'empty'):
+            df[column] = df[column].map(lambda v: v if (pd.api.types.is_scalar(v) and pd.isna(v)) else str(v))
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    return df
+
+
+def write_metadata(df, path, csv=None, verbose=True):
+    """Write a metadata file of the cleanup chain as Parquet (and optionally CSV)
+
+    Args:
+        path: target path with .csv or .parquet suffix
+        csv: also export CSV; None = EXPORT_CSV
+
+    Returns:
+        list of written paths
+    """
+    parquet_path, csv_path = metadata_paths(path)
+    parquet_path.parent.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+
+    written = []
+    # The CSV export first: a CSV newer than the Parquet means an edited CSV (metadata_file)
+    if EXPORT_CSV if csv is None else csv:
+        df.to_csv(csv_path, index=False)
+        written.append(csv_path)
+
+    typed = _arrow_compatible(df)
+    tmp_path = parquet_path.with_name(parquet_path.name + '.tmp')
+    typed.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, parquet_path)
+    written.insert(0, parquet_path)
+    if _memory is not None:
+        _memory[_memory_key(path)] = typed.reset_index(drop=True).copy()
+
+    if verbose:
+        names = ', '.join(p.name for p in written)
+        print(f"💾 {names}: {len(df):,} Zeilen in {time.perf_counter() - start:.2f}s")
+    return written
+
+
+def convert_csv(path, verbose=True):
+    """Write the Parquet version of an existing metadata CSV (keeps the CSV)"""
+    df = read_metadata(Path(path).with_suffix('.csv'), categorical=True, verbose=verbose)
+    return write_metadata(df, path, csv=False, verbose=verbose)[0]
+
+
+def compare_formats(path, columns=None):
+    """Load time and memory of CSV vs. Parquet for one metadata file
+
+    Returns:
+        DataFrame with one row per format
+    """
+    parquet_path, csv_path = metadata_paths(path)
+    rows = []
+    for fmt, source in (('csv', csv_path), ('parquet', parquet_path)):
+        if not source.exists():
+            continue
+        start = time.perf_counter()
+        if fmt == 'csv':
+            df = pd.read_csv(source, usecols=columns)
+        else:
+            # Files of older runs can still contain '' where the CSV had missing values
+            df = _blank_to_na(pd.read_parquet(source, columns=columns))
+        rows.append({
+            'format': fmt,
+            'file_mb': source.stat().st_size / 1024 ** 2,
+            'seconds': time.perf_counter() - start,
+            'memory_mb': _memory_mb(df),
+        })
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert metadata CSVs to Parquet and compare load cost")
+    parser.add_argument("files", nargs='+', help="metadata CSV files")
+    parser.add_argument("--columns", nargs='*', default=None, help="Projection for the comparison")
+    args = parser.parse_args()
+
+    for file in args.files:
+        convert_csv(file)
+        report = compare_formats(file, args.columns)
+        print(report.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
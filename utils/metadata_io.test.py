@@ -0,0 +1,105 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import metadata_io
+from metadata_io import metadata_file, read_metadata, write_metadata
+
+# Values as they come out of the cleanup steps: empty strings, NaN, mixed types
+example_df = pd.DataFrame({
+    'id': ['a1', 'a2', 'a3', 'a4'],
+    'text': ['Acme, Logo', '', np.nan, 'Bar, Food'],
+    'category': ['Food', '', 'Food', np.nan],
+    'category_main': ['Food', 'Sports', '', 'Food'],
+    'tags': ['x, y', '', 'z', np.nan],
+    'mixed': [1, 'two', '', 3.5],
+})
+
+def test_round_trip_matches_csv():
+    """Reading the Parquet must give the same values and missing values as reading the CSV."""
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'metadata7.csv'
+        write_metadata(example_df, path, csv=False, verbose=False)
+        example_df.to_csv(Path(tmp) / 'export.csv', index=False)
+        
+        from_csv = pd.read_csv(Path(tmp) / 'export.csv')
+        from_parquet = read_metadata(path, verbose=False)
+        
+        for column in example_df.columns:
+            expected = from_csv[column].isna().tolist()
+            actual = from_parquet[column].isna().tolist()
+            assert actual == expected, f"Missing values of {column}: {actual} != {expected}"
+        
+        # The notebooks mark missing categories as 'na' (step3)
+        assert from_parquet['category'].fillna('na').tolist() == ['Food', 'na', 'Food', 'na']
+        
+        categorical = read_metadata(path, categorical=True, verbose=False)
+        assert '' not in categorical['category_main'].cat.categories
+    
+    print(f"Parquet and CSV agree on missing values for {len(example_df.columns)} columns")
+
+def test_older_parquet_with_empty_strings():
+    """Parquet files written before the conversion still read '' as missing."""
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'metadata8.parquet'
+        example_df.astype({'mixed': str}).to_parquet(path, index=False)
+        df = read_metadata(path, verbose=False)
+        assert df['text'].isna().tolist() == [False, True, True, False]
+    
+    print("Empty strings of older Parquet files are read as missing values")
+
+def test_csv_export_does_not_outrank_parquet():
+    """The CSV written by write_metadata itself must not make read_metadata fall back to the CSV."""
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'metadata10.csv'
+        for _ in range(3):
+            written = write_metadata(example_df, path, csv=True, verbose=False)
+            assert [p.suffix for p in written] == ['.parquet', '.csv']
+            assert metadata_file(path).suffix == '.parquet'
+    
+    print("CSV export keeps the Parquet file as source")
+
+def test_list_cells():
+    """Columns with list or array cells are written as their strings, the Parquet file is not skipped."""
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'metadata11.csv'
+        df = example_df.assign(colors=[['red', 'blue'], np.array([1, 2]), '', None])
+        written = write_metadata(df, path, csv=True, verbose=False)
+        assert all(p.exists() for p in written)
+        
+        from_parquet = read_metadata(path, verbose=False)
+        from_csv = pd.read_csv(written[1])
+        assert from_parquet['colors'].tolist()[:2] == from_csv['colors'].tolist()[:2] == ["['red', 'blue']", '[1 2]']
+        assert from_parquet['colors'].isna().tolist() == from_csv['colors'].isna().tolist() == [False, False, True, True]
+    
+    print("List and array cells are written to Parquet as strings")
+
+def test_memory_handover():
+    """The in-memory copy of write_metadata is read like the file."""
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'metadata9.csv'
+        metadata_io.keep_in_memory()
+        try:
+            write_metadata(example_df, path, verbose=False)
+            from_memory = read_metadata(path, verbose=False)
+        finally:
+            metadata_io.keep_in_memory(False)
+        from_file = read_metadata(path, verbose=False)
+        pd.testing.assert_frame_equal(from_memory.isna(), from_file.isna())
+        pd.testing.assert_frame_equal(from_memory.fillna('').astype(str), from_file.fillna('').astype(str))
+    
+    print("In-memory handover matches the Parquet file")
+
+if __name__ == "__main__":
+    test_round_trip_matches_csv()
+    test_older_parquet_with_empty_strings()
+    test_csv_export_does_not_outrank_parquet()
+    test_list_cells()
+    test_memory_handover()
@@ -0,0 +1,245 @@
+"""Cascade filter for minimalistic logos based on the analyzers in `images.py`.
+
+The score in `filter_minimalistic_logos.ipynb` needs all metrics of all logos. With fixed
+thresholds most logos can be rejected much earlier: the metrics are evaluated in cost
+order and a logo leaves the cascade at the first failed threshold, so KMeans and the
+contour search only run for logos that are still candidates.
+
+Example:
+    from minimalism_filter import cascade_filter_row, cascade_report
+    results = df_batch.p_apply(partial(cascade_filter_row, thresholds=THRESHOLDS), axis=1)
+    print(cascade_report(results))
+    results['minimalism_score'] = calculate_minimalism_score(results)
+    minimalistic, non_minimalistic, threshold = classify_logos(results)
+"""
+
+import time
+from functools import cache
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pandas as pd
+
+from images import (
+    ANALYSIS_METRICS,
+    color_complexity_from_array,
+    count_unique_colors,
+    edge_complexity_from_array,
+    load_gray,
+    load_image,
+    read_image_data,
+    shape_complexity_from_array,
+    to_gray,
+    whitespace_from_array,
+)
+from image_store import get_image, open_image_store
+
+# Threshold name -> (metric, comparison). A logo passes if `metric <comparison> value`.
+THRESHOLD_RULES = {
+    'min_whitespace_ratio': ('whitespace_ratio', '>='),
+    'max_unique_colors': ('unique_colors', '<='),
+    'max_edge_ratio': ('edge_ratio', '<='),
+    'max_num_contours': ('num_contours', '<='),
+    'max_dominant_colors': ('dominant_colors', '<='),
+}
+
+# Starting values, tune them with the score distribution of the complete analysis
+DEFAULT_THRESHOLDS = {
+    'min_whitespace_ratio': 0.5,
+    # Anti-aliased flat logos have a few thousand colors, photos and gradients far more
+    'max_unique_colors': 8192,
+    'max_edge_ratio': 0.05,
+    'max_num_contours': 30,
+    'max_dominant_colors': 4,
+}
+
+# Side length of the preview used to bound the unique color count. The preview can only
+# reject if it has more pixels than max_unique_colors (128 * 128 > 8192)
+PREVIEW_SIZE = 128
+
+# Stages in cost order (cheapest first)
+CASCADE_STAGES = ['whitespace', 'unique_colors_preview', 'unique_colors', 'edges', 'shapes', 'colors']
+# Stages that only run with a unique color threshold
+UNIQUE_COLOR_STAGES = ('unique_colors_preview', 'unique_colors')
+
+# Metric -> (weight, True if a higher value is more minimalistic) of the minimalism score
+SCORE_WEIGHTS = {
+    'dominant_colors': (0.25, False),
+    'edge_ratio': (0.35, False),
+    'num_contours': (0.20, False),
+    'whitespace_ratio': (0.10, True),
+    'color_variance': (0.10, False),
+}
+
+
+def _passes(value, comparison, threshold):
+    return value >= threshold if comparison == '>=' else value <= threshold
+
+
+def _check(metrics, thresholds, metric_names):
+    """True if all configured thresholds for the given metrics are met"""
+    for name, threshold in thresholds.items():
+        metric, comparison = THRESHOLD_RULES[name]
+        if metric in metric_names and not _passes(metrics[metric], comparison, threshold):
+            return False
+    return True
+
+
+def preview_unique_colors(img_bgr, size=PREVIEW_SIZE):
+    """Unique colors on a nearest-neighbour preview.
+
+    Nearest-neighbour only picks existing pixels, so the result is a lower bound of the
+    unique colors of the full image: if it is above the threshold, the full count is too.
+    """
+    if max(img_bgr.shape[:2]) > size:
+        img_bgr = cv2.resize(img_bgr, (size, size), interpolation=cv2.INTER_NEAREST)
+    return count_unique_colors(img_bgr.reshape(-1, 3))
+
+
+def cascade_filter_logo(image, thresholds=None, max_colors=10, color_mode='exact'):
+    """Evaluate the thresholds stage by stage and stop at the first rejection.
+
+    Args:
+        image: path to the PNG, its bytes or an already decoded BGR array
+        thresholds: dict with keys from THRESHOLD_RULES (default DEFAULT_THRESHOLDS),
+            thresholds that are not set are not checked
+        color_mode: mode for the color stage (see images.COLOR_MODES)
+
+    Returns:
+        dict with all metrics of ANALYSIS_METRICS (NaN if the stage was not reached),
+        'passed', 'rejected_at' (stage name or None) and 't_<stage>' timings in seconds
+    """
+    thresholds = DEFAULT_THRESHOLDS if thresholds is None else thresholds
+    unknown = set(thresholds) - set(THRESHOLD_RULES)
+    if unknown:
+        raise ValueError(f"Unbekannte Schwellenwerte: {sorted(unknown)}")
+
+    result = {metric: np.nan for metric in ANALYSIS_METRICS}
+    result.update({'passed': False, 'rejected_at': None})
+    result.update({f't_{stage}': 0.0 for stage in CASCADE_STAGES})
+
+    data = read_image_data(image)
+    img = load_image(data)
+    # Edges and shapes use the IMREAD_GRAYSCALE image like analyze_logo, decoded on first use
+    edge_gray = cache(lambda: load_gray(data))
+
+    stages = [
+        ('whitespace', lambda: whitespace_from_array(to_gray(img))),
+        ('unique_colors_preview', lambda: {'unique_colors': preview_unique_colors(img)}),
+        # Exact count before KMeans, so max_unique_colors rejects without the color stage
+        ('unique_colors', lambda: {'unique_colors': count_unique_colors(img.reshape(-1, 3))}),
+        ('edges', lambda: edge_complexity_from_array(edge_gray())),
+        ('shapes', lambda: shape_complexity_from_array(edge_gray())),
+        ('colors', lambda: color_complexity_from_array(img, max_colors, color_mode)),
+    ]
+    for stage, compute in stages:
+        # The unique color stages are only useful when there is a unique color threshold
+        if stage in UNIQUE_COLOR_STAGES and 'max_unique_colors' not in thresholds:
+            continue
+
+        start = time.perf_counter()
+        metrics = compute()
+        result[f't_{stage}'] = time.perf_counter() - start
+
+        if stage != 'unique_colors_preview':
+            result.update(metrics)
+        if not _check(metrics, thresholds, metrics.keys()):
+            result['rejected_at'] = stage
+            return result
+
+    result['passed'] = True
+    return result
+
+
+def cascade_filter_row(row, thresholds=None, max_colors=10, color_mode='exact', image_store=None):
+    """cascade_filter_logo for DataFrame rows with a 'logo_path' column (pandarallel)
+
+    Args:
+        image_store: optional path of a packed image store, the pixels of the logo with the
+            id of the 'logo_path' file name are read from it instead of the PNG
+    """
+    try:
+        image = row['logo_path']
+        if image_store is not None:
+            image = get_image(open_image_store(image_store), Path(image).stem, bgr=True)
+        return pd.Series(cascade_filter_logo(image, thresholds, max_colors, color_mode))
+    except Exception as e:
+        print(f"Fehler bei {row['filename']}: {e}")
+        result = {metric: np.nan for metric in ANALYSIS_METRICS}
+        result.update({'passed': False, 'rejected_at': 'error'})
+        result.update({f't_{stage}': 0.0 for stage in CASCADE_STAGES})
+        return pd.Series(result)
+
+
+def cascade_report(results):
+    """Per-stage report: how many logos reached each stage, were rejected there and the time spent.
+
+    Args:
+        results: DataFrame with the output of cascade_filter_row / cascade_filter_logo
+    """
+    rows = []
+    remaining = int((results['rejected_at'] != 'error').sum())
+    for stage in CASCADE_STAGES:
+        evaluated = int((results[f't_{stage}'] > 0).sum())
+        rejected = int((results['rejected_at'] == stage).sum())
+        seconds = float(results[f't_{stage}'].sum())
+        rows.append({
+            'stage': stage,
+            'evaluated': evaluated,
+            'rejected': rejected,
+            'reject_rate': rejected / evaluated if evaluated else 0.0,
+            'remaining': remaining - rejected,
+            'seconds': seconds,
+            'ms_per_logo': seconds / evaluated * 1000 if evaluated else 0.0,
+        })
+        remaining -= rejected
+    return pd.DataFrame(rows)
+
+
+def scoring_candidates(df):
+    """Rows that take part in the minimalism score.
+
+    Logos rejected by the cascade ('passed' is False) and logos whose analysis failed have
+    NaN metrics and are never candidates. Rows without a cascade result (no 'passed'
+    column or NaN) are scored as in the full analysis.
+    """
+    candidates = df[list(SCORE_WEIGHTS)].notna().all(axis=1)
+    if 'passed' in df.columns:
+        candidates &= ~df['passed'].eq(False)
+    return candidates
+
+
+def calculate_minimalism_score(df):
+    """Minimalism score (0-100, higher = more minimalistic) of the scoring candidates.
+
+    Every metric is min-max normalised over the candidates and weighted with SCORE_WEIGHTS.
+
+    Returns:
+        Series aligned with df, NaN for rows that are not candidates
+    """
+    candidates = df[scoring_candidates(df)]
+    score = pd.Series(0.0, index=candidates.index)
+    for metric, (weight, higher_is_better) in SCORE_WEIGHTS.items():
+        values = candidates[metric]
+        normalized = (values - values.min()) / (values.max() - values.min() + 1e-8)
+        score += (normalized if higher_is_better else 1 - normalized) * weight
+    return (score * 100).reindex(df.index)
+
+
+def classify_logos(df, threshold_percentile=50, score_column='minimalism_score'):
+    """Split logos at a percentile of the minimalism score.
+
+    Rows without a score (cascade rejections, failed analyses) are non-minimalistic and
+    do not count for the percentile.
+
+    Returns:
+        (minimalistic rows, non-minimalistic rows, score threshold or NaN without scores)
+    """
+    scores = df[score_column]
+    scored = scores.dropna()
+    if scored.empty:
+        return df.iloc[:0], df, np.nan
+    threshold = float(np.percentile(scored, threshold_percentile))
+    is_minimalistic = scores >= threshold
+    return df[is_minimalistic], df[~is_minimalistic], threshold
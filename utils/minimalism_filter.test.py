@@ -0,0 +1,103 @@
+import contextlib
+import io
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from image_store import get_image, import_image_folder
+from minimalism_filter import (DEFAULT_THRESHOLDS, calculate_minimalism_score, cascade_filter_logo, cascade_filter_row,
+                               classify_logos, scoring_candidates)
+
+test_logos = sorted((Path(__file__).parent.parent / 'output' / 'final' / 'test' / 'logo').glob('*.png'))
+
+def synthetic_logos():
+    """Logos the cascade rejects: all black (no whitespace), noise on white (edges) and
+    a light textured photo (colors, it counts as whitespace)."""
+    rng = np.random.default_rng(0)
+    black = np.zeros((128, 128, 3), dtype=np.uint8)
+    noise = np.full((128, 128, 3), 255, dtype=np.uint8)
+    noise[32:96, 32:96] = rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)
+    photo = rng.integers(205, 256, (256, 256, 3), dtype=np.uint8)
+    return {'black': black, 'noise': noise, 'photo': photo}
+
+def cascade_batch():
+    """Cascade results joined with the batch frame like process_batch in filter_minimalistic_logos.ipynb."""
+    images = {path.stem: path for path in test_logos}
+    images.update(synthetic_logos())
+    df_batch = pd.DataFrame({'logo_path': list(images.values()), 'logo_id': list(images),
+                             'filename': [f"{logo_id}.png" for logo_id in images]})
+    results = df_batch.apply(cascade_filter_row, axis=1, thresholds=DEFAULT_THRESHOLDS)
+    return pd.concat([df_batch, results], axis=1)
+
+def test_cascade_classification():
+    """Rejected logos are non-minimalistic, the threshold only comes from the logos that passed."""
+
+    analysis_df = cascade_batch()
+    rejected = analysis_df.loc[~analysis_df['passed'], 'logo_id'].tolist()
+    assert set(rejected) == {'black', 'noise', 'photo'}, analysis_df[['logo_id', 'rejected_at']]
+    # The unique color default keeps anti-aliased logos, the preview already rejects the photo
+    assert analysis_df.set_index('logo_id').loc['photo', 'rejected_at'] == 'unique_colors_preview'
+    assert analysis_df['unique_colors'].max() > 4096
+    assert analysis_df['passed'].sum() == len(test_logos) > 0
+
+    analysis_df['minimalism_score'] = calculate_minimalism_score(analysis_df)
+    assert analysis_df.loc[analysis_df['passed'], 'minimalism_score'].between(0, 100).all()
+    assert analysis_df.loc[~analysis_df['passed'], 'minimalism_score'].isna().all()
+
+    minimalistic, non_minimalistic, threshold = classify_logos(analysis_df)
+    assert not np.isnan(threshold)
+    assert threshold == np.percentile(analysis_df.loc[analysis_df['passed'], 'minimalism_score'], 50)
+    assert len(minimalistic) > 0 and len(minimalistic) + len(non_minimalistic) == len(analysis_df)
+    assert set(rejected) <= set(non_minimalistic['logo_id'])
+    assert minimalistic['passed'].all()
+
+    print(f"{len(minimalistic)} of {len(analysis_df)} logos minimalistic, "
+          f"{len(rejected)} cascade rejections non-minimalistic (threshold {threshold:.1f})")
+
+def test_full_analysis_scores():
+    """Without a 'passed' column all analysed rows are scored, failed analyses (NaN) are not."""
+
+    analysis_df = cascade_batch().drop(columns=['passed', 'rejected_at'])
+    passed = analysis_df['whitespace_ratio'].notna() & analysis_df['color_variance'].notna()
+    assert scoring_candidates(analysis_df).tolist() == passed.tolist()
+
+    # Mixed journal: rows from batches without cascade have no 'passed' value
+    mixed = cascade_batch()
+    mixed['passed'] = mixed['passed'].astype(object)
+    mixed.loc[mixed['logo_id'] == test_logos[0].stem, 'passed'] = np.nan
+    assert scoring_candidates(mixed).tolist() == passed.tolist()
+
+    scores = calculate_minimalism_score(analysis_df)
+    assert scores[passed].notna().all() and scores[~passed].isna().all()
+
+    empty = analysis_df[~passed].assign(minimalism_score=np.nan)
+    minimalistic, non_minimalistic, threshold = classify_logos(empty)
+    assert minimalistic.empty and len(non_minimalistic) == len(empty) and np.isnan(threshold)
+
+    print(f"{int(passed.sum())} of {len(analysis_df)} rows scored without cascade results")
+
+def test_image_store_rows():
+    """With an image store the pixels come from the store, the logo paths do not have to exist."""
+
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:  # the store stays memory-mapped
+        store_path = Path(tmp) / 'logos.store'
+        store = import_image_folder(test_logos[0].parent, store_path, size=(256, 256))
+        fake_paths = [Path(tmp) / 'missing' / f"{path.stem}.png" for path in test_logos] + [Path(tmp) / 'unknown.png']
+        df_batch = pd.DataFrame({'logo_path': fake_paths, 'filename': [p.name for p in fake_paths]})
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = df_batch.apply(cascade_filter_row, axis=1, image_store=store_path)
+        for path, (_, result) in zip(test_logos, results.iterrows()):
+            expected = cascade_filter_logo(get_image(store, path.stem, bgr=True))
+            assert result['passed'] == expected['passed'] and result['whitespace_ratio'] == expected['whitespace_ratio']
+        assert results['rejected_at'].tolist()[-1] == 'error'
+        assert (results['rejected_at'] != 'error').sum() == len(test_logos)
+
+    print(f"Cascade read {len(test_logos)} logos from the image store")
+
+if __name__ == "__main__":
+    test_cascade_classification()
+    test_full_analysis_scores()
+    test_image_store_rows()
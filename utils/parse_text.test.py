@@ -3,17 +3,19 @@
 # amazing_logo_v4151950
 # value: "Simple elegant logo for WFDF, World Ultimate and Guts Championships 2008, Athletes, grey purple disc black person transparent running orange action sans pink blue layers sport colour serif catching green red rainbow frisbee yellow jumping ultimate player throwing, Sports, successful vibe, minimalist, thought-provoking, abstract, recognizable, relatable, sharp, vector art, even edges"
 
-from text import parse_text  # Adjust import based on your actual module structure
+import pandas as pd
+
+from text import parse_text, parse_text_batch  # Adjust import based on your actual module structure
+
+# List of test examples
+test_examples = [
+    'Simple elegant logo for Play, ""Altar Boyz"", pop Advertising People band boy Sunrise Silhouette technology, Theater, successful vibe, minimalist, thought-provoking, abstract, recognizable, relatable, sharp, vector art, even edges',
+    'Simple elegant logo for WFDF, World Ultimate and Guts Championships 2008, Athletes, grey purple disc black person transparent running orange action sans pink blue layers sport colour serif catching green red rainbow frisbee yellow jumping ultimate player throwing, Sports, successful vibe, minimalist, thought-provoking, abstract, recognizable, relatable, sharp, vector art, even edges'
+]
 
 def test_parse_text():
     """Test parse_text function with multiple examples."""
     
-    # List of test examples
-    test_examples = [
-        'Simple elegant logo for Play, ""Altar Boyz"", pop Advertising People band boy Sunrise Silhouette technology, Theater, successful vibe, minimalist, thought-provoking, abstract, recognizable, relatable, sharp, vector art, even edges',
-        'Simple elegant logo for WFDF, World Ultimate and Guts Championships 2008, Athletes, grey purple disc black person transparent running orange action sans pink blue layers sport colour serif catching green red rainbow frisbee yellow jumping ultimate player throwing, Sports, successful vibe, minimalist, thought-provoking, abstract, recognizable, relatable, sharp, vector art, even edges'
-    ]
-    
     for i, example_text in enumerate(test_examples, 1):
         print(f"\n--- Test Example {i} ---")
         print(f"Input text: {example_text}")
@@ -28,5 +30,33 @@ def test_parse_text():
             print(f"Error occurred: {e}")
             print(f"Error type: {type(e)}")
 
+def test_parse_text_batch():
+    """parse_text_batch must return the same values as parse_text for every row."""
+    
+    # The examples above plus edge cases (missing values, few parts, swaps, long and invalid tags)
+    batch_examples = test_examples + [
+        None,
+        float('nan'),
+        '',
+        'Only Company',
+        'Company, Description',
+        'Company,, Category, tag',
+        'Acme, Short, Very Long Category Name, tag one, tag & two, a very long tag here, , last',
+        'Acme, Food and Drinks, Restaurant & Bar and Grill, x',
+        'Acme Inc., a, b, c, .jpg, Dog & Cat, four word long tag',
+    ]
+    series = pd.Series(batch_examples, index=range(100, 100 + len(batch_examples)))
+    
+    result = parse_text_batch(series)
+    assert list(result.index) == list(series.index)
+    
+    for idx, example_text in series.items():
+        expected = parse_text(example_text)
+        actual = tuple(result.loc[idx, ['company', 'description', 'category', 'tags']])
+        assert actual == expected, f"Mismatch for {example_text!r}: {actual} != {expected}"
+    
+    print(f"parse_text_batch matches parse_text for {len(series)} examples")
+
 if __name__ == "__main__":
-    test_parse_text()
\ No newline at end of file
+    test_parse_text()
+    test_parse_text_batch()
\ No newline at end of file
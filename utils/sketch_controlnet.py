@@ -0,0 +1,655 @@
+"""ControlNet sketch generation (Stable Diffusion 1.5 + ControlNet).
+
+Moved out of `images.py` so the image analysis can be imported without torch, diffusers
+and controlnet_aux. The names are still available through `images`.
+
+Loaded pipelines are kept per process, keyed by (model_type, dtype, device, CPU profile):
+calling `setup_sketch_pipeline` again returns the loaded pipeline, a second ControlNet variant
+only loads its ControlNet and reuses UNet, VAE and text encoder of the first one (if both use
+the same channels_last and attention slicing settings, which change these modules). With a
+memory budget (`set_pipeline_budget` or SKETCH_PIPELINE_BUDGET_GB) the least recently used
+variants are evicted; `pipeline_stats()` lists load times, reuses and evictions.
+
+CPU_PROFILES select the CPU settings of a pipeline (threads, channels_last, bf16 autocast,
+torch.compile), per call or with SKETCH_CPU_PROFILE; `benchmark_sketch_profiles.py`
+measures the seconds per denoising step of every profile on the current host. Thread counts
+apply during the pipeline calls (`sketch_inference_context`); inter-op threads can only be
+set once per process, so profiles that set them should get their own process.
+"""
+
+import contextlib
+import gc
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import torch
+from PIL import Image
+from diffusers import StableDiffusionControlNetPipeline, ControlNetModel, UniPCMultistepScheduler
+
+from annotators import make_control_image
+
+
+# Preprocessing function to avoid hand/finger artifacts
+def preprocess_image_for_sketch(image, crop_bottom_percent=5):
+    """
+    Preprocess image to avoid hand/finger artifacts in generated sketches
+    
+    Args:
+        image: PIL Image
+        crop_bottom_percent: Percentage to crop from bottom to remove potential fingers
+    """
+    width, height = image.size
+    
+    # Option 1: Crop bottom portion where fingers usually appear
+    crop_height = int(height * (100 - crop_bottom_percent) / 100)
+    cropped_image = image.crop((0, 0, width, crop_height))
+    
+    # Resize back to original size with white padding at bottom
+    final_image = Image.new('RGB', (width, height), color='white')
+    final_image.paste(cropped_image, (0, 0))
+    
+    return final_image
+
+
+# Sketch generation parameters
+IMAGE_SIZE = (512, 512)  # ControlNet works best with 512x512
+NUM_INFERENCE_STEPS = 25
+GUIDANCE_SCALE = 8.0
+CONTROLNET_SCALE = 0.8
+SEED = 42  # every image gets its own generator with this seed (reproducible per image)
+SKETCH_BATCH_SIZE = 4
+
+# Optimized prompts for simple line sketches
+SKETCH_PROMPT = (
+    "abstact sketch of a logo made by hand with simple drawed lines. The lines are curvy and not straight because it is drawn by hand."
+    # "simple line drawing, minimal sketch, clean lines, "
+    # "black lines on white background, line art, outline drawing, "
+    # "simple sketch, minimalist drawing, basic outline, "
+    # "thin black lines, white background"
+)
+
+SKETCH_NEGATIVE_PROMPT = (
+    ""
+    "hands, fingers, human hand, thumb, palm, holding, gripping, pencil, exact match, shadows, straight lines, details"
+    # "colored, filled areas, shading, shadows, gradients, "
+    # "photographic, realistic, 3d render, complex details, "
+    # "textured, painted, thick lines, multiple colors, "
+    # "blurry, low quality, distorted, cartoon faces,"
+    # "person, human body parts, skin, flesh"
+)
+
+
+def _prepare_image(image_path, image=None, use_preprocessing=True):
+    """Load (or take the given PIL image), resize to IMAGE_SIZE and crop the finger area"""
+    image = (image if image is not None else Image.open(image_path)).convert("RGB")
+    image = image.resize(IMAGE_SIZE, Image.Resampling.LANCZOS)
+    if use_preprocessing:
+        image = preprocess_image_for_sketch(image, crop_bottom_percent=8)
+    return image
+
+
+def sketch_output_path(image_path, output_dir, model_type):
+    return Path(output_dir) / f"{Path(image_path).stem}_sketch_{model_type}.png"
+
+
+# slow on gpu, but fast on cpu, created the nice looking sketches
+def generate_sketch(image_path, pipeline_info, output_dir, use_preprocessing=True, image=None):
+    """Generate a human-like sketch from an image using ControlNet
+
+    image: optional already loaded PIL image (e.g. from a packed image store); image_path
+    is then only used for the output name (an id works as well)
+    """
+    
+    if pipeline_info is None or pipeline_info[0] is None:
+        print("❌ Pipeline not available")
+        return None
+    
+    pipeline, model_type = pipeline_info
+    print(f"🎨 Generating sketch for: {Path(image_path).name}")
+    print(f"🔧 Using model: {model_type}")
+    start_time = time.time()
+    
+    try:
+        # Load and preprocess the image (crop to avoid finger artifacts)
+        if use_preprocessing:
+            print("🧹 Preprocessing image to avoid finger artifacts...")
+        image = _prepare_image(image_path, image, use_preprocessing)
+        
+        # Create control input based on model type
+        # lineart -> LineartDetector, scribble -> HED, else canny (cached per process, annotators.py)
+        print(f"🔍 Creating control input for {model_type}...")
+        control_image = make_control_image(image, model_type)
+        
+        print("🚀 Generating simple line sketch...")
+        print(f"   Steps: {NUM_INFERENCE_STEPS}")
+        print(f"   Guidance: {GUIDANCE_SCALE}")
+        print(f"   ControlNet strength: {CONTROLNET_SCALE}")
+        
+        # Generate the sketch with optimized parameters for simple lines
+        with sketch_inference_context(pipeline):
+            result = pipeline(
+                prompt=SKETCH_PROMPT,
+                image=control_image,
+                negative_prompt=SKETCH_NEGATIVE_PROMPT,
+                num_inference_steps=NUM_INFERENCE_STEPS,
+                controlnet_conditioning_scale=CONTROLNET_SCALE,
+                guidance_scale=GUIDANCE_SCALE,
+                generator=torch.Generator().manual_seed(SEED)  # For reproducible results
+            )
+        
+        sketch = result.images[0]
+        
+        # Save the sketch
+        output_path = sketch_output_path(image_path, output_dir, model_type)
+        sketch.save(output_path)
+        
+        generation_time = time.time() - start_time
+        print(f"✅ Sketch generated in {generation_time:.1f} seconds")
+        print(f"💾 Saved to: {output_path}")
+        
+        return {
+            'original': image,
+            'control': control_image,
+            'sketch': sketch,
+            'output_path': output_path,
+            'generation_time': generation_time,
+            'model_type': model_type
+        }
+        
+    except Exception as e:
+        print(f"❌ Error generating sketch: {e}")
+        return None
+
+
+def encode_sketch_prompts(pipeline, prompt=SKETCH_PROMPT, negative_prompt=SKETCH_NEGATIVE_PROMPT):
+    """Text embeddings of the (fixed) sketch prompts, computed once per pipeline
+
+    Returns:
+        (prompt_embeds, negative_prompt_embeds), each with batch size 1
+    """
+    with torch.inference_mode():
+        return pipeline.encode_prompt(
+            prompt,
+            pipeline._execution_device,
+            num_images_per_prompt=1,
+            do_classifier_free_guidance=GUIDANCE_SCALE > 1,
+            negative_prompt=negative_prompt,
+        )
+
+
+def _image_seed(image_path, seed):
+    return seed(image_path) if callable(seed) else seed
+
+
+def generate_sketches(image_paths, pipeline_info=None, output_dir='.', batch_size=SKETCH_BATCH_SIZE,
+                      model_type="lineart", use_preprocessing=True, seed=SEED, load_image=None,
+                      skip_existing=True, verbose=True):
+    """Generate sketches for many images, one diffusion call per batch
+
+    The prompts are encoded once, the control images of a batch are built with the cached
+    annotators, and every image gets its own generator with `seed`, so a sketch does not
+    depend on the batch it ran in (with the default seed it matches `generate_sketch`).
+    Sketches are saved as soon as their batch is done (same names as generate_sketch).
+
+    Args:
+        pipeline_info: (pipeline, model_type) from setup_sketch_pipeline; None = set it up
+            for `model_type`
+        seed: int for all images or function image_path -> int
+        load_image: optional function image_path -> PIL image (e.g. from a packed image store)
+        skip_existing: skip images whose sketch already exists (resume)
+
+    Returns:
+        dict with 'images' (generated), 'skipped', 'failed' (paths), 'output_paths',
+        'seconds' and 'images_per_minute'
+    """
+    if pipeline_info is None:
+        pipeline_info = setup_sketch_pipeline(model_type)
+    if pipeline_info is None or pipeline_info[0] is None:
+        print("❌ Pipeline not available")
+        return None
+    pipeline, model_type = pipeline_info
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    todo = [p for p in image_paths if not (skip_existing and sketch_output_path(p, output_dir, model_type).exists())]
+    stats = {'images': 0, 'skipped': len(image_paths) - len(todo), 'failed': [], 'output_paths': []}
+    prompt_embeds, negative_prompt_embeds = encode_sketch_prompts(pipeline)
+    start = time.perf_counter()
+
+    for batch_start in range(0, len(todo), batch_size):
+        batch, controls = [], []
+        for image_path in todo[batch_start:batch_start + batch_size]:
+            try:
+                image = _prepare_image(image_path, load_image(image_path) if load_image else None, use_preprocessing)
+                controls.append(make_control_image(image, model_type))
+                batch.append(image_path)
+            except Exception as e:
+                print(f"\n❌ Error preparing {Path(image_path).name}: {e}")
+                stats['failed'].append(image_path)
+        if not batch:
+            continue
+
+        try:
+            with sketch_inference_context(pipeline):
+                result = pipeline(
+                    prompt_embeds=prompt_embeds.repeat(len(batch), 1, 1),
+                    negative_prompt_embeds=negative_prompt_embeds.repeat(len(batch), 1, 1),
+                    image=controls,
+                    num_inference_steps=NUM_INFERENCE_STEPS,
+                    controlnet_conditioning_scale=CONTROLNET_SCALE,
+                    guidance_scale=GUIDANCE_SCALE,
+                    generator=[torch.Generator().manual_seed(_image_seed(p, seed)) for p in batch],
+                )
+        except Exception as e:
+            print(f"\n❌ Error generating batch {batch_start // batch_size + 1}: {e}")
+            stats['failed'].extend(batch)
+            continue
+
+        for image_path, sketch in zip(batch, result.images):
+            output_path = sketch_output_path(image_path, output_dir, model_type)
+            sketch.save(output_path)
+            stats['output_paths'].append(output_path)
+        stats['images'] += len(batch)
+
+        if verbose:
+            elapsed = time.perf_counter() - start
+            print(f"\r   🎨 {stats['images']:,}/{len(todo):,} Sketches | {stats['images'] / elapsed * 60:.1f} Bilder/min",
+                  end='', flush=True)
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['images_per_minute'] = stats['images'] / stats['seconds'] * 60 if stats['seconds'] > 0 else 0.0
+    if verbose:
+        print(f"\n✅ {stats['images']} Sketches in {stats['seconds']:.1f}s ({stats['images_per_minute']:.1f} Bilder/min), "
+              f"{stats['skipped']} übersprungen, {len(stats['failed'])} fehlgeschlagen")
+    return stats
+    
+
+
+MODEL_CACHE_DIR = '../../models/controlnet_cache'  # Local cache for models
+# Centralized model id maps to keep selection consistent between setup functions
+MODEL_MAP = {
+    'lineart': 'lllyasviel/control_v11p_sd15_lineart',
+    'lineart_anime': 'lllyasviel/control_v11p_sd15s2_lineart_anime',
+    'canny': 'lllyasviel/control_v11p_sd15_canny',
+}
+
+FALLBACK_MODELS = {
+    'lineart': 'lllyasviel/sd-controlnet-canny',
+    'lineart_anime': 'lllyasviel/sd-controlnet-canny',
+    'canny': 'lllyasviel/sd-controlnet-canny',
+    'scribble': 'lllyasviel/sd-controlnet-canny'
+}
+
+
+def _default_dtype():
+    return torch.bfloat16 if torch.cuda.is_available() else torch.float32
+
+
+def _default_device():
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _load_controlnet_model(model_type: str, dtype=None):
+    """Load a ControlNet model with fallback handling.
+
+    Returns (controlnet, resolved_model_type, model_id_used, dtype)
+    """
+    if model_type not in MODEL_MAP and model_type not in FALLBACK_MODELS:
+        print(f"❌ Unknown model type: {model_type}")
+        return None, None, None, None
+
+    model_id = MODEL_MAP.get(model_type, FALLBACK_MODELS.get(model_type))
+    dtype = dtype or _default_dtype()
+
+    print(f"🔄 Trying primary model: {model_id}")
+    try:
+        controlnet = ControlNetModel.from_pretrained(
+            model_id,
+            torch_dtype=dtype,
+            cache_dir=MODEL_CACHE_DIR,
+        )
+        print(f"✅ Successfully loaded: {model_id}")
+        return controlnet, model_type, model_id, dtype
+
+    except Exception as e:
+        # If there is a specified fallback for this logical model_type, try it
+        fallback = FALLBACK_MODELS.get(model_type)
+        if fallback is None:
+            print(f"❌ ControlNet load failed and no fallback available: {e}")
+            return None, None, None, None
+
+        print(f"⚠️ Primary model failed: {e}")
+        print(f"🔄 Trying fallback model: {fallback}")
+        try:
+            controlnet = ControlNetModel.from_pretrained(
+                fallback,
+                torch_dtype=dtype,
+                cache_dir=MODEL_CACHE_DIR,
+            )
+            print(f"✅ Successfully loaded fallback: {fallback}")
+            # reflect that we ended up using a canny-type controlnet
+            return controlnet, 'canny', fallback, dtype
+
+        except Exception as e2:
+            print(f"❌ Both primary and fallback models failed:")
+            print(f"   Primary error: {e}")
+            print(f"   Fallback error: {e2}")
+            return None, None, None, None
+
+# CPU settings per profile:
+#   num_threads                    torch intra-op threads during a pipeline call (None = torch default)
+#   interop_threads                torch inter-op threads, only settable once per process (own process)
+#   channels_last                  NHWC memory format for UNet, ControlNet and VAE
+#   bf16_autocast                  bfloat16 autocast during inference, only if the CPU supports it
+#   compile                        torch.compile of the UNet (slow first call)
+#   attention_slicing              lower peak memory, but slower on CPU
+CPU_PROFILES = {
+    'default': {'num_threads': None, 'interop_threads': None, 'channels_last': False,
+                'bf16_autocast': False, 'compile': False, 'attention_slicing': True},
+    'fast': {'num_threads': None, 'interop_threads': None, 'channels_last': True,
+             'bf16_autocast': True, 'compile': False, 'attention_slicing': False},
+    'compiled': {'num_threads': None, 'interop_threads': None, 'channels_last': True,
+                 'bf16_autocast': True, 'compile': True, 'attention_slicing': False},
+}
+CPU_PROFILE = os.environ.get('SKETCH_CPU_PROFILE', 'default')
+
+
+def resolve_cpu_profile(profile=None):
+    """(name, settings) for a profile name, a settings dict (may set 'name') or None = CPU_PROFILE"""
+    profile = CPU_PROFILE if profile is None else profile
+    if isinstance(profile, dict):
+        return profile.get('name', 'custom'), {**CPU_PROFILES['default'], **profile}
+    if profile not in CPU_PROFILES:
+        raise ValueError(f"Unbekanntes CPU-Profil: {profile} (erlaubt: {', '.join(CPU_PROFILES)})")
+    return profile, CPU_PROFILES[profile]
+
+
+def cpu_supports_bf16():
+    """True if PyTorch can run bfloat16 kernels efficiently on this CPU (AVX512-BF16 / AMX)"""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except Exception:
+        return False
+
+
+def _set_interop_threads(settings):
+    if settings['interop_threads']:
+        try:
+            torch.set_num_interop_threads(settings['interop_threads'])
+        except RuntimeError as e:
+            # Only possible before the first parallel work of the process
+            print(f"⚠️ Inter-op Threads nicht gesetzt (Profil braucht einen eigenen Prozess): {e}")
+
+
+@contextlib.contextmanager
+def sketch_inference_context(pipe):
+    """Context for a pipeline call: intra-op threads and bf16 autocast of the pipe's CPU profile
+
+    torch threads are process-wide, so they are set for the call and restored afterwards;
+    pipelines with different profiles can then run in turn in one process. Inter-op threads
+    can only be set once per process: profiles with `interop_threads` need their own process
+    (like benchmark_sketch_profiles.py and sketch_jobs.py workers).
+    """
+    settings = getattr(pipe, 'cpu_settings', {})
+    previous_threads = torch.get_num_threads()
+    if settings.get('num_threads'):
+        torch.set_num_threads(settings['num_threads'])
+    autocast = torch.autocast('cpu', dtype=torch.bfloat16) if settings.get('bf16_autocast_active') \
+        else contextlib.nullcontext()
+    try:
+        with autocast:
+            yield
+    finally:
+        if settings.get('num_threads'):
+            torch.set_num_threads(previous_threads)
+
+
+# Loaded pipelines in LRU order: (model_type, dtype, device, cpu profile) -> entry dict
+_pipelines = OrderedDict()
+# Shared Stable Diffusion components (unet, vae, text_encoder, ...) per (dtype, device,
+# channels_last, attention_slicing): profiles that change the modules in place get their own
+_base_components = {}
+_load_log = []
+_pipeline_counters = {'reused': 0, 'evicted': 0}
+
+# Memory budget for all loaded pipelines in GB, None = unlimited
+PIPELINE_BUDGET_GB = float(os.environ['SKETCH_PIPELINE_BUDGET_GB']) if os.environ.get('SKETCH_PIPELINE_BUDGET_GB') else None
+
+
+def set_pipeline_budget(budget_gb):
+    """Memory budget for the loaded pipelines (None = unlimited), evicts right away if needed"""
+    global PIPELINE_BUDGET_GB
+    PIPELINE_BUDGET_GB = budget_gb
+    _evict_to_budget()
+
+
+def _module_bytes(module):
+    return sum(p.numel() * p.element_size() for p in module.parameters()) if module is not None else 0
+
+
+def _pipelines_bytes():
+    bases = {entry['base_key'] for entry in _pipelines.values()}
+    return sum(_base_components[key]['bytes'] for key in bases) + sum(e['bytes'] for e in _pipelines.values())
+
+
+def _evict_to_budget(keep=None):
+    """Drop least recently used pipelines until the budget holds (never `keep`)"""
+    if PIPELINE_BUDGET_GB is None:
+        return
+    budget = PIPELINE_BUDGET_GB * 1024 ** 3
+    evicted = False
+    for key in list(_pipelines):
+        if _pipelines_bytes() <= budget:
+            break
+        if key == keep:
+            continue
+        entry = _pipelines.pop(key)
+        _pipeline_counters['evicted'] += 1
+        evicted = True
+        print(f"🗑️ Pipeline {key[0]} ({key[1]}, {key[2]}) entladen (Budget {PIPELINE_BUDGET_GB:.1f} GB)")
+        if not any(e['base_key'] == entry['base_key'] for e in _pipelines.values()):
+            _base_components.pop(entry['base_key'], None)
+    if evicted:
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+
+def _shared_module_settings(device, profile=None):
+    """Profile settings that _configure_pipe applies in place to the shared UNet and VAE"""
+    if device != "cpu":
+        return ()
+    settings = resolve_cpu_profile(profile)[1]
+    return (settings['channels_last'], settings['attention_slicing'])
+
+
+def _build_pipe(controlnet, dtype, device, profile=None):
+    """Pipeline for a ControlNet; reuses the Stable Diffusion components loaded for the same
+    dtype, device and module settings of the CPU profile"""
+    base_key = (str(dtype), device, *_shared_module_settings(device, profile))
+    shared = base_key in _base_components
+    if shared:
+        components = _base_components[base_key]['components']
+        pipe = StableDiffusionControlNetPipeline(**components, controlnet=controlnet, requires_safety_checker=False)
+    else:
+        try:
+            pipe = _load_pipe(True, controlnet, dtype)
+        except TypeError:
+            pipe = _load_pipe(False, controlnet, dtype)
+        components = {name: c for name, c in pipe.components.items() if name != 'controlnet'}
+        _base_components[base_key] = {
+            'components': components,
+            'bytes': sum(_module_bytes(c) for c in components.values() if hasattr(c, 'parameters')),
+        }
+    return _configure_pipe(pipe, device, profile), base_key, shared
+
+
+def get_sketch_pipeline(model_type="lineart", dtype=None, device=None, profile=None):
+    """Loaded pipeline for (model_type, dtype, device, CPU profile), loads it on first use
+
+    Returns:
+        (pipeline, resolved model_type) - exceptions of the pipeline setup are passed on
+    """
+    dtype = dtype or _default_dtype()
+    device = device or _default_device()
+    key = (model_type, str(dtype), device, resolve_cpu_profile(profile)[0])
+    if key in _pipelines:
+        _pipelines.move_to_end(key)
+        _pipeline_counters['reused'] += 1
+        entry = _pipelines[key]
+        print(f"♻️ Pipeline {model_type} ({key[1]}, {device}) wiederverwendet")
+        return entry['pipe'], entry['model_type']
+
+    start_time = time.time()
+    controlnet, resolved_type, used_model_id, dtype = _load_controlnet_model(model_type, dtype)
+    if controlnet is None:
+        return None, None
+    pipe, base_key, shared = _build_pipe(controlnet, dtype, device, profile)
+
+    load_time = time.time() - start_time
+    _pipelines[key] = {
+        'pipe': pipe,
+        'model_type': resolved_type,
+        'model_id': used_model_id,
+        'base_key': base_key,
+        'bytes': _module_bytes(controlnet),
+    }
+    _load_log.append({'key': key, 'model_id': used_model_id, 'seconds': load_time, 'shared_base': shared})
+    _evict_to_budget(keep=key)
+    return pipe, resolved_type
+
+
+def pipeline_stats():
+    """Load statistics of this process
+
+    Returns:
+        dict with 'loads' (key, model_id, seconds, shared_base per load), 'reused', 'evicted',
+        'loaded' (keys in LRU order, oldest first) and 'memory_gb' of the loaded pipelines
+    """
+    return {
+        'loads': list(_load_log),
+        **_pipeline_counters,
+        'loaded': list(_pipelines),
+        'memory_gb': _pipelines_bytes() / 1024 ** 3,
+    }
+
+
+def release_sketch_pipelines():
+    """Drop all loaded pipelines and shared components"""
+    _pipelines.clear()
+    _base_components.clear()
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+# Setup ControlNet pipeline for sketch generation
+def setup_sketch_pipeline(model_type="lineart", dtype=None, device=None, profile=None):
+    """Initialize the ControlNet pipeline for generating sketches
+    
+    model_type options:
+    - 'lineart': Better for simple line drawings
+    - 'lineart_anime': Anime-style line art
+    - 'canny': Edge-based (current approach)
+    - 'scribble': Hand-drawn scribble style
+
+    profile: CPU profile name from CPU_PROFILES or a settings dict (None = CPU_PROFILE)
+
+    Already loaded pipelines are reused (see module docstring).
+    """
+    print(f"🔄 Loading ControlNet model: {model_type}")
+    start_time = time.time()
+    
+    try:
+        pipe, model_type = get_sketch_pipeline(model_type, dtype, device, profile)
+        if pipe is None:
+            return None, None
+        
+        load_time = time.time() - start_time
+        print(f"✅ Pipeline setup complete in {load_time:.1f} seconds")
+        
+        return pipe, model_type
+        
+    except Exception as e:
+        print(f"❌ Error setting up pipeline: {e}")
+        return None, None
+
+
+def _configure_pipe(pipe, device=None, profile=None):
+    """Common pipe configuration: scheduler, device placement, and optional accelerations.
+
+    profile: CPU profile (see CPU_PROFILES), applied when the pipe runs on the CPU
+    """
+    # Use faster scheduler
+    pipe.scheduler = UniPCMultistepScheduler.from_config(pipe.scheduler.config)
+
+    # Move to GPU if available
+    if (device or _default_device()) != "cpu":
+        pipe = pipe.to(device or _default_device())
+        print("🚀 Pipeline loaded on GPU")
+    else:
+        print("💻 Pipeline loaded on CPU")
+
+    # Optional accelerations (xFormers disabled by default)
+    try:
+        # if 'USE_XFORMERS' in globals() and USE_XFORMERS:
+        #     pipe.enable_xformers_memory_efficient_attention()
+        #     print("⚡ XFormers acceleration enabled")
+        # else:
+        print("ℹ️ XFormers disabled (USE_XFORMERS=False)")
+    except Exception as ex:
+        print(f"ℹ️ XFormers not enabled: {ex}")
+
+    name, settings = resolve_cpu_profile(profile)
+    settings = dict(settings, bf16_autocast_active=False)
+    if (device or _default_device()) != "cpu":
+        settings.update(attention_slicing=True, num_threads=None)
+    else:
+        _set_interop_threads(settings)
+        if settings['channels_last']:
+            for module in (pipe.unet, pipe.controlnet, pipe.vae):
+                module.to(memory_format=torch.channels_last)
+        if settings['bf16_autocast']:
+            settings['bf16_autocast_active'] = cpu_supports_bf16()
+            if not settings['bf16_autocast_active']:
+                print("ℹ️ CPU ohne bf16-Unterstützung, bleibe bei float32")
+        if settings['compile']:
+            pipe.unet = torch.compile(pipe.unet)
+        print(f"⚙️ CPU-Profil {name}: {settings['num_threads'] or torch.get_num_threads()} Threads, channels_last={settings['channels_last']}, "
+              f"bf16={settings['bf16_autocast_active']}, compile={settings['compile']}")
+
+    if settings['attention_slicing']:
+        try:
+            pipe.enable_attention_slicing()
+        except Exception:
+            pass
+
+    pipe.cpu_settings = settings
+    return pipe
+
+
+def _load_pipe(with_safety_args: bool, controlnet, dtype=None):
+    """Load StableDiffusionControlNetPipeline with consistent dtype and cache settings."""
+    if dtype is None:
+        dtype = torch.float16 if torch.cuda.is_available() else torch.float32
+
+    common_kwargs = dict(
+        controlnet=controlnet,
+        torch_dtype=dtype,
+        cache_dir=MODEL_CACHE_DIR,
+    )
+
+    if with_safety_args:
+        return StableDiffusionControlNetPipeline.from_pretrained(
+            "runwayml/stable-diffusion-v1-5",
+            safety_checker=None,
+            requires_safety_checker=False,
+            **common_kwargs,
+        )
+    else:
+        return StableDiffusionControlNetPipeline.from_pretrained(
+            "runwayml/stable-diffusion-v1-5",
+            **common_kwargs,
+        )
\ No newline at end of file
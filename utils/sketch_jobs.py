@@ -0,0 +1,317 @@
+"""Sketch generation as resumable job list for several worker processes (and machines).
+
+All logos of a run are registered once in a SQLite manifest (`jobs` table: id, path,
+status pending/running/done/failed, attempts, worker, error). Worker processes claim small
+batches of pending jobs in a transaction, generate them with `generate_sketches` and mark
+them done; failed jobs go back to pending until `max_attempts` is reached. An expired lease
+or a crashed worker counts as failed attempt too, so a logo that kills its worker is not
+handed out forever. Handing out work on demand keeps all workers busy even if some logos
+take longer.
+
+The CPU cores are split between the workers: every worker loads its own pipeline and gets
+`threads_per_worker` PyTorch threads (CPU profile of sketch_controlnet). An interrupted run
+continues with the same manifest. A worker that raises releases its jobs right away, jobs
+of a local worker process that crashed are released when the run ends, jobs of a worker
+that died on another machine stay 'running' until their lease expires. Several machines can work on one manifest on a shared filesystem
+(`shared_fs=True` uses a rollback journal instead of WAL, which needs shared memory on a
+single host).
+
+Example:
+    run_sketch_jobs(image_paths, output_dir, output_dir / 'sketch_jobs.sqlite', n_workers=4)
+    python sketch_jobs.py ../output/amazing_logos_v4/images/balanced_sample_2k_512x512 out/ --workers 4
+"""
+
+import multiprocessing
+import os
+import queue
+import socket
+import sqlite3
+import time
+from pathlib import Path
+
+from analysis_executor import available_cores
+
+STATUSES = ('pending', 'running', 'done', 'failed')
+DEFAULT_MAX_ATTEMPTS = 3
+# Seconds after which a claimed job of a silent worker is handed out again
+DEFAULT_LEASE_SECONDS = 30 * 60
+
+# Connections per (path, pid), so spawned workers never share a connection
+_connections = {}
+
+
+def connect_job_manifest(path, shared_fs=False):
+    """Open (and create) the job manifest, one connection per process and path"""
+    key = (str(path), os.getpid())
+    if key in _connections:
+        return _connections[key]
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=120, isolation_level=None)
+    conn.execute(f"PRAGMA journal_mode={'DELETE' if shared_fs else 'WAL'}")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker TEXT,
+            claimed_at REAL,
+            finished_at REAL,
+            error TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+    _connections[key] = conn
+    return conn
+
+
+def add_jobs(conn, image_paths, done_ids=()):
+    """Register logos (id = file stem); already registered ids keep their state
+
+    Args:
+        done_ids: ids whose output already exists, they are registered as done
+
+    Returns:
+        number of new jobs
+    """
+    done_ids = set(done_ids)
+    rows = [
+        (Path(p).stem, str(p), 'done' if Path(p).stem in done_ids else 'pending')
+        for p in image_paths
+    ]
+    before = conn.total_changes
+    conn.execute("BEGIN IMMEDIATE")
+    conn.executemany("INSERT OR IGNORE INTO jobs (id, path, status) VALUES (?, ?, ?)", rows)
+    conn.execute("COMMIT")
+    return conn.total_changes - before
+
+
+# A running job given up (lease expired, worker died) counts as failed attempt
+_GIVE_UP = ("UPDATE jobs SET attempts = attempts + 1, worker = NULL, error = ?, finished_at = ?, "
+            "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END WHERE status = 'running' AND ")
+
+
+def requeue_stale(conn, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Hand out jobs again that were claimed longer than `lease_seconds` ago (counts as attempt)"""
+    now = time.time()
+    cursor = conn.execute(_GIVE_UP + "claimed_at < ?", ('lease expired', now, max_attempts, now - lease_seconds))
+    return cursor.rowcount
+
+
+def claim_jobs(conn, worker, n, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Claim up to `n` pending jobs for `worker` (atomic across processes and machines)
+
+    Returns:
+        list of (id, path)
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        jobs = conn.execute(
+            "SELECT id, path FROM jobs WHERE status = 'pending' AND attempts < ? ORDER BY attempts, id LIMIT ?",
+            (max_attempts, n)
+        ).fetchall()
+        conn.executemany(
+            "UPDATE jobs SET status = 'running', worker = ?, claimed_at = ? WHERE id = ?",
+            [(worker, time.time(), job_id) for job_id, _ in jobs]
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return jobs
+
+
+def finish_jobs(conn, done_ids, errors=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Mark jobs done; jobs in `errors` (id -> message) are retried until max_attempts"""
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    conn.executemany(
+        "UPDATE jobs SET status = 'done', finished_at = ?, error = NULL WHERE id = ?",
+        [(now, job_id) for job_id in done_ids]
+    )
+    conn.executemany(
+        "UPDATE jobs SET attempts = attempts + 1, error = ?, finished_at = ?, "
+        "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END WHERE id = ?",
+        [(str(error), now, max_attempts, job_id) for job_id, error in (errors or {}).items()]
+    )
+    conn.execute("COMMIT")
+
+
+def job_counts(conn):
+    """{status: number of jobs} for all STATUSES"""
+    counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+    return {status: counts.get(status, 0) for status in STATUSES}
+
+
+def release_worker_jobs(conn, worker, max_attempts=DEFAULT_MAX_ATTEMPTS, error='worker stopped'):
+    """Put the running jobs of a worker that died back to pending (counts as attempt)"""
+    return conn.execute(_GIVE_UP + "worker = ?", (error, time.time(), max_attempts, worker)).rowcount
+
+
+def retry_failed(conn):
+    """Put all failed jobs back to pending with reset attempts (e.g. after fixing the cause)"""
+    return conn.execute("UPDATE jobs SET status = 'pending', attempts = 0 WHERE status = 'failed'").rowcount
+
+
+def _image_loader(input_store):
+    if input_store is None:
+        return None
+    from image_store import get_pil_image, open_image_store
+    return lambda path: get_pil_image(open_image_store(input_store), Path(path).stem)
+
+
+def run_sketch_worker(manifest_path, output_dir, model_type='lineart', threads=None, batch_size=1,
+                      max_attempts=DEFAULT_MAX_ATTEMPTS, profile='default', input_store=None, shared_fs=False):
+    """Worker: own pipeline, claims batches until no pending job is left
+
+    Returns:
+        (worker name, generated, failed attempts)
+    """
+    from sketch_controlnet import CPU_PROFILES, generate_sketches, setup_sketch_pipeline
+
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    settings = dict(CPU_PROFILES[profile] if isinstance(profile, str) else profile)
+    settings['name'] = profile if isinstance(profile, str) else settings.get('name', 'custom')
+    if threads:
+        settings.update(num_threads=threads, interop_threads=1)
+    pipeline_info = setup_sketch_pipeline(model_type, profile=settings)
+    conn = connect_job_manifest(manifest_path, shared_fs)
+    load_image = _image_loader(input_store)
+    generated, failed = 0, 0
+
+    while True:
+        jobs = claim_jobs(conn, worker, batch_size, max_attempts)
+        if not jobs:
+            break
+        if pipeline_info[0] is None:
+            # Without a pipeline nothing can succeed, give the jobs back and stop
+            finish_jobs(conn, [], {job_id: 'Pipeline not available' for job_id, _ in jobs}, max_attempts)
+            break
+        paths = [path for _, path in jobs]
+        stats = generate_sketches(paths, pipeline_info, output_dir, batch_size=batch_size,
+                                  load_image=load_image, skip_existing=False, verbose=False)
+        failed_paths = {str(p) for p in stats['failed']}
+        errors = {job_id: 'generation failed' for job_id, path in jobs if path in failed_paths}
+        finish_jobs(conn, [job_id for job_id, _ in jobs if job_id not in errors], errors, max_attempts)
+        generated += stats['images']
+        failed += len(errors)
+    return worker, generated, failed
+
+
+def _worker_main(kwargs, results):
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    try:
+        results.put(run_sketch_worker(**kwargs))
+    except Exception as e:
+        # Give the claimed jobs back right away instead of leaving them running until the lease expires
+        conn = connect_job_manifest(kwargs['manifest_path'], kwargs['shared_fs'])
+        release_worker_jobs(conn, worker, kwargs['max_attempts'], repr(e))
+        results.put((worker, 0, repr(e)))
+
+
+def run_sketch_jobs(image_paths, output_dir, manifest_path=None, n_workers=None, threads_per_worker=None,
+                    model_type='lineart', batch_size=1, max_attempts=DEFAULT_MAX_ATTEMPTS, profile='default',
+                    input_store=None, lease_seconds=DEFAULT_LEASE_SECONDS, shared_fs=False):
+    """Register the logos and generate their sketches with `n_workers` processes
+
+    Args:
+        image_paths: logo paths (or <id>.png pseudo paths with input_store)
+        manifest_path: SQLite manifest (default output_dir / sketch_jobs.sqlite); a second
+            machine passes the same manifest and output_dir to work on the same run
+        n_workers: worker processes (default: one per 8 cores, at least 1)
+        threads_per_worker: PyTorch threads per worker (default: cores // n_workers)
+        input_store: optional packed image store (image_store.py) to read the logos from
+
+    Returns:
+        job counts per status after the run
+    """
+    from sketch_controlnet import sketch_output_path
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = Path(manifest_path) if manifest_path else output_dir / 'sketch_jobs.sqlite'
+    cores = available_cores()
+    n_workers = n_workers or max(1, cores // 8)
+    threads_per_worker = threads_per_worker or max(1, cores // n_workers)
+
+    conn = connect_job_manifest(manifest_path, shared_fs)
+    # Sketches of earlier runs without a manifest count as done
+    done_ids = [Path(p).stem for p in image_paths if sketch_output_path(p, output_dir, model_type).exists()]
+    added = add_jobs(conn, image_paths, done_ids)
+    stale = requeue_stale(conn, lease_seconds, max_attempts)
+    counts = job_counts(conn)
+    print(f"📋 {added:,} neue Jobs, {stale} abgelaufene wieder offen | "
+          + ", ".join(f"{status}: {count:,}" for status, count in counts.items()))
+    print(f"🚀 {n_workers} Worker x {threads_per_worker} Threads ({cores} Kerne), Batch {batch_size}")
+
+    start = time.perf_counter()
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    kwargs = dict(manifest_path=str(manifest_path), output_dir=str(output_dir), model_type=model_type,
+                  threads=threads_per_worker, batch_size=batch_size, max_attempts=max_attempts,
+                  profile=profile, input_store=str(input_store) if input_store else None, shared_fs=shared_fs)
+    workers = [context.Process(target=_worker_main, args=(kwargs, results)) for _ in range(n_workers)]
+    for process in workers:
+        process.start()
+    remaining = len(workers)
+    while remaining:
+        try:
+            worker, generated, failed = results.get(timeout=10)
+        except queue.Empty:
+            if any(process.is_alive() for process in workers):
+                continue
+            break
+        remaining -= 1
+        if isinstance(failed, str):
+            print(f"❌ Worker {worker} abgebrochen: {failed}")
+        else:
+            print(f"✅ Worker {worker}: {generated:,} Sketches, {failed} Fehlversuche")
+    for process in workers:
+        process.join()
+        if process.exitcode != 0:
+            released = release_worker_jobs(conn, f"{socket.gethostname()}:{process.pid}", max_attempts,
+                                           f"exit code {process.exitcode}")
+            print(f"❌ Worker {process.pid} beendet mit Code {process.exitcode}, {released} Jobs wieder offen")
+
+    minutes = (time.perf_counter() - start) / 60
+    counts = job_counts(conn)
+    print(f"📊 {', '.join(f'{status}: {count:,}' for status, count in counts.items())} in {minutes:.1f} min")
+    return counts
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate sketches with several workers from a job manifest")
+    parser.add_argument("input_dir", help="Folder with the logos (or the folder name used with --input-store)")
+    parser.add_argument("output_dir")
+    parser.add_argument("--manifest", default=None, help="SQLite manifest (default: output_dir/sketch_jobs.sqlite)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--threads", type=int, default=None, help="PyTorch threads per worker")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--model-type", default="lineart")
+    parser.add_argument("--profile", default="default", help="CPU profile of sketch_controlnet")
+    parser.add_argument("--input-store", default=None, help="Packed image store with the logos")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS)
+    parser.add_argument("--shared-fs", action="store_true", help="Manifest on a filesystem shared by several machines")
+    parser.add_argument("--status", action="store_true", help="Only print the job counts")
+    parser.add_argument("--retry-failed", action="store_true", help="Put failed jobs back to pending first")
+    args = parser.parse_args()
+
+    manifest = args.manifest or str(Path(args.output_dir) / 'sketch_jobs.sqlite')
+    if args.status or args.retry_failed:
+        conn = connect_job_manifest(manifest, args.shared_fs)
+        if args.retry_failed:
+            print(f"🔄 {retry_failed(conn)} fehlgeschlagene Jobs wieder offen")
+        print(job_counts(conn))
+        if args.status:
+            raise SystemExit(0)
+
+    if args.input_store:
+        from image_store import open_image_store, stored_ids
+        paths = [Path(args.input_dir) / f"{image_id}.png" for image_id in stored_ids(open_image_store(args.input_store))]
+    else:
+        paths = sorted(p for p in Path(args.input_dir).iterdir() if p.suffix.lower() in ('.png', '.jpg', '.jpeg', '.webp'))
+    run_sketch_jobs(paths, args.output_dir, manifest, args.workers, args.threads, args.model_type, args.batch_size,
+                    args.max_attempts, args.profile, args.input_store, shared_fs=args.shared_fs)
@@ -0,0 +1,69 @@
+import tempfile
+from pathlib import Path
+
+from sketch_jobs import (add_jobs, claim_jobs, connect_job_manifest, finish_jobs, job_counts, release_worker_jobs,
+                         requeue_stale, retry_failed)
+
+def job_states(conn):
+    """{id: (status, attempts, worker)} of all jobs"""
+    rows = conn.execute("SELECT id, status, attempts, worker FROM jobs").fetchall()
+    return {job_id: (status, attempts, worker) for job_id, status, attempts, worker in rows}
+
+def test_claim_and_finish():
+    """Jobs are claimed once, done jobs stay done, failed jobs are retried until max_attempts."""
+
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:  # the manifest stays open
+        conn = connect_job_manifest(Path(tmp) / 'jobs.sqlite')
+        assert add_jobs(conn, [f"logos/{name}.png" for name in 'abcd'], done_ids=['d']) == 4
+        assert add_jobs(conn, ['logos/a.png', 'logos/e.png']) == 1
+
+        first = claim_jobs(conn, 'w1', 2, max_attempts=2)
+        second = claim_jobs(conn, 'w2', 10, max_attempts=2)
+        assert [job_id for job_id, _ in first] == ['a', 'b']
+        assert [job_id for job_id, _ in second] == ['c', 'e']
+        assert claim_jobs(conn, 'w3', 10, max_attempts=2) == []
+        assert job_counts(conn) == {'pending': 0, 'running': 4, 'done': 1, 'failed': 0}
+
+        finish_jobs(conn, ['a'], {'b': 'generation failed'}, max_attempts=2)
+        assert job_states(conn)['a'][0] == 'done'
+        assert job_states(conn)['b'][:2] == ('pending', 1)
+
+        # b gets its second and last attempt
+        assert claim_jobs(conn, 'w1', 10, max_attempts=2) == [('b', 'logos/b.png')]
+        finish_jobs(conn, [], {'b': 'generation failed'}, max_attempts=2)
+        assert job_states(conn)['b'][:2] == ('failed', 2)
+
+        assert retry_failed(conn) == 1
+        assert job_states(conn)['b'][:2] == ('pending', 0)
+
+    print("Jobs move pending -> running -> done/failed as expected")
+
+def test_requeue_and_release():
+    """Expired leases and released jobs count as attempts, so a crashing logo ends as failed."""
+
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:  # the manifest stays open
+        conn = connect_job_manifest(Path(tmp) / 'jobs.sqlite')
+        add_jobs(conn, ['logos/a.png', 'logos/b.png'])
+
+        claim_jobs(conn, 'w1', 1, max_attempts=2)
+        claim_jobs(conn, 'w2', 1, max_attempts=2)
+        assert requeue_stale(conn, lease_seconds=3600, max_attempts=2) == 0
+        assert release_worker_jobs(conn, 'w1', max_attempts=2) == 1
+        assert job_states(conn)['a'] == ('pending', 1, None)
+        assert job_states(conn)['b'] == ('running', 0, 'w2')
+
+        assert requeue_stale(conn, lease_seconds=-1, max_attempts=2) == 1
+        assert job_states(conn)['b'] == ('pending', 1, None)
+
+        # Second crash of a: no third attempt
+        assert claim_jobs(conn, 'w3', 1, max_attempts=2) == [('a', 'logos/a.png')]
+        assert release_worker_jobs(conn, 'w3', max_attempts=2, error='exit code 1') == 1
+        assert job_states(conn)['a'] == ('failed', 2, None)
+        assert conn.execute("SELECT error FROM jobs WHERE id = 'a'").fetchone()[0] == 'exit code 1'
+        assert [job_id for job_id, _ in claim_jobs(conn, 'w4', 10, max_attempts=2)] == ['b']
+
+    print("Lease expiry and worker release count as attempts")
+
+if __name__ == "__main__":
+    test_claim_and_finish()
+    test_requeue_and_release()
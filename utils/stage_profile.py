@@ -0,0 +1,269 @@
+"""Per-stage measurements of a pipeline run and a JSON report per run.
+
+For every stage the runner measures wall time, CPU time (the stage process plus the worker
+processes and kernels it starts), peak RSS and the items it reads and writes: rows of
+metadata files (.csv/.parquet), images in folders or packed image stores. Memory and the
+CPU time of child processes are sampled by a background thread (psutil), so the peak of a
+single stage is measured even when all stages run in the same process.
+
+Every run writes `<pipeline>_<timestamp>_<mode>.json` into the report folder and prints a
+short comparison with the previous report of the same pipeline and mode; stages that got
+clearly slower or need clearly more memory are marked.
+
+Example:
+    with measure() as profile:
+        run_stage(stage, base_dir)
+    print(profile['wall_seconds'], profile['peak_rss_mb'])
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+import metadata_io
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+SAMPLE_INTERVAL = 0.1
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.webp')
+
+# Relative change from which a stage counts as regression (and minimum duration to compare)
+REGRESSION_THRESHOLD = 0.2
+MIN_COMPARE_SECONDS = 1.0
+
+REPORT_VERSION = 1
+
+
+def _cpu_seconds(times):
+    return times.user + times.system
+
+
+def _sample(process, profile, child_cpu, known_children, stop):
+    """Background thread: peak RSS of the process and its children, CPU time of the children"""
+    while True:
+        try:
+            children = [child for child in process.children(recursive=True) if child.pid not in known_children]
+        except psutil.Error:
+            children = []
+        rss = process.memory_info().rss
+        children_rss = 0
+        for child in children:
+            try:
+                children_rss += child.memory_info().rss
+                child_cpu[child.pid] = _cpu_seconds(child.cpu_times())
+            except psutil.Error:
+                continue
+        profile['peak_rss_mb'] = max(profile['peak_rss_mb'], (rss + children_rss) / 1024 ** 2)
+        profile['peak_children_rss_mb'] = max(profile['peak_children_rss_mb'], children_rss / 1024 ** 2)
+        if stop.wait(SAMPLE_INTERVAL):
+            return
+
+
+@contextmanager
+def measure():
+    """Measure the enclosed block
+
+    Yields:
+        dict that is filled at the end: 'wall_seconds', 'cpu_seconds', 'peak_rss_mb' and
+        'peak_children_rss_mb' (peak_rss_mb includes the children, RSS values are None
+        without psutil)
+    """
+    profile = {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'peak_rss_mb': None, 'peak_children_rss_mb': None}
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    sampler = None
+    if psutil is not None:
+        process = psutil.Process()
+        # Only processes started by the stage count (not e.g. pool workers that already run)
+        known_children = {child.pid for child in process.children(recursive=True)}
+        profile['peak_rss_mb'] = profile['peak_children_rss_mb'] = 0.0
+        child_cpu, stop = {}, threading.Event()
+        sampler = threading.Thread(target=_sample, args=(process, profile, child_cpu, known_children, stop), daemon=True)
+        sampler.start()
+    try:
+        yield profile
+    finally:
+        profile['wall_seconds'] = time.perf_counter() - start_wall
+        profile['cpu_seconds'] = time.process_time() - start_cpu
+        if sampler is not None:
+            stop.set()
+            sampler.join()
+            profile['cpu_seconds'] += sum(child_cpu.values())
+
+
+def _count_rows(path):
+    source = metadata_io.metadata_file(path)
+    if source.suffix == '.parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(source).metadata.num_rows
+    return len(pd.read_csv(source, usecols=[0]))
+
+
+def count_items(path):
+    """Rows of a metadata file or images in a folder / image store, None for other paths"""
+    path = Path(path)
+    try:
+        if path.suffix in ('.csv', '.parquet'):
+            return _count_rows(path) if metadata_io.metadata_exists(path) else None
+        if (path / 'meta.json').exists():
+            from image_store import open_image_store, stored_ids
+            return len(stored_ids(open_image_store(path)))
+        if path.is_dir():
+            with os.scandir(path) as entries:
+                return sum(1 for entry in entries if entry.name.lower().endswith(IMAGE_SUFFIXES))
+    except Exception as e:
+        print(f"⚠️ Konnte Einträge von {path.name} nicht zählen: {e}")
+    return None
+
+
+def _total(counts):
+    values = [count for count in counts.values() if count is not None]
+    return sum(values) if values else None
+
+
+def item_counts(paths, base_dir):
+    """{path: count} and the total of the counted paths"""
+    counts = {path: count_items(Path(base_dir) / path) for path in paths}
+    return counts, _total(counts)
+
+
+def items_per_second(profile):
+    """Items read per second, or items written if the stage has no countable input"""
+    items = profile.get('items_in') or profile.get('items_out')
+    if not items or not profile.get('wall_seconds'):
+        return None
+    return items / profile['wall_seconds']
+
+
+def new_report(pipeline, mode):
+    return {
+        'version': REPORT_VERSION,
+        'pipeline': pipeline,
+        'mode': mode,
+        'started': time.time(),
+        'finished': None,
+        'success': None,
+        'stages': [],
+    }
+
+
+def stage_entry(name, status='ran'):
+    """Report entry of one stage ('ran', 'skipped' or 'failed'), measurements are filled by the runner"""
+    return {
+        'name': name, 'status': status,
+        'wall_seconds': None, 'cpu_seconds': None, 'peak_rss_mb': None, 'peak_children_rss_mb': None,
+        'inputs': {}, 'outputs': {}, 'items_in': None, 'items_out': None, 'items_per_second': None,
+    }
+
+
+def write_report(report, report_dir):
+    """Write the report of a run as JSON, returns its path"""
+    report_dir = Path(report_dir)
+    report_dir.mkdir(parents=True, exist_ok=True)
+    path = report_dir / f"{report['pipeline']}_{datetime.fromtimestamp(report['started']):%Y%m%d_%H%M%S}_{report['mode']}.json"
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_text(json.dumps(report, indent=2, default=str), encoding='utf-8')
+    os.replace(tmp_path, path)
+    return path
+
+
+def previous_report(report_dir, pipeline, mode=None):
+    """Newest report of the pipeline (in the same mode if given), None if there is none"""
+    for path in sorted(Path(report_dir).glob(f"{pipeline}_*.json"), reverse=True):
+        report = json.loads(path.read_text(encoding='utf-8'))
+        if mode is None or report.get('mode') == mode:
+            return report
+    return None
+
+
+def finish_report(report, report_dir, success):
+    """Write the report, print the stage summary and the comparison with the previous run"""
+    report['finished'] = time.time()
+    report['success'] = success
+    previous = previous_report(report_dir, report['pipeline'], report['mode'])
+    path = write_report(report, report_dir)
+    print_summary(report)
+    print_comparison(previous, report)
+    print(f"💾 Report: {path}")
+    return path
+
+
+def _ran(report):
+    return {stage['name']: stage for stage in report['stages'] if stage['status'] == 'ran'}
+
+
+def compare_reports(previous, current):
+    """Stages that ran in both reports
+
+    Returns:
+        DataFrame with wall time, peak RSS and items/s of both runs, the relative change of
+        wall time and peak RSS and 'regression' (True above REGRESSION_THRESHOLD)
+    """
+    rows = []
+    before = _ran(previous)
+    for name, stage in _ran(current).items():
+        if name not in before:
+            continue
+        old = before[name]
+        row = {
+            'stage': name,
+            'wall_before': old['wall_seconds'], 'wall_now': stage['wall_seconds'],
+            'rss_before': old['peak_rss_mb'], 'rss_now': stage['peak_rss_mb'],
+            'items_per_second_before': old['items_per_second'], 'items_per_second_now': stage['items_per_second'],
+        }
+        row['wall_change'] = stage['wall_seconds'] / old['wall_seconds'] - 1 if old['wall_seconds'] else None
+        row['rss_change'] = stage['peak_rss_mb'] / old['peak_rss_mb'] - 1 \
+            if old['peak_rss_mb'] and stage['peak_rss_mb'] is not None else None
+        slower = row['wall_change'] is not None and row['wall_change'] > REGRESSION_THRESHOLD \
+            and stage['wall_seconds'] >= MIN_COMPARE_SECONDS
+        larger = row['rss_change'] is not None and row['rss_change'] > REGRESSION_THRESHOLD
+        row['regression'] = slower or larger
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def _format(value, unit=''):
+    if value is None or pd.isna(value):
+        return '-'
+    return f"{value:,}{unit}" if isinstance(value, int) else f"{value:,.1f}{unit}"
+
+
+def print_summary(report):
+    """One line per stage: status, times, peak RSS and items"""
+    print(f"\n📊 Stage-Profil {report['pipeline']} ({report['mode']}):")
+    for stage in report['stages']:
+        if stage['status'] == 'skipped':
+            print(f"   ⏭️ {stage['name']}")
+            continue
+        icon = '✅' if stage['status'] == 'ran' else '❌'
+        print(f"   {icon} {stage['name']}: {_format(stage['wall_seconds'], 's')} "
+              f"(CPU {_format(stage['cpu_seconds'], 's')}), RSS {_format(stage['peak_rss_mb'], ' MB')}, "
+              f"Einträge {_format(stage['items_in'])} -> {_format(stage['items_out'])}, "
+              f"{_format(stage['items_per_second'], '/s')}")
+
+
+def print_comparison(previous, current):
+    """Short comparison with the previous run of the same pipeline"""
+    if previous is None:
+        print("📊 Kein vorheriger Lauf zum Vergleichen")
+        return
+    comparison = compare_reports(previous, current)
+    started = datetime.fromtimestamp(previous['started'])
+    if comparison.empty:
+        print(f"📊 Keine gemeinsam ausgeführten Stages mit dem Lauf vom {started:%d.%m.%Y %H:%M}")
+        return
+    print(f"📊 Vergleich mit dem Lauf vom {started:%d.%m.%Y %H:%M}:")
+    for row in comparison.itertuples():
+        icon = '⚠️' if row.regression else '  '
+        wall_change = '' if row.wall_change is None or pd.isna(row.wall_change) else f" ({row.wall_change:+.0%})"
+        rss_change = '' if row.rss_change is None or pd.isna(row.rss_change) else f" ({row.rss_change:+.0%})"
+        print(f"   {icon} {row.stage}: {_format(row.wall_before, 's')} -> {_format(row.wall_now, 's')}{wall_change}, "
+              f"RSS {_format(row.rss_before, ' MB')} -> {_format(row.rss_now, ' MB')}{rss_change}")
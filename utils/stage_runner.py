@@ -0,0 +1,531 @@
+"""In-process stage runner for the pipelines (replaces one papermill kernel per notebook).
+
+Every stage declares the files or folders it reads and writes. A stage depends on the
+last earlier stage that writes one of its inputs, so the declaration order of a pipeline
+stays its default order and stages without a path in common are independent.
+
+Modes:
+    'inprocess'  all stages one after the other in the runner process: the code cells of
+                 a notebook are executed directly (no kernel, no executed copy), pandas,
+                 torch etc. are imported once, and metadata written with metadata_io is
+                 handed to the next stage in memory
+    'pool'       independent stages run in parallel worker processes (handover via files)
+    'papermill'  every notebook in its own kernel with an executed copy, for debugging
+
+Unchanged stages are skipped: after every successful stage a fingerprint of its source
+(notebook code cells or function, plus the utils modules it imports), its params and its
+input files is stored in `stage_state.json` (in executed_dir). When the next run finds the
+same fingerprint and all outputs exist, the stage is not executed again. A stage that
+changed writes new outputs, so only the stages reading them run again (make-style);
+`force=` or `use_cache=False` run stages anyway.
+
+Every stage that runs is measured (wall and CPU time, peak RSS, rows/images in and out, see
+stage_profile.py); each run writes a JSON report to executed_dir/stage_reports and prints
+a comparison with the previous run of the same pipeline.
+
+Example:
+    stages = [
+        notebook_stage('step3_categories.ipynb', inputs=[data / 'metadata2.csv'], outputs=[data / 'metadata3.csv']),
+        notebook_stage('step3_tags.ipynb', inputs=[data / 'metadata3.csv'], outputs=[data / 'metadata5.csv']),
+    ]
+    success = run_pipeline(stages, notebooks_dir, mode='inprocess')
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import re
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import metadata_io
+import stage_profile
+
+MODES = ('inprocess', 'pool', 'papermill')
+
+STATE_NAME = 'stage_state.json'
+REPORTS_NAME = 'stage_reports'
+
+# Files up to this size are fingerprinted by content, larger ones by size and mtime
+HASH_CONTENT_MAX_BYTES = 64 * 1024 ** 2
+
+UTILS_DIR = Path(__file__).resolve().parent
+_IMPORT_PATTERN = re.compile(r'^\s*(?:from|import)\s+(?:utils\.)?(\w+)', re.MULTILINE)
+
+
+def notebook_stage(notebook, inputs=(), outputs=(), params=None, name=None):
+    """Stage that executes a notebook
+
+    Args:
+        notebook: notebook path relative to the notebooks folder of the pipeline
+        inputs / outputs: files or folders, relative to the notebooks folder
+        params: variables that are set after the cell tagged 'parameters' (like papermill)
+    """
+    return {
+        'name': name or Path(notebook).name,
+        'notebook': str(notebook),
+        'func': None,
+        'inputs': [str(p) for p in inputs],
+        'outputs': [str(p) for p in outputs],
+        'params': dict(params or {}),
+    }
+
+
+def function_stage(func, inputs=(), outputs=(), params=None, name=None):
+    """Stage that calls `func(**params)` in the working directory of the pipeline"""
+    return {
+        'name': name or func.__name__,
+        'notebook': None,
+        'func': func,
+        'inputs': [str(p) for p in inputs],
+        'outputs': [str(p) for p in outputs],
+        'params': dict(params or {}),
+    }
+
+
+def _key(path, base_dir):
+    return str((Path(base_dir) / path).resolve())
+
+
+def resolve_dependencies(stages, base_dir='.'):
+    """Upstream stages per stage
+
+    Returns:
+        dict stage name -> set of names of the stages that write one of its inputs
+        (for every input the last earlier writer)
+    """
+    names = [stage['name'] for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Stage-Namen müssen eindeutig sein: {names}")
+
+    last_writer = {}
+    dependencies = {}
+    for stage in stages:
+        dependencies[stage['name']] = {
+            last_writer[_key(path, base_dir)] for path in stage['inputs'] if _key(path, base_dir) in last_writer
+        }
+        for path in stage['outputs']:
+            last_writer[_key(path, base_dir)] = stage['name']
+    return dependencies
+
+
+def _input_available(path):
+    return Path(path).exists() or metadata_io.metadata_exists(path)
+
+
+def notebook_cells(notebook):
+    """Code cells of a notebook without IPython magics
+
+    Returns:
+        list of (source, is_parameters_cell)
+    """
+    nb = json.loads(Path(notebook).read_text(encoding='utf-8'))
+    cells = []
+    for cell in nb['cells']:
+        if cell['cell_type'] != 'code':
+            continue
+        source = ''.join(cell['source'])
+        lines = [line for line in source.split('\n') if not line.lstrip().startswith(('%', '!'))]
+        tags = cell.get('metadata', {}).get('tags', [])
+        cells.append(('\n'.join(lines), 'parameters' in tags))
+    return cells
+
+
+def _display(*objects):
+    try:
+        from IPython.display import display
+        display(*objects)
+    except ImportError:
+        for obj in objects:
+            print(obj)
+
+
+def execute_notebook(notebook, params=None):
+    """Execute the code cells of a notebook in this process (working directory = notebook folder)
+
+    Args:
+        params: variables set after the 'parameters' cell, or before the first cell if the
+            notebook has none (same as papermill)
+    """
+    notebook = Path(notebook).resolve()
+    cells = notebook_cells(notebook)
+    namespace = {'__name__': '__main__', 'display': _display}
+    if params and not any(is_parameters for _, is_parameters in cells):
+        namespace.update(params)
+
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    cwd = os.getcwd()
+    os.chdir(notebook.parent)
+    try:
+        for i, (source, is_parameters) in enumerate(cells):
+            exec(compile(source, f"{notebook.name}[{i}]", 'exec'), namespace)
+            if is_parameters and params:
+                namespace.update(params)
+    finally:
+        os.chdir(cwd)
+        if 'matplotlib.pyplot' in sys.modules:
+            sys.modules['matplotlib.pyplot'].close('all')
+    return namespace
+
+
+def _execute_papermill(notebook, params, executed_dir):
+    import papermill as pm
+
+    notebook = Path(notebook).resolve()
+    executed_dir.mkdir(parents=True, exist_ok=True)
+    pm.execute_notebook(
+        input_path=str(notebook),
+        output_path=str(executed_dir / f"executed_{notebook.name}"),
+        parameters=params or None,
+        cwd=str(notebook.parent),
+        progress_bar=True,
+    )
+
+
+def _hash(*parts):
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _file_fingerprint(path):
+    stat = path.stat()
+    if stat.st_size > HASH_CONTENT_MAX_BYTES:
+        return f"stat:{stat.st_size}:{stat.st_mtime_ns}"
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 ** 2), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def path_fingerprint(path):
+    """Fingerprint of an input or output path, None if it does not exist
+
+    Metadata files (.csv/.parquet) cover both siblings, folders are fingerprinted by
+    number of files, total size and newest mtime (no content hashing of image folders).
+    """
+    path = Path(path)
+    if path.suffix in ('.csv', '.parquet'):
+        files = [p for p in metadata_io.metadata_paths(path) if p.exists()]
+        return _hash(*(f"{p.suffix}:{_file_fingerprint(p)}" for p in files)) if files else None
+    if path.is_dir():
+        count, size, newest = 0, 0, 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                stat = os.stat(os.path.join(root, name))
+                count, size, newest = count + 1, size + stat.st_size, max(newest, stat.st_mtime_ns)
+        return f"dir:{count}:{size}:{newest}"
+    if path.exists():
+        return _file_fingerprint(path)
+    return None
+
+
+def _utils_modules(source, seen):
+    """utils modules imported by `source`, transitively"""
+    for name in _IMPORT_PATTERN.findall(source):
+        module = UTILS_DIR / f"{name}.py"
+        if name not in seen and module.exists():
+            seen[name] = module.read_text(encoding='utf-8')
+            _utils_modules(seen[name], seen)
+    return seen
+
+
+def source_fingerprint(stage, base_dir):
+    """Fingerprint of the stage code: notebook code cells (not outputs) or function source,
+    plus every utils module it imports"""
+    if stage['func'] is not None:
+        source = inspect.getsource(stage['func'])
+    else:
+        source = '\n'.join(cell for cell, _ in notebook_cells(Path(base_dir) / stage['notebook']))
+    modules = _utils_modules(source, {})
+    return _hash(source, *(f"{name}\n{modules[name]}" for name in sorted(modules)))
+
+
+def _state_key(stage, base_dir):
+    if stage['func'] is not None:
+        return f"{stage['func'].__module__}.{stage['func'].__qualname__}"
+    return _key(stage['notebook'], base_dir)
+
+
+def load_state(path):
+    path = Path(path)
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except json.JSONDecodeError:
+        print(f"⚠️ {path.name} ist beschädigt, alle Stages laufen neu")
+        return {}
+
+
+def save_state(state, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_text(json.dumps(state, indent=2, sort_keys=True), encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+def stage_fingerprint(stage, base_dir):
+    """Current source, params and input fingerprints of a stage"""
+    return {
+        'source': source_fingerprint(stage, base_dir),
+        'params': _hash(json.dumps(stage['params'], sort_keys=True, default=str)),
+        'inputs': {path: path_fingerprint(Path(base_dir) / path) for path in stage['inputs']},
+    }
+
+
+def is_up_to_date(stage, base_dir, state):
+    """True if the stage ran with the same source, params and inputs and its outputs exist
+
+    For a path the stage reads and writes (in-place update), the current file has to be the
+    one the stage wrote itself.
+    """
+    recorded = state.get(_state_key(stage, base_dir))
+    if not recorded:
+        return False
+    current = stage_fingerprint(stage, base_dir)
+    if current['source'] != recorded['source'] or current['params'] != recorded['params']:
+        return False
+    for path, fingerprint in current['inputs'].items():
+        expected = recorded['outputs'].get(path) if path in stage['outputs'] else recorded['inputs'].get(path)
+        if fingerprint is None or fingerprint != expected:
+            return False
+    return all(path_fingerprint(Path(base_dir) / path) is not None for path in stage['outputs'])
+
+
+def _record_stage(stage, base_dir, state, fingerprint, seconds):
+    state[_state_key(stage, base_dir)] = {
+        **fingerprint,
+        'outputs': {path: path_fingerprint(Path(base_dir) / path) for path in stage['outputs']},
+        'seconds': round(seconds, 2),
+        'finished': time.time(),
+    }
+
+
+def run_stage(stage, base_dir, mode='inprocess', executed_dir=None):
+    """Run one stage, returns the duration in seconds (exceptions are passed on)"""
+    start = time.perf_counter()
+    if stage['func'] is not None:
+        cwd = os.getcwd()
+        os.chdir(base_dir)
+        try:
+            stage['func'](**stage['params'])
+        finally:
+            os.chdir(cwd)
+    elif mode == 'papermill':
+        _execute_papermill(Path(base_dir) / stage['notebook'], stage['params'], Path(executed_dir))
+    else:
+        execute_notebook(Path(base_dir) / stage['notebook'], stage['params'])
+    return time.perf_counter() - start
+
+
+def profile_stage(stage, base_dir, mode='inprocess', executed_dir=None):
+    """Run one stage and measure it (see stage_profile.py)
+
+    Returns:
+        report entry of the stage; if the stage fails, the exception is raised with the
+        (failed) entry as attribute `stage_entry`
+    """
+    entry = stage_profile.stage_entry(stage['name'])
+    entry['inputs'], entry['items_in'] = stage_profile.item_counts(stage['inputs'], base_dir)
+    try:
+        with stage_profile.measure() as measured:
+            run_stage(stage, base_dir, mode, executed_dir)
+    except Exception as e:
+        entry.update(measured, status='failed')
+        e.stage_entry = entry
+        raise
+    entry.update(measured)
+    entry['outputs'], entry['items_out'] = stage_profile.item_counts(stage['outputs'], base_dir)
+    entry['items_per_second'] = stage_profile.items_per_second(entry)
+    return entry
+
+
+def _run_stage_worker(stage, base_dir):
+    """Pool worker: (name, report entry, error text or None)"""
+    try:
+        return stage['name'], profile_stage(stage, base_dir), None
+    except Exception as e:
+        return stage['name'], getattr(e, 'stage_entry', None), traceback.format_exc()
+
+
+def _check_inputs(stage, base_dir, produced):
+    missing = [
+        path for path in stage['inputs']
+        if _key(path, base_dir) not in produced and not _input_available(Path(base_dir) / path)
+    ]
+    if missing:
+        raise FileNotFoundError(f"Eingaben von {stage['name']} fehlen: {', '.join(missing)}")
+
+
+def _release_memory(stages, done, base_dir):
+    """Drop in-memory metadata that no remaining stage reads"""
+    pending_inputs = {_key(path, base_dir) for stage in stages if stage['name'] not in done for path in stage['inputs']}
+    for key in metadata_io.memory_paths():
+        if key not in pending_inputs and str(Path(key).with_suffix('.csv')) not in pending_inputs:
+            metadata_io.forget_metadata(key)
+
+
+def _skip_cached(stage, base_dir, state, force):
+    """True (and a status line) if the stage can be skipped"""
+    if stage['name'] in force or not is_up_to_date(stage, base_dir, state):
+        return False
+    print(f"⏭️ {stage['name']} unverändert, übersprungen")
+    return True
+
+
+def run_pipeline(stages, base_dir, mode='inprocess', n_workers=None, executed_dir=None,
+                 use_cache=True, force=(), state_path=None, pipeline=None):
+    """Run all stages in dependency order
+
+    Args:
+        base_dir: notebooks folder of the pipeline (notebook, input and output paths are relative to it)
+        mode: 'inprocess', 'pool' or 'papermill' (see module docstring)
+        n_workers: processes for mode 'pool' (default = number of cores)
+        executed_dir: folder for executed notebook copies in mode 'papermill', the stage state
+            and the run reports (executed_dir / stage_reports)
+        use_cache: skip stages whose source, params and inputs did not change
+        force: names of stages that run even if they are unchanged
+        state_path: stage fingerprints (default executed_dir / stage_state.json)
+        pipeline: name of the pipeline in the run reports (default = name of base_dir)
+
+    Returns:
+        True if all stages succeeded
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unbekannter Modus: {mode} (erlaubt: {', '.join(MODES)})")
+    base_dir = Path(base_dir).resolve()
+    executed_dir = Path(executed_dir) if executed_dir else base_dir / '../../executed_notebooks'
+    state_path = Path(state_path) if state_path else executed_dir / STATE_NAME
+    state = load_state(state_path) if use_cache else {}
+    force = set(force)
+    unknown = force - {stage['name'] for stage in stages}
+    if unknown:
+        raise ValueError(f"Unbekannte Stages für force: {', '.join(sorted(unknown))}")
+    dependencies = resolve_dependencies(stages, base_dir)
+    report = stage_profile.new_report(pipeline or base_dir.name, mode)
+
+    print(f"🚀 {len(stages)} Stages, Modus: {mode}")
+    success = False
+    try:
+        if mode == 'pool':
+            success = _run_pool(stages, base_dir, dependencies, n_workers, state, state_path, force, report)
+        else:
+            success = _run_sequential(stages, base_dir, mode, executed_dir, state, state_path, force, report)
+    finally:
+        stage_profile.finish_report(report, executed_dir / REPORTS_NAME, success)
+    return success
+
+
+def _run_sequential(stages, base_dir, mode, executed_dir, state, state_path, force, report):
+    produced, done = set(), set()
+    if mode == 'inprocess':
+        metadata_io.keep_in_memory()
+    try:
+        for i, stage in enumerate(stages, 1):
+            print(f"\n📋 Stage {i}/{len(stages)}: {stage['name']}")
+            try:
+                _check_inputs(stage, base_dir, produced)
+                if _skip_cached(stage, base_dir, state, force):
+                    entry = stage_profile.stage_entry(stage['name'], 'skipped')
+                else:
+                    fingerprint = stage_fingerprint(stage, base_dir)
+                    state.pop(_state_key(stage, base_dir), None)
+                    entry = profile_stage(stage, base_dir, mode, executed_dir)
+                    _record_stage(stage, base_dir, state, fingerprint, entry['wall_seconds'])
+            except Exception as e:
+                report['stages'].append(getattr(e, 'stage_entry', None) or stage_profile.stage_entry(stage['name'], 'failed'))
+                print(f"❌ {stage['name']} fehlgeschlagen: {e}")
+                print("🛑 Pipeline gestoppt")
+                return False
+            finally:
+                save_state(state, state_path)
+            report['stages'].append(entry)
+            done.add(stage['name'])
+            produced.update(_key(path, base_dir) for path in stage['outputs'])
+            if mode == 'inprocess':
+                _release_memory(stages, done, base_dir)
+            if entry['status'] == 'ran':
+                print(f"✅ {stage['name']} fertig in {entry['wall_seconds']:.1f}s")
+    finally:
+        if mode == 'inprocess':
+            metadata_io.keep_in_memory(False)
+    return True
+
+
+def _run_pool(stages, base_dir, dependencies, n_workers, state, state_path, force, report):
+    """Submit every stage as soon as its upstream stages are done"""
+    by_name = {stage['name']: stage for stage in stages}
+    produced, done, running, failed = set(), set(), {}, False
+    fingerprints = {}
+    with ProcessPoolExecutor(n_workers or os.cpu_count()) as pool:
+        while True:
+            submitted = True
+            while submitted and not failed:
+                submitted = False
+                for name, stage in by_name.items():
+                    if name in done or name in running.values() or not dependencies[name] <= done:
+                        continue
+                    try:
+                        _check_inputs(stage, base_dir, produced)
+                    except FileNotFoundError as e:
+                        print(f"❌ {e}")
+                        report['stages'].append(stage_profile.stage_entry(name, 'failed'))
+                        failed = True
+                        break
+                    if _skip_cached(stage, base_dir, state, force):
+                        # Downstream stages may become ready without waiting for a worker
+                        report['stages'].append(stage_profile.stage_entry(name, 'skipped'))
+                        done.add(name)
+                        produced.update(_key(path, base_dir) for path in stage['outputs'])
+                        submitted = True
+                        continue
+                    print(f"📋 Start: {name}")
+                    fingerprints[name] = stage_fingerprint(stage, base_dir)
+                    state.pop(_state_key(stage, base_dir), None)
+                    running[pool.submit(_run_stage_worker, stage, base_dir)] = name
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, entry, error = future.result()
+                del running[future]
+                report['stages'].append(entry or stage_profile.stage_entry(name, 'failed'))
+                if error:
+                    print(f"❌ {name} fehlgeschlagen:\n{error}")
+                    failed = True
+                    continue
+                done.add(name)
+                produced.update(_key(path, base_dir) for path in by_name[name]['outputs'])
+                _record_stage(by_name[name], base_dir, state, fingerprints[name], entry['wall_seconds'])
+                print(f"✅ {name} fertig in {entry['wall_seconds']:.1f}s")
+            save_state(state, state_path)
+
+    if failed or len(done) < len(stages):
+        print("🛑 Pipeline gestoppt")
+        return False
+    return True
+
+
+def pipeline_arguments(description):
+    """Command line of the pipeline scripts: --mode, --workers, --force, --no-cache"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--mode", choices=MODES, default='inprocess',
+                        help="inprocess (default), pool (parallel processes) or papermill (debugging)")
+    parser.add_argument("--workers", type=int, default=None, help="Processes for --mode pool")
+    parser.add_argument("--force", nargs='+', default=[], metavar="STAGE",
+                        help="Run these stages even if source, params and inputs are unchanged")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false",
+                        help="Run all stages, ignore the stored stage fingerprints")
+    return parser.parse_args()
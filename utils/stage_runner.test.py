@@ -0,0 +1,63 @@
+import contextlib
+import io
+import tempfile
+from pathlib import Path
+
+from stage_runner import function_stage, is_up_to_date, load_state, run_pipeline, STATE_NAME
+
+# Names of the stages that ran in the last pipeline run
+runs = []
+
+def add_score(value=1):
+    """In-place stage: reads scores.txt and writes it again with one more line."""
+    runs.append('add_score')
+    path = Path('scores.txt')
+    path.write_text(path.read_text() + f"{value}\n")
+
+def summarize(label='total'):
+    runs.append('summarize')
+    total = sum(int(line) for line in Path('scores.txt').read_text().split())
+    Path('summary.txt').write_text(f"{label}: {total}\n")
+
+def run(base_dir, summarize_label='total'):
+    """Run the two stages quietly, returns the names of the stages that ran."""
+    stages = [
+        function_stage(add_score, inputs=['scores.txt'], outputs=['scores.txt']),
+        function_stage(summarize, inputs=['scores.txt'], outputs=['summary.txt'], params={'label': summarize_label}),
+    ]
+    runs.clear()
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert run_pipeline(stages, base_dir, executed_dir=Path(base_dir) / 'executed', pipeline='test')
+    return list(runs), stages
+
+def test_in_place_outputs():
+    """A stage that rewrites its own input is skipped until someone else changes the file."""
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_dir = Path(tmp)
+        (base_dir / 'scores.txt').write_text("5\n")
+
+        assert run(base_dir)[0] == ['add_score', 'summarize']
+        # scores.txt changed during the run, but only by add_score itself
+        ran, stages = run(base_dir)
+        assert ran == [], f"Unchanged stages ran again: {ran}"
+        state = load_state(base_dir / 'executed' / STATE_NAME)
+        assert all(is_up_to_date(stage, base_dir.resolve(), state) for stage in stages)
+        assert (base_dir / 'scores.txt').read_text() == "5\n1\n"
+
+        # Edited outside of the pipeline: the in-place stage and its reader run again
+        (base_dir / 'scores.txt').write_text("7\n")
+        assert run(base_dir)[0] == ['add_score', 'summarize']
+        assert (base_dir / 'summary.txt').read_text() == "total: 8\n"
+        assert run(base_dir)[0] == []
+
+        # Missing output or changed params only run the affected stage
+        (base_dir / 'summary.txt').unlink()
+        assert run(base_dir)[0] == ['summarize']
+        assert run(base_dir, summarize_label='sum')[0] == ['summarize']
+        assert (base_dir / 'scores.txt').read_text() == "7\n1\n"
+
+    print("In-place stages are skipped while their output is the file they wrote")
+
+if __name__ == "__main__":
+    test_in_place_outputs()
@@ -0,0 +1,174 @@
+"""Tag vocabulary: comma-separated tag strings as integer ids in a sparse logo x tag matrix.
+
+Every distinct tag is interned once into `vocab` (id -> tag), the tags of all logos are
+stored as one CSR matrix (row = logo, column = tag id). Normalisation, counting, removing
+tags and top-N filtering run on the id arrays of the matrix instead of splitting and
+joining one string per row; strings are only built again by `render_tags`.
+
+The entries of a row keep the order of the original string (and repeated tags), so
+`render_tags(build_tag_matrix(tags), sep=',')` gives the same result as `normalize_tags`
+per row. Missing values (NaN/None) become logos without tags.
+
+Example:
+    tag_matrix = build_tag_matrix(df['tags'])
+    tag_counts_df = tag_counts(tag_matrix)
+    df['tags_cleaned'] = render_tags(remove_tags(tag_matrix, TAGS_TO_REMOVE), sep=', ')
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from text import normalize_single_tag
+
+
+def _tag_matrix(vocab, indices, indptr, index):
+    matrix = sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.int32), indices, indptr),
+        shape=(len(indptr) - 1, len(vocab))
+    )
+    return {
+        'vocab': vocab,
+        'ids': {tag: tag_id for tag_id, tag in enumerate(vocab)},
+        'matrix': matrix,
+        'index': index,
+    }
+
+
+def build_tag_matrix(tags, sep=',', normalize=True):
+    """Intern the tags of all logos and build the logo x tag matrix
+
+    Args:
+        tags: Series (or list) of tag strings, one per logo
+        normalize: normalize_single_tag for every tag; False only strips whitespace
+
+    Returns:
+        dict with 'vocab' (array id -> tag), 'ids' (tag -> id), 'matrix' (CSR, one row per
+        logo, entries in original order) and 'index' (index of the input Series)
+    """
+    tags = pd.Series(tags) if not isinstance(tags, pd.Series) else tags
+    index = tags.index
+    values = tags.where(tags.notna(), '').astype(str).tolist()
+
+    # One split over all rows; row k contributes count(sep) + 1 raw tags
+    pieces = np.array([value.count(sep) + 1 for value in values], dtype=np.int64)
+    rows = np.repeat(np.arange(len(values)), pieces)
+    raw = sep.join(values).split(sep) if values else []
+    raw_codes, raw_tags = pd.factorize(np.array(raw, dtype=object))
+
+    # Normalize each distinct raw tag once, then map it to its vocabulary id
+    cleaned = [normalize_single_tag(t) if normalize else t.strip() for t in raw_tags]
+    cleaned = pd.Series(cleaned, dtype=object)
+    vocab_codes, vocab = pd.factorize(cleaned.where(cleaned != ''))
+    raw_to_id = np.asarray(vocab_codes, dtype=np.int64)
+
+    tag_ids = raw_to_id[raw_codes]
+    keep = tag_ids >= 0
+    indices = tag_ids[keep]
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(rows[keep], minlength=len(values)))])
+    return _tag_matrix(np.asarray(vocab, dtype=object), indices, indptr, index)
+
+
+def tag_ids(tag_matrix, tags):
+    """Ids of the given tags (tags that are not in the vocabulary are skipped)"""
+    ids = tag_matrix['ids']
+    return np.array([ids[t] for t in tags if t in ids], dtype=np.int64)
+
+
+def tags_per_logo(tag_matrix):
+    return np.diff(tag_matrix['matrix'].indptr)
+
+
+def tag_counts(tag_matrix):
+    """Occurrences per tag (every tag instance counts, like a Counter over all tags)
+
+    Returns:
+        DataFrame with 'tag' and 'count', most frequent first, without unused tags
+    """
+    counts = np.bincount(tag_matrix['matrix'].indices, minlength=len(tag_matrix['vocab']))
+    order = np.argsort(-counts, kind='stable')
+    order = order[counts[order] > 0]
+    return pd.DataFrame({'tag': tag_matrix['vocab'][order], 'count': counts[order]})
+
+
+def _filter_entries(tag_matrix, keep):
+    """New tag matrix with only the entries where `keep` (per stored entry) is True"""
+    matrix = tag_matrix['matrix']
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(rows[keep], minlength=matrix.shape[0]))])
+    return _tag_matrix(tag_matrix['vocab'], matrix.indices[keep], indptr, tag_matrix['index'])
+
+
+def remove_tags(tag_matrix, tags):
+    """Remove a set of tags from all logos"""
+    remove = np.zeros(len(tag_matrix['vocab']), dtype=bool)
+    remove[tag_ids(tag_matrix, tags)] = True
+    return _filter_entries(tag_matrix, ~remove[tag_matrix['matrix'].indices])
+
+
+def keep_top_tags(tag_matrix, n):
+    """Keep only the `n` most frequent tags, all other tags are removed from the logos"""
+    top = tag_ids(tag_matrix, tag_counts(tag_matrix)['tag'].head(n))
+    keep = np.zeros(len(tag_matrix['vocab']), dtype=bool)
+    keep[top] = True
+    return _filter_entries(tag_matrix, keep[tag_matrix['matrix'].indices])
+
+
+def append_tags(tag_matrix, tags, skip_if_present=None):
+    """Append one tag per logo at the end of its tags
+
+    Args:
+        tags: one tag (or None) per logo
+        skip_if_present: optional tag per logo; if the logo already has it, nothing is appended
+
+    Returns:
+        (new tag matrix, boolean array of the logos that got a tag)
+    """
+    matrix = tag_matrix['matrix']
+    n_rows = matrix.shape[0]
+    vocab = list(tag_matrix['vocab'])
+    ids = dict(tag_matrix['ids'])
+
+    def lookup(values, add):
+        result = np.full(n_rows, -1, dtype=np.int64)
+        for row, tag in enumerate(values):
+            if tag is None or (not isinstance(tag, str) and pd.isna(tag)):
+                continue
+            if tag not in ids and add:
+                ids[tag] = len(vocab)
+                vocab.append(tag)
+            result[row] = ids.get(tag, -1)
+        return result
+
+    new_ids = lookup(tags, add=True)
+    added = new_ids >= 0
+    if skip_if_present is not None:
+        skip_ids = lookup(skip_if_present, add=False)
+        rows = np.repeat(np.arange(n_rows), np.diff(matrix.indptr))
+        present = np.zeros(n_rows, dtype=bool)
+        present[rows[matrix.indices == skip_ids[rows]]] = True
+        added &= ~present
+
+    # Old entries move back by the number of tags appended to earlier rows
+    counts = np.diff(matrix.indptr) + added
+    indptr = np.concatenate([[0], np.cumsum(counts)])
+    shift = np.concatenate([[0], np.cumsum(added)[:-1]])
+    indices = np.empty(indptr[-1], dtype=np.int64)
+    old_rows = np.repeat(np.arange(n_rows), np.diff(matrix.indptr))
+    indices[np.arange(len(matrix.indices)) + shift[old_rows]] = matrix.indices
+    indices[indptr[1:][added] - 1] = new_ids[added]
+
+    return _tag_matrix(np.asarray(vocab, dtype=object), indices, indptr, tag_matrix['index']), added
+
+
+def render_tags(tag_matrix, sep=', '):
+    """Tags of every logo as string again
+
+    Returns:
+        Series with the index of the input of build_tag_matrix
+    """
+    matrix = tag_matrix['matrix']
+    names = tag_matrix['vocab'][matrix.indices].tolist()
+    bounds = matrix.indptr.tolist()
+    rendered = [sep.join(names[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
+    return pd.Series(rendered, index=tag_matrix['index'], dtype=object)
@@ -0,0 +1,83 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from tag_vocab import append_tags, build_tag_matrix, keep_top_tags, remove_tags, render_tags, tag_counts, tags_per_logo
+from text import normalize_tags
+
+# Tag strings as they come from parse_text (repeated tags, empty pieces, missing values)
+test_tags = pd.Series([
+    'modern, tech, Modern, blue',
+    'coffee shop,  bar , , food',
+    '',
+    None,
+    np.nan,
+    'tech',
+    'Food & Drinks, food, coffee shop, minimalist',
+    'a very long tag here, blue, tech, tech',
+], index=range(10, 18))
+
+def split_tags(value):
+    return [tag.strip() for tag in value.split(',') if tag.strip()] if value else []
+
+def test_build_and_render():
+    """build_tag_matrix + render_tags must give the same strings as normalize_tags per row."""
+
+    tag_matrix = build_tag_matrix(test_tags)
+    rendered = render_tags(tag_matrix, sep=',')
+    assert list(rendered.index) == list(test_tags.index)
+
+    for idx, value in test_tags.items():
+        expected = normalize_tags(value) if isinstance(value, str) else ''
+        assert rendered[idx] == expected, f"Mismatch for {value!r}: {rendered[idx]!r} != {expected!r}"
+    assert tags_per_logo(tag_matrix).tolist() == [len(split_tags(v)) for v in rendered]
+
+    print(f"render_tags matches normalize_tags for {len(test_tags)} rows")
+
+def test_counts_remove_and_top():
+    """Counting, removing and top-N filtering on the matrix match the same operations on lists."""
+
+    tag_matrix = build_tag_matrix(test_tags)
+    lists = [split_tags(v) for v in render_tags(tag_matrix, sep=',')]
+    counter = Counter(tag for tags in lists for tag in tags)
+
+    counts = tag_counts(tag_matrix)
+    assert list(zip(counts['tag'], counts['count'])) == counter.most_common()
+
+    to_remove = {'tech', 'blue', 'not a tag'}
+    removed = render_tags(remove_tags(tag_matrix, to_remove), sep=',')
+    assert removed.tolist() == [','.join(t for t in tags if t not in to_remove) for tags in lists]
+
+    top = {tag for tag, _ in counter.most_common(3)}
+    kept = render_tags(keep_top_tags(tag_matrix, 3), sep=',')
+    assert kept.tolist() == [','.join(t for t in tags if t in top) for tags in lists]
+
+    print(f"tag_counts, remove_tags and keep_top_tags match list operations ({len(counter)} tags)")
+
+def test_append_tags():
+    """append_tags adds one tag per logo at the end unless the logo already has `skip_if_present`."""
+
+    tag_matrix = build_tag_matrix(test_tags, normalize=False)
+    lists = [split_tags(v) for v in render_tags(tag_matrix, sep=',')]
+    new_tags = ['new tag', 'food', None, 'new tag', 'other', np.nan, 'food', 'tech']
+    skip_if_present = ['modern', 'bar', 'x', 'y', 'z', 'tech', 'unknown', 'tech']
+
+    appended_matrix, appended = append_tags(tag_matrix, new_tags, skip_if_present=skip_if_present)
+
+    expected, expected_added = [], []
+    for tags, tag, skip in zip(lists, new_tags, skip_if_present):
+        add = isinstance(tag, str) and skip not in tags
+        expected.append(tags + [tag] if add else tags)
+        expected_added.append(add)
+    assert appended.tolist() == expected_added
+    assert render_tags(appended_matrix).tolist() == [', '.join(tags) for tags in expected]
+    # The input matrix is unchanged
+    assert [split_tags(v) for v in render_tags(tag_matrix, sep=',')] == lists
+
+    print(f"append_tags appended {int(appended.sum())} of {len(new_tags)} tags as expected")
+
+if __name__ == "__main__":
+    test_build_and_render()
+    test_counts_remove_and_top()
+    test_append_tags()
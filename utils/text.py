@@ -1,6 +1,11 @@
 import pandas as pd
 import re
 
+# Precompiled patterns of parse_text
+_SPECIAL_CHARS_RE = re.compile(r'[^\w\s&,\-]')
+_VALID_TAG_RE = re.compile(r'^[\w\-_\s]+$')
+_TEXT_REPLACEMENTS = [(', &', ' &'), (', .jpg,', ',,'), (', Inc.', ' Inc.')]
+
 def parse_text(text):
     """Parse the text column to extract company, description, category, and tags"""
     if pd.isna(text) or not isinstance(text, str):
@@ -8,11 +13,10 @@ def parse_text(text):
     # remove more then 2 whitespaces
     text = ' '.join(text.split())  # Normalize whitespace
     # remove special chars except [&,-]
-    text = re.sub(r'[^\w\s&,\-]', '', text)
+    text = _SPECIAL_CHARS_RE.sub('', text)
     
-    text = text.replace(', &', ' &')  
-    text = text.replace(', .jpg,', ',,')  
-    text = text.replace(', Inc.', ' Inc.') 
+    for old, new in _TEXT_REPLACEMENTS:
+        text = text.replace(old, new)
     # Split by comma
     parts = [part.strip() for part in text.split(',')]
     
@@ -41,7 +45,7 @@ def parse_text(text):
     for tag in tags:
         word_count = len(tag.split())
         # Filter out tags with characters other than word chars, hyphens, underscores
-        if not re.match(r'^[\w\-_\s]+$', tag):
+        if not _VALID_TAG_RE.match(tag):
             continue
         
         if word_count > 3:
@@ -59,11 +63,29 @@ def parse_text(text):
     tags = filtered_tags
 
     # Filter out tags with invalid characters
-    tags = [tag for tag in tags if re.match(r'^[\w\-_\s]+$', tag)]
+    tags = [tag for tag in tags if _VALID_TAG_RE.match(tag)]
     
     return company, description, category, tags
 
 
+def parse_text_batch(series):
+    """Parse a whole text column, equivalent to calling parse_text per row.
+
+    Maps the scalar parse_text (with its precompiled patterns) over the values. A column-wise
+    version with pandas string methods was slower because of the explode and regroup steps.
+
+    Args:
+        series: pd.Series with the raw text values
+
+    Returns:
+        pd.DataFrame with the same index as `series` and the columns
+        company, description, category (str or None) and tags (list of str)
+    """
+    parsed = [parse_text(text) for text in series.to_numpy(dtype=object)]
+    columns = ['company', 'description', 'category', 'tags']
+    return pd.DataFrame(parsed, columns=columns, index=series.index, dtype=object)
+
+
 def normalize_single_tag(tag):
     """Normalisiert einen einzelnen Tag für besseren Vergleich"""
     if not tag: